@@ -1,11 +1,11 @@
 # app/Project/__init__.py
 
 from flask import Flask, g, session, render_template
-from .extensions import db, bcrypt, mail, sess
+from .extensions import db, bcrypt, mail, sess, migrate, without_create_all
+from .database import configure_database, install_statement_timeouts, select_request_workload
+from .ratelimit import limits_from_env
 from datetime import datetime, timezone
 import os
-import stripe
-from flask_migrate import Migrate
 
 def create_app():
     app = Flask(__name__, instance_relative_config=False, template_folder='templates', static_folder='static')
@@ -14,6 +14,8 @@ def create_app():
     app.secret_key = os.environ.get("SECRET_KEY")
     app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Pool sizing, statement timeouts and the separate kiosk/reporting pools (see database.py).
+    configure_database(app)
 
     # --- ROBUST SERVER-SIDE SESSION CONFIGURATION ---
     app.config['SESSION_TYPE'] = 'sqlalchemy'
@@ -28,6 +30,52 @@ def create_app():
     
     # --- END OF SESSION CONFIGURATION ---
 
+    # --- PASSWORD HASHING (see passwords.py) ---
+    app.config['BCRYPT_LOG_ROUNDS'] = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+    app.config['PASSWORD_HASH_EXECUTOR'] = os.environ.get('PASSWORD_HASH_EXECUTOR', 'thread')
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', 0)) or None
+    app.config['PASSWORD_HASH_TIMEOUT'] = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))
+
+    # --- KIOSK RATE LIMITS (see ratelimit.py) ---
+    app.config['RATELIMIT_ENABLED'] = os.environ.get('RATELIMIT_ENABLED', 'True') == 'True'
+    app.config['RATELIMIT_STORAGE_URL'] = os.environ.get('RATELIMIT_STORAGE_URL')
+    app.config['RATELIMITS'] = limits_from_env()
+    app.config['SCAN_DEBOUNCE_SECONDS'] = int(os.environ.get('SCAN_DEBOUNCE_SECONDS', 5))
+    # Behind Heroku's router (or any proxy) the client IP is in X-Forwarded-For.
+    trusted_proxies = int(os.environ.get('TRUSTED_PROXY_COUNT', 0))
+    if trusted_proxies:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=trusted_proxies, x_proto=trusted_proxies)
+
+    # Lifetime of a rotating kiosk QR code (see jointokens.py).
+    app.config['ROTATING_QR_PERIOD_SECONDS'] = int(os.environ.get('ROTATING_QR_PERIOD_SECONDS', 30))
+
+    # Rendered PDFs (see pdfs.py). Defaults to instance/pdf_cache; point it at shared disk to share across dynos.
+    app.config['PDF_CACHE_DIR'] = os.environ.get('PDF_CACHE_DIR')
+    app.config['PDF_CACHE_MAX_MB'] = int(os.environ.get('PDF_CACHE_MAX_MB', 100))
+
+    # Marketing pages served pre-rendered and pre-compressed, ahead of sessions and the database (see prerender.py).
+    app.config['PRERENDER_MARKETING_PAGES'] = os.environ.get('PRERENDER_MARKETING_PAGES', 'True') == 'True'
+    app.config['MARKETING_CACHE_SECONDS'] = int(os.environ.get('MARKETING_CACHE_SECONDS', 300))
+    # HTML/JSON responses at least this large are gzip/brotli compressed; 0 turns it off (see compression.py).
+    app.config['COMPRESS_MIN_BYTES'] = int(os.environ.get('COMPRESS_MIN_BYTES', 4096))
+
+    # In-memory cache of admin report results per worker, invalidated by the team's data version (see reportcache.py).
+    app.config['REPORT_CACHE_MAX_MB'] = int(os.environ.get('REPORT_CACHE_MAX_MB', 32))
+
+    # Outbound webhooks (see webhooks.py). Private/loopback URLs are refused unless this is set (local testing only).
+    app.config['WEBHOOK_ALLOW_PRIVATE_URLS'] = os.environ.get('WEBHOOK_ALLOW_PRIVATE_URLS') == 'True'
+
+    # --- SAMPLING PROFILER (see profiling.py) ---
+    # Off unless one of the first three is set: a fraction of requests, a list of endpoints, or X-Profile-Token.
+    app.config['PROFILE_SAMPLE_RATE'] = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+    app.config['PROFILE_ENDPOINTS'] = frozenset(
+        e.strip() for e in os.environ.get('PROFILE_ENDPOINTS', '').split(',') if e.strip())
+    app.config['PROFILE_TOKEN'] = os.environ.get('PROFILE_TOKEN')
+    app.config['PROFILE_DIR'] = os.environ.get('PROFILE_DIR')
+    app.config['PROFILE_INTERVAL_MS'] = int(os.environ.get('PROFILE_INTERVAL_MS', 5))
+    app.config['PROFILE_MAX_MB'] = int(os.environ.get('PROFILE_MAX_MB', 50))
+
     # --- OTHER CONFIGURATIONS ---
     app.config['MAIL_SERVER'] = os.environ.get('MAIL_SERVER')
     app.config['MAIL_PORT'] = int(os.environ.get('MAIL_PORT', 587))
@@ -35,19 +83,35 @@ def create_app():
     app.config['MAIL_USERNAME'] = os.environ.get('MAIL_USERNAME')
     app.config['MAIL_PASSWORD'] = os.environ.get('MAIL_PASSWORD')
     app.config['MAIL_DEFAULT_SENDER'] = os.environ.get('MAIL_USERNAME')
-    stripe.api_key = os.environ.get('STRIPE_SECRET_KEY')
+    # Digest emails sent over one SMTP connection before it is reopened (see digests.py).
+    app.config['DIGEST_MESSAGES_PER_CONNECTION'] = int(os.environ.get('DIGEST_MESSAGES_PER_CONNECTION', 100))
+    # Stripe is imported on first use in payments.py; it is by far the slowest import we have.
+    app.config['STRIPE_SECRET_KEY'] = os.environ.get('STRIPE_SECRET_KEY')
 
     # --- INITIALIZE PLUGINS ---
     db.init_app(app)
+    install_statement_timeouts(app, db)
     bcrypt.init_app(app)
     mail.init_app(app)
-    sess.init_app(app)
-    migrate = Migrate(app, db)
+    # The schema (including the sessions table) is owned by Alembic, so the factory
+    # never touches the database. This keeps it fast and safe for `gunicorn --preload`.
+    with without_create_all(db):
+        sess.init_app(app)
+    migrate.init_app(app, db, directory=os.path.join(os.path.dirname(app.root_path), 'migrations'))
 
     # --- APPLICATION CONTEXT ---
     with app.app_context():
         from . import models
 
+        from .profiling import install_profiler, profiling_enabled
+        if profiling_enabled(app):
+            install_profiler(app)
+
+        # Must run first (after the profiler) so every query in the request uses the right pool (and shard, see sharding.py).
+        app.before_request(select_request_workload)
+        from .sharding import select_request_shard, TeamMovingError, ROUTE_CACHE_SECONDS
+        app.before_request(select_request_shard)
+
         @app.before_request
         def load_logged_in_user():
             user_id = session.get('user_id')
@@ -58,17 +122,48 @@ def create_app():
             else:
                 g.is_super_admin = False
 
+        from .compression import compress_response, note_pending_secret
+        app.before_request(note_pending_secret)
+        app.after_request(compress_response)
+
         @app.context_processor
         def inject_now():
             return {'now': datetime.now(timezone.utc)}
 
         # Import and register blueprints
-        from . import auth, employee, admin, super_admin, payments
+        from . import auth, employee, admin, super_admin, payments, health, api
         app.register_blueprint(auth.auth_bp)
         app.register_blueprint(employee.employee_bp)
         app.register_blueprint(admin.admin_bp)
         app.register_blueprint(super_admin.super_admin_bp)
         app.register_blueprint(payments.payments_bp)
+        app.register_blueprint(health.health_bp)
+        app.register_blueprint(api.api_bp)
+
+        # Rendered once here (before gunicorn forks with --preload), then answered without touching Flask.
+        if app.config['PRERENDER_MARKETING_PAGES']:
+            from .prerender import PrerenderedPages, render_pages
+            app.wsgi_app = PrerenderedPages(app.wsgi_app, render_pages(app), app.config['SESSION_COOKIE_NAME'],
+                                            app.config['MARKETING_CACHE_SECONDS'])
+
+        # CLI commands
+        from .commands import (create_super_admin, bench_passwords, rebuild_shifts, expire_devices, print_qr_posters,
+                               export_time_logs, dispatch_webhooks, send_digests,
+                               debug_smtp_server, init_shard, move_team,
+                               rebuild_tenant_directory, refresh_tenant_stats)
+        app.cli.add_command(create_super_admin)
+        app.cli.add_command(bench_passwords)
+        app.cli.add_command(rebuild_shifts)
+        app.cli.add_command(expire_devices)
+        app.cli.add_command(print_qr_posters)
+        app.cli.add_command(export_time_logs)
+        app.cli.add_command(dispatch_webhooks)
+        app.cli.add_command(send_digests)
+        app.cli.add_command(debug_smtp_server)
+        app.cli.add_command(init_shard)
+        app.cli.add_command(move_team)
+        app.cli.add_command(rebuild_tenant_directory)
+        app.cli.add_command(refresh_tenant_stats)
 
         # Error handlers
         @app.errorhandler(404)
@@ -79,7 +174,10 @@ def create_app():
         def internal_server_error(e):
             return render_template('500.html'), 500
 
-        # Create database tables
-        db.create_all()
+        @app.errorhandler(TeamMovingError)
+        def team_moving(e):
+            # Only for the few seconds a team's writes are paused while it moves between shards.
+            return ("This team is being moved. Please try again in a few seconds.", 503,
+                    {'Retry-After': str(ROUTE_CACHE_SECONDS)})
 
-    return app
\ No newline at end of file
+    return app
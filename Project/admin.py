@@ -1,23 +1,94 @@
 # app/Project/admin.py
 
-from flask import Blueprint, render_template, request, g, make_response, redirect, url_for, flash, jsonify
+from flask import (Blueprint, render_template, request, g, redirect, url_for, flash, jsonify, current_app,
+                   Response, stream_with_context, abort)
 from .extensions import db
-from .models import User, Team, TimeLog, TeamSetting, AuditLog
+from .models import User, Team, TimeLog, TeamSetting, AuditLog, ApiKey, Device, WebhookEndpoint, ShiftSchedule
 from .decorators import admin_required
-from datetime import datetime
+from .database import workload
+from .timekeeping import (get_team_workday, get_team_workday_for_date, invalidate_team_workday,
+                          workday_filter, load_team_clock_settings, utcnow, DEFAULT_TIMEZONE, DEFAULT_DAY_ROLLOVER)
+from .punches import open_shifts_filter, record_punch, void_shift
+from .jointokens import make_rotating_token
+from .devices import revoke_user_devices, DEFAULT_MAX_DEVICES_PER_USER
+from .ratelimit import forget_pending_action
+from .summaries import invalidate_summaries, DEFAULT_PAY_PERIOD_DAYS, DEFAULT_PAY_PERIOD_ANCHOR
+from .dataversion import team_data_version
+from .reportcache import report_cache_key, cached_report, cache_get, cache_into
+from .compression import SECRET_FLASH_CATEGORY
+from .pdfs import pdf_cache_key, cached_pdf_response, fits_pdf_fonts, render_timesheet, render_qr_posters
+from .webhooks import (enqueue_webhook, time_log_data, generate_webhook_secret, invalidate_endpoint_cache,
+                       WEBHOOK_MAX_ENDPOINTS)
+from .digests import DIGEST_FREQUENCIES
+from .schedules import (team_attendance, parse_hhmm, late_grace, WEEKDAYS, DEFAULT_LATE_GRACE_MINUTES,
+                        ATTENDANCE_EXPORT_DAYS)
+from .exports import (export_query, export_chunks, attendance_csv_chunks, columnar_available, EXPORT_FORMATS,
+                      COLUMNAR_FORMATS, EXPORT_BATCH_SIZE)
+from collections import namedtuple
+from datetime import datetime, timedelta
 import pytz
-import csv
 import io
 import os
-from sqlalchemy import or_
-import qrcode
+from sqlalchemy import or_, func
 import base64
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
-def get_day_with_suffix(d):
-    """Helper function to format dates correctly."""
-    return f"{d}{'th' if 11<=d<=13 else {1:'st',2:'nd',3:'rd'}.get(d%10, 'th')}"
+# Timezones offered on the settings page; any valid pytz name is accepted.
+COMMON_TIMEZONES = [
+    "America/New_York", "America/Chicago", "America/Denver", "America/Phoenix",
+    "America/Los_Angeles", "America/Anchorage", "Pacific/Honolulu", "UTC",
+]
+
+# Sort keys offered by the time log table, mapped onto indexed columns.
+TIME_LOG_SORT_COLUMNS = {
+    'id': TimeLog.clock_in_at,
+    'user_name': User.name,
+    'date': TimeLog.clock_in_at,
+    'clock_in': TimeLog.clock_in_at,
+    'clock_out': TimeLog.clock_out_at,
+}
+
+# What the time log and print view show per shift; plain values, so results can be cached (see reportcache.py).
+TimeLogRow = namedtuple('TimeLogRow', ['id', 'name', 'date', 'clock_in', 'clock_out'])
+
+def time_log_rows(team_id, filter_name, filter_date, order_by):
+    query = db.session.query(TimeLog.id, User.name, TimeLog.date, TimeLog.clock_in, TimeLog.clock_out).join(
+        User, TimeLog.user_id == User.id).filter(TimeLog.team_id == team_id)
+    if filter_name:
+        query = query.filter(User.name == filter_name)
+    if filter_date:
+        query = filter_by_log_date(query, team_id, filter_date)
+    return [TimeLogRow(*row) for row in query.order_by(order_by)]
+
+def valid_log_date(filter_date):
+    """The date filter as it is applied: the date when it parses, otherwise '' (no filter)."""
+    try:
+        datetime.strptime(filter_date, "%Y-%m-%d")
+    except ValueError:
+        return ''
+    return filter_date
+
+def report_filters(team_id, filter_name, filter_date):
+    """
+    The name/date filters as part of a report cache key. A date's work day
+    depends on the team's clock settings, which are not versioned, so they are
+    part of the key too.
+    """
+    filter_date = valid_log_date(filter_date)
+    if not filter_date:
+        return (filter_name, '')
+    tz, rollover = load_team_clock_settings(team_id)
+    return (filter_name, filter_date, tz.zone, rollover.isoformat())
+
+def filter_by_log_date(query, team_id, filter_date):
+    """Restricts a TimeLog query to the team's work day for a YYYY-MM-DD date."""
+    try:
+        filter_dt = datetime.strptime(filter_date, "%Y-%m-%d")
+    except ValueError:
+        return query
+    workday = get_team_workday_for_date(team_id, filter_dt.date())
+    return query.filter(workday_filter(TimeLog.clock_in_at, workday))
 
 @admin_bp.route("/")
 @admin_required
@@ -29,14 +100,7 @@ def dashboard_redirect():
 @admin_required
 def dashboard():
     """Displays the main admin dashboard."""
-    now = datetime.now(pytz.timezone("America/Chicago"))
-    today_date = now.strftime(f"%b. {get_day_with_suffix(now.day)}, %Y")
-    
-    currently_in = TimeLog.query.filter(
-        TimeLog.team_id == g.user.team_id,
-        TimeLog.date == today_date,
-        TimeLog.clock_out == None
-    ).all()
+    currently_in = TimeLog.query.filter(open_shifts_filter(g.user.team_id)).all()
     
     super_admin_email = os.environ.get('SUPER_ADMIN_USERNAME')
     user_count = User.query.filter(
@@ -46,39 +110,42 @@ def dashboard():
 
     join_link = url_for('employee.join_team', join_token=g.user.team.join_token, _external=True)
 
-    return render_template("admin/dashboard.html", currently_in=currently_in, join_link=join_link, user_count=user_count)
+    # Today's scheduled shifts against who actually clocked in (see schedules.py).
+    workday = get_team_workday(g.user.team_id)
+    today = team_attendance(g.user.team_id, workday.day, workday.day)
+    attendance_counts = {status: sum(1 for a in today if a.status == status)
+                         for status in ('on_time', 'late', 'missing', 'absent', 'upcoming')}
+    def local(at):
+        return pytz.utc.localize(at).astimezone(workday.tz).strftime("%I:%M %p") if at else None
+    attention = [{'name': a.name, 'status': a.status, 'scheduled': local(a.scheduled_start),
+                  'clock_in': local(a.clock_in_at), 'minutes_late': a.minutes_late}
+                 for a in today if a.status in ('late', 'missing', 'absent')]
+
+    return render_template("admin/dashboard.html", currently_in=currently_in, join_link=join_link, user_count=user_count,
+                           attendance_counts=attendance_counts, attention=attention, scheduled_today=len(today))
 
 @admin_bp.route("/time_log")
 @admin_required
+@workload('reporting')
 def time_log():
     """Displays the filterable and sortable Time Clock Log page."""
-    query = TimeLog.query.join(User).filter(TimeLog.team_id == g.user.team_id)
-    
-    all_users_on_team = User.query.filter_by(team_id=g.user.team_id).order_by(User.name).all()
-    unique_names = [user.name for user in all_users_on_team]
-    
+    team_id = g.user.team_id
     filter_name = request.args.get('name', '')
     filter_date = request.args.get('date', '')
     sort_by = request.args.get('sort_by', 'id')
     sort_order = request.args.get('sort_order', 'desc')
 
-    if filter_name:
-        query = query.filter(User.name == filter_name)
-    if filter_date:
-        try:
-            filter_dt = datetime.strptime(filter_date, "%Y-%m-%d")
-            date_str = f"%b. {get_day_with_suffix(filter_dt.day)}, %Y"
-            query = query.filter(TimeLog.date == date_str)
-        except ValueError:
-            pass
-
-    sort_column = getattr(TimeLog, sort_by, TimeLog.id)
-    if sort_order == 'desc':
-        query = query.order_by(sort_column.desc())
-    else:
-        query = query.order_by(sort_column.asc())
-    
-    filtered_logs = query.all()
+    sort_key = sort_by if sort_by in TIME_LOG_SORT_COLUMNS else 'id'
+    sort_desc = sort_order == 'desc'
+    key = report_cache_key(team_id, 'time_log', sort_key, sort_desc, *report_filters(team_id, filter_name, filter_date))
+
+    def compute():
+        unique_names = [name for (name,) in db.session.query(User.name).filter_by(team_id=team_id).order_by(User.name)]
+        sort_column = TIME_LOG_SORT_COLUMNS[sort_key]
+        logs = time_log_rows(team_id, filter_name, filter_date, sort_column.desc() if sort_desc else sort_column.asc())
+        return unique_names, logs
+
+    unique_names, filtered_logs = cached_report(key, compute)
 
     return render_template(
         "admin/time_log.html", 
@@ -99,8 +166,80 @@ def users():
         User.team_id == g.user.team_id,
         or_(User.email != super_admin_email, User.email == None)
     ).order_by(User.role.desc(), User.name).all()
+
+    # Active device count and last use per user, in one grouped query.
+    device_stats = {user_id: (count, last_seen) for user_id, count, last_seen in db.session.query(
+        Device.user_id, func.count(Device.id), func.max(Device.last_seen_at)
+    ).filter(Device.team_id == g.user.team_id, Device.revoked == False).group_by(Device.user_id).all()}
     
-    return render_template("admin/users.html", users=team_users)
+    return render_template("admin/users.html", users=team_users, device_stats=device_stats)
+
+@admin_bp.route("/schedule")
+@admin_required
+def schedule():
+    """Weekly expected shifts per employee, used for lateness and no-shows on the dashboard."""
+    team_users = User.query.filter_by(team_id=g.user.team_id).order_by(User.name).all()
+    shifts = ShiftSchedule.query.filter_by(team_id=g.user.team_id).order_by(
+        ShiftSchedule.weekday, ShiftSchedule.start_time).all()
+    by_user = {}
+    for shift in shifts:
+        by_user.setdefault(shift.user_id, []).append(shift)
+    return render_template("admin/schedule.html", users=team_users, by_user=by_user, weekdays=WEEKDAYS,
+                           grace_minutes=int(late_grace(g.user.team_id).total_seconds() // 60))
+
+@admin_bp.route("/schedule/add", methods=["POST"])
+@admin_required
+def add_schedule():
+    user = User.query.filter_by(id=request.form.get("user_id", type=int), team_id=g.user.team_id).first()
+    weekdays = sorted({int(day) for day in request.form.getlist("weekdays") if day.isdigit() and int(day) < 7})
+    start_time, end_time = request.form.get("start_time", ""), request.form.get("end_time", "")
+    if not user or not weekdays:
+        flash("Please choose an employee and at least one day.", "error")
+        return redirect(url_for('admin.schedule'))
+    try:
+        parse_hhmm(start_time), parse_hhmm(end_time)
+    except ValueError:
+        flash("Shift times must be in HH:MM format.", "error")
+        return redirect(url_for('admin.schedule'))
+    if start_time == end_time:
+        flash("A shift cannot start and end at the same time.", "error")
+        return redirect(url_for('admin.schedule'))
+
+    for weekday in weekdays:
+        db.session.add(ShiftSchedule(team_id=g.user.team_id, user_id=user.id, weekday=weekday,
+                                     start_time=start_time, end_time=end_time))
+    db.session.commit()
+    flash(f"Added {len(weekdays)} shift{'s' if len(weekdays) != 1 else ''} for {user.name}.", "success")
+    return redirect(url_for('admin.schedule'))
+
+@admin_bp.route("/schedule/delete/<int:schedule_id>", methods=["POST"])
+@admin_required
+def delete_schedule(schedule_id):
+    shift = ShiftSchedule.query.filter_by(id=schedule_id, team_id=g.user.team_id).first_or_404()
+    db.session.delete(shift)
+    db.session.commit()
+    flash("Scheduled shift removed.", "success")
+    return redirect(url_for('admin.schedule'))
+
+@admin_bp.route("/schedule/grace", methods=["POST"])
+@admin_required
+def schedule_grace():
+    """Saves how many minutes after a scheduled start a clock-in still counts as on time."""
+    try:
+        minutes = int(request.form.get("grace_minutes") or DEFAULT_LATE_GRACE_MINUTES)
+    except ValueError:
+        minutes = -1
+    if not 0 <= minutes <= 120:
+        flash("The grace period must be between 0 and 120 minutes.", "error")
+        return redirect(url_for('admin.schedule'))
+    setting = TeamSetting.query.filter_by(team_id=g.user.team_id, name='LateGraceMinutes').first()
+    if setting:
+        setting.value = str(minutes)
+    else:
+        db.session.add(TeamSetting(team_id=g.user.team_id, name='LateGraceMinutes', value=str(minutes)))
+    db.session.commit()
+    flash("Grace period updated.", "success")
+    return redirect(url_for('admin.schedule'))
 
 @admin_bp.route("/profile", methods=["GET", "POST"])
 @admin_required
@@ -146,62 +285,306 @@ def settings():
         return redirect(url_for('admin.settings'))
 
     current_settings = get_team_settings(g.user.team_id)
-    return render_template("admin/settings.html", settings=current_settings)
+    api_keys = ApiKey.query.filter_by(team_id=g.user.team_id, revoked=False).order_by(ApiKey.created_at.desc()).all()
+    webhooks = WebhookEndpoint.query.filter_by(team_id=g.user.team_id).order_by(WebhookEndpoint.created_at).all()
+    return render_template("admin/settings.html", settings=current_settings, timezones=COMMON_TIMEZONES, api_keys=api_keys,
+                           webhooks=webhooks)
+
+@admin_bp.route("/settings/timezone", methods=["POST"])
+@admin_required
+def timezone_settings():
+    """Saves the team's timezone, work-day rollover time and pay period (available on every plan)."""
+    tz_name = request.form.get("timezone") or DEFAULT_TIMEZONE
+    rollover = request.form.get("day_rollover") or DEFAULT_DAY_ROLLOVER
+
+    if tz_name not in pytz.all_timezones_set:
+        flash(f"Unknown timezone '{tz_name}'.", "error")
+        return redirect(url_for('admin.settings'))
+    try:
+        datetime.strptime(rollover, "%H:%M")
+    except ValueError:
+        flash("The day rollover time must be in HH:MM format.", "error")
+        return redirect(url_for('admin.settings'))
+    pay_period_days = request.form.get("pay_period_days") or str(DEFAULT_PAY_PERIOD_DAYS)
+    pay_period_anchor = request.form.get("pay_period_anchor") or DEFAULT_PAY_PERIOD_ANCHOR.isoformat()
+    if pay_period_days not in ('7', '14'):
+        flash("The pay period must be weekly or every two weeks.", "error")
+        return redirect(url_for('admin.settings'))
+    try:
+        datetime.strptime(pay_period_anchor, "%Y-%m-%d")
+    except ValueError:
+        flash("The pay period start must be a date.", "error")
+        return redirect(url_for('admin.settings'))
+
+    for name, value in {'Timezone': tz_name, 'DayRolloverTime': rollover,
+                        'PayPeriodDays': pay_period_days, 'PayPeriodAnchor': pay_period_anchor}.items():
+        setting = TeamSetting.query.filter_by(team_id=g.user.team_id, name=name).first()
+        if setting:
+            setting.value = value
+        else:
+            db.session.add(TeamSetting(team_id=g.user.team_id, name=name, value=value))
+
+    # Work-day boundaries and pay periods feed the cached dashboard summaries.
+    invalidate_summaries(team_id=g.user.team_id)
+    db.session.commit()
+    invalidate_team_workday(g.user.team_id)
+    flash("Timezone settings updated successfully.", "success")
+    return redirect(url_for('admin.settings'))
+
+@admin_bp.route("/settings/rotating_qr", methods=["POST"])
+@admin_required
+def rotating_qr_settings():
+    """Turns rotating kiosk QR codes on or off. While on, the static printed QR code stops working."""
+    value = "TRUE" if request.form.get("rotating_qr_enabled") == "on" else "FALSE"
+    setting = TeamSetting.query.filter_by(team_id=g.user.team_id, name='RotatingQrEnabled').first()
+    if setting:
+        setting.value = value
+    else:
+        db.session.add(TeamSetting(team_id=g.user.team_id, name='RotatingQrEnabled', value=value))
+    db.session.commit()
+    if value == "TRUE":
+        flash("Rotating QR codes enabled. Employees must now scan the code on the kiosk display.", "success")
+    else:
+        flash("Rotating QR codes disabled. The printed QR code works again.", "success")
+    return redirect(url_for('admin.settings'))
+
+@admin_bp.route("/settings/digest", methods=["POST"])
+@admin_required
+def digest_settings():
+    """Chooses how often team admins get the attendance digest email (see digests.py)."""
+    frequency = request.form.get("digest_frequency") or 'off'
+    if frequency not in DIGEST_FREQUENCIES:
+        flash("Please choose a valid digest frequency.", "error")
+        return redirect(url_for('admin.settings'))
+    setting = TeamSetting.query.filter_by(team_id=g.user.team_id, name='DigestFrequency').first()
+    if setting:
+        setting.value = frequency
+    else:
+        db.session.add(TeamSetting(team_id=g.user.team_id, name='DigestFrequency', value=frequency))
+    db.session.commit()
+    if frequency == 'off':
+        flash("Attendance digest emails turned off.", "success")
+    else:
+        flash(f"Admins will get a {frequency} attendance digest by email.", "success")
+    return redirect(url_for('admin.settings'))
+
+@admin_bp.route("/settings/devices", methods=["POST"])
+@admin_required
+def device_settings():
+    """Saves how many phones/tablets each employee may register."""
+    try:
+        max_devices = int(request.form.get("max_devices") or DEFAULT_MAX_DEVICES_PER_USER)
+    except ValueError:
+        flash("The device limit must be a whole number.", "error")
+        return redirect(url_for('admin.settings'))
+    if not 1 <= max_devices <= 10:
+        flash("The device limit must be between 1 and 10.", "error")
+        return redirect(url_for('admin.settings'))
+
+    setting = TeamSetting.query.filter_by(team_id=g.user.team_id, name='MaxDevicesPerUser').first()
+    if setting:
+        setting.value = str(max_devices)
+    else:
+        db.session.add(TeamSetting(team_id=g.user.team_id, name='MaxDevicesPerUser', value=str(max_devices)))
+    db.session.commit()
+    flash("Device settings updated successfully.", "success")
+    return redirect(url_for('admin.settings'))
+
+@admin_bp.route("/settings/api_keys", methods=["POST"])
+@admin_required
+def create_api_key():
+    """Creates a key for a badge reader or kiosk to use with the punch API."""
+    from .api import generate_api_key
+
+    if g.user.team.plan != 'Pro':
+        flash("The punch API is a Pro feature. Please upgrade to create device keys.", "error")
+        return redirect(url_for('admin.settings'))
+
+    name = (request.form.get("name") or "").strip() or "Device"
+    key, key_hash, key_prefix = generate_api_key()
+    db.session.add(ApiKey(team_id=g.user.team_id, name=name, key_hash=key_hash, key_prefix=key_prefix))
+    db.session.commit()
+    flash(f"API key for '{name}' created. Copy it now, it will not be shown again: {key}", SECRET_FLASH_CATEGORY)
+    return redirect(url_for('admin.settings'))
+
+@admin_bp.route("/settings/api_keys/revoke/<int:key_id>", methods=["POST"])
+@admin_required
+def revoke_api_key(key_id):
+    api_key = ApiKey.query.filter_by(id=key_id, team_id=g.user.team_id).first_or_404()
+    api_key.revoked = True
+    db.session.commit()
+    flash(f"API key '{api_key.name}' has been revoked.", "success")
+    return redirect(url_for('admin.settings'))
+
+@admin_bp.route("/settings/webhooks", methods=["POST"])
+@admin_required
+def create_webhook():
+    """Registers a URL to receive signed clock-in/out and time log events."""
+    if g.user.team.plan != 'Pro':
+        flash("Webhooks are a Pro feature. Please upgrade to add endpoints.", "error")
+        return redirect(url_for('admin.settings'))
+
+    url = (request.form.get("url") or "").strip()
+    if not (url.startswith("https://") or (current_app.debug and url.startswith("http://"))) or len(url) > 500:
+        flash("Please enter a valid https:// URL.", "error")
+        return redirect(url_for('admin.settings'))
+    if WebhookEndpoint.query.filter_by(team_id=g.user.team_id).count() >= WEBHOOK_MAX_ENDPOINTS:
+        flash(f"A team can have at most {WEBHOOK_MAX_ENDPOINTS} webhook endpoints.", "error")
+        return redirect(url_for('admin.settings'))
+
+    secret = generate_webhook_secret()
+    db.session.add(WebhookEndpoint(team_id=g.user.team_id, url=url, secret=secret))
+    db.session.commit()
+    invalidate_endpoint_cache(g.user.team_id)
+    flash(f"Webhook added. Its signing secret will not be shown again: {secret}", SECRET_FLASH_CATEGORY)
+    return redirect(url_for('admin.settings'))
+
+@admin_bp.route("/settings/webhooks/toggle/<int:endpoint_id>", methods=["POST"])
+@admin_required
+def toggle_webhook(endpoint_id):
+    endpoint = WebhookEndpoint.query.filter_by(id=endpoint_id, team_id=g.user.team_id).first_or_404()
+    endpoint.active = not endpoint.active
+    if endpoint.active:
+        # Resumes with whatever is still queued, including events that had given up.
+        endpoint.consecutive_failures = 0
+        endpoint.retry_after = None
+        endpoint.deliveries.filter_by(dead=True).update({'dead': False, 'attempts': 0, 'next_attempt_at': utcnow()},
+                                                       synchronize_session=False)
+    db.session.commit()
+    invalidate_endpoint_cache(g.user.team_id)
+    flash(f"Webhook {'enabled' if endpoint.active else 'paused'}.", "success")
+    return redirect(url_for('admin.settings'))
+
+@admin_bp.route("/settings/webhooks/delete/<int:endpoint_id>", methods=["POST"])
+@admin_required
+def delete_webhook(endpoint_id):
+    endpoint = WebhookEndpoint.query.filter_by(id=endpoint_id, team_id=g.user.team_id).first_or_404()
+    endpoint.deliveries.delete(synchronize_session=False)  # In bulk rather than one ORM delete per queued event.
+    db.session.delete(endpoint)
+    db.session.commit()
+    invalidate_endpoint_cache(g.user.team_id)
+    flash("Webhook deleted.", "success")
+    return redirect(url_for('admin.settings'))
+
+def export_response(fmt):
+    """
+    Streams the time log, with the page's name/date filters, in one of
+    EXPORT_FORMATS. A finished export is kept in the report cache, so asking
+    again before the data changes is served from memory.
+    """
+    team_id = g.user.team_id
+    filter_name = request.args.get('name', '')
+    filter_date = request.args.get('date', '')
+    # Excel cells are in the team's timezone, so the clock settings are always part of the key.
+    tz, rollover = load_team_clock_settings(team_id)
+    key = report_cache_key(team_id, 'export', fmt, filter_name, valid_log_date(filter_date),
+                           tz.zone, rollover.isoformat())
+
+    mimetype, extension = EXPORT_FORMATS[fmt]
+    body = cache_get(key)
+    if body is None:
+        query = export_query([team_id])
+        if filter_name: query = query.filter(User.name == filter_name)
+        if filter_date: query = filter_by_log_date(query, team_id, filter_date)
+        body = stream_with_context(cache_into(key, export_chunks(fmt, query.yield_per(EXPORT_BATCH_SIZE))))
+    response = Response(body, mimetype=mimetype)
+    response.headers["Content-Disposition"] = f"attachment; filename=timesheet_export_{datetime.now().strftime('%Y-%m-%d')}.{extension}"
+    return response
 
 @admin_bp.route("/export_csv")
 @admin_required
+@workload('reporting')
 def export_csv():
     """Generates and downloads a CSV file based on the current filters."""
-    query = TimeLog.query.join(User).filter(TimeLog.team_id == g.user.team_id)
-    filter_name = request.args.get('name', '')
-    filter_date = request.args.get('date', '')
-    if filter_name: query = query.filter(User.name == filter_name)
-    if filter_date:
-        try:
-            filter_dt = datetime.strptime(filter_date, "%Y-%m-%d")
-            date_str = f"%b. {get_day_with_suffix(filter_dt.day)}, %Y"
-            query = query.filter(TimeLog.date == date_str)
-        except ValueError: pass
-    
-    filtered_logs = query.order_by(TimeLog.id.desc()).all()
-    logs_for_csv = [{'Name': log.user.name, 'Date': log.date, 'Clock In': log.clock_in, 'Clock Out': log.clock_out} for log in filtered_logs]
-    
-    output = io.StringIO()
-    if logs_for_csv:
-        writer = csv.DictWriter(output, fieldnames=['Name', 'Date', 'Clock In', 'Clock Out'])
-        writer.writeheader()
-        writer.writerows(logs_for_csv)
-
-    response = make_response(output.getvalue())
-    response.headers["Content-Disposition"] = f"attachment; filename=timesheet_export_{datetime.now().strftime('%Y-%m-%d')}.csv"
-    response.headers["Content-type"] = "text/csv"
+    return export_response('csv')
+
+@admin_bp.route("/export/attendance")
+@admin_required
+@workload('reporting')
+def export_attendance():
+    """Scheduled shifts vs actual clock-ins as CSV: the filtered day, or the last ATTENDANCE_EXPORT_DAYS days."""
+    workday = get_team_workday(g.user.team_id)
+    first_day = last_day = workday.day
+    try:
+        first_day = last_day = datetime.strptime(request.args.get('date', ''), "%Y-%m-%d").date()
+    except ValueError:
+        first_day = workday.day - timedelta(days=ATTENDANCE_EXPORT_DAYS - 1)
+
+    user_id = None
+    if request.args.get('name'):
+        user = User.query.filter_by(team_id=g.user.team_id, name=request.args['name']).first()
+        user_id = user.id if user else -1
+    records = team_attendance(g.user.team_id, first_day, last_day, user_id=user_id)
+
+    response = Response(stream_with_context(attendance_csv_chunks(records, workday.tz)), mimetype='text/csv')
+    response.headers["Content-Disposition"] = f"attachment; filename=attendance_{first_day}_{last_day}.csv"
     return response
 
+@admin_bp.route("/export/<fmt>")
+@admin_required
+@workload('reporting')
+def export_file(fmt):
+    """Downloads the filtered time log as xlsx, parquet or arrow (see exports.py)."""
+    if fmt not in EXPORT_FORMATS:
+        abort(404)
+    if fmt in COLUMNAR_FORMATS and not columnar_available():
+        flash("Parquet and Arrow exports need the pyarrow package installed on the server.", "error")
+        return redirect(url_for('admin.time_log'))
+    return export_response(fmt)
+
 @admin_bp.route("/print_view")
 @admin_required
+@workload('reporting')
 def print_view():
     """Generates a clean, printer-friendly view of the filtered data."""
     # This function appears to be duplicated in your original file. I have removed the duplicate.
-    query = TimeLog.query.join(User).filter(TimeLog.team_id == g.user.team_id)
+    team_id = g.user.team_id
     filter_name = request.args.get('name', '')
     filter_date = request.args.get('date', '')
-    if filter_name: query = query.filter(User.name == filter_name)
-    if filter_date:
-        try:
-            filter_dt = datetime.strptime(filter_date, "%Y-%m-%d")
-            date_str = f"%b. {get_day_with_suffix(filter_dt.day)}, %Y"
-            query = query.filter(TimeLog.date == date_str)
-        except ValueError: pass
-        
-    filtered_logs = query.order_by(TimeLog.id.desc()).all()
+    key = report_cache_key(team_id, 'print_view', *report_filters(team_id, filter_name, filter_date))
+    filtered_logs = cached_report(key, lambda: time_log_rows(team_id, filter_name, filter_date,
+                                                             TimeLog.clock_in_at.desc()))
     
-    generation_time = datetime.now(pytz.timezone("America/Chicago")).strftime("%Y-%m-%d %I:%M %p")
+    generation_time = datetime.now(get_team_workday(g.user.team_id).tz).strftime("%Y-%m-%d %I:%M %p")
     return render_template("admin/print_view.html",
                            logs=filtered_logs,
                            filter_name=filter_name,
                            filter_date=filter_date,
                            generation_time=generation_time)
 
+@admin_bp.route("/print_view/pdf")
+@admin_required
+@workload('reporting')
+def print_view_pdf():
+    """The filtered timesheet as a PDF, streamed page by page and cached until the team's data changes."""
+    team_id, team_name = g.user.team_id, g.user.team.name
+    filter_name = request.args.get('name', '')
+    filter_date = request.args.get('date', '')
+    tz, rollover = load_team_clock_settings(team_id)
+    key = pdf_cache_key('timesheet', team_id, team_data_version(team_id), team_name,
+                        filter_name, filter_date, tz.zone, rollover)
+
+    def filtered():
+        query = export_query([team_id])
+        if filter_name: query = query.filter(User.name == filter_name)
+        if filter_date: query = filter_by_log_date(query, team_id, filter_date)
+        return query
+
+    names = [name for (name,) in filtered().with_entities(User.name).order_by(None).distinct()]
+    if not fits_pdf_fonts(team_name, filter_name, *names):
+        flash("Some names use characters the PDF cannot show, so this is the print view instead. "
+              "Use your browser's Print to save it as a PDF.", "warning")
+        return redirect(url_for('admin.print_view', name=filter_name or None, date=filter_date or None))
+
+    def render():
+        query = filtered()
+        rows = ((row.name, row.date, row.clock_in, row.clock_out) for row in query.yield_per(EXPORT_BATCH_SIZE))
+        filters = f"Employee: {filter_name or 'All'}   Date: {filter_date or 'All'}"
+        generated = datetime.now(tz).strftime("%Y-%m-%d %I:%M %p")
+        return render_timesheet(rows, f"Timesheet - {team_name}", f"{filters}   Generated: {generated}")
+
+    return cached_pdf_response(key, f"timesheet_{filter_date or datetime.now(tz).strftime('%Y-%m-%d')}.pdf", render)
+
 @admin_bp.route("/users/set_role/<int:user_id>", methods=["POST"])
 @admin_required
 def set_user_role(user_id):
@@ -244,26 +627,35 @@ def delete_user(user_id):
 @admin_required
 def clear_user_token(user_id):
     target_user = User.query.filter_by(id=user_id, team_id=g.user.team_id).first_or_404()
-    target_user.device_token = None
+    revoke_user_devices(target_user)
     db.session.commit()
-    flash(f"Device token for {target_user.name} has been cleared. They can now re-register a new device.", "success")
+    forget_pending_action(None, user_id=target_user.id)
+    flash(f"Devices for {target_user.name} have been cleared. They can now register new devices.", "success")
     return redirect(url_for('admin.users'))
 
 @admin_bp.route("/api/dashboard_data")
 @admin_required
 def api_dashboard_data():
-    now = datetime.now(pytz.timezone("America/Chicago"))
-    today_date = now.strftime(f"%b. {get_day_with_suffix(now.day)}, %Y")
-    currently_in = TimeLog.query.filter(TimeLog.team_id == g.user.team_id, TimeLog.date == today_date, TimeLog.clock_out == None).all()
-    data = [{'Name': log.user.name, 'Clock In': log.clock_in, 'id': log.id} for log in currently_in]
-    return jsonify(data)
+    team_id = g.user.team_id
+    # Open shifts also close by age (MAX_SHIFT), so the result is keyed to the minute as well.
+    minute = utcnow().replace(second=0, microsecond=0)
+    key = report_cache_key(team_id, 'dashboard_data', minute)
+
+    def compute():
+        rows = db.session.query(TimeLog.id, User.name, TimeLog.clock_in).join(User, TimeLog.user_id == User.id).filter(
+            open_shifts_filter(team_id, minute))
+        return [{'Name': name, 'Clock In': clock_in, 'id': log_id} for log_id, name, clock_in in rows]
+
+    return jsonify(cached_report(key, compute))
 
 @admin_bp.route("/fix_clock_out/<int:log_id>", methods=["POST"])
 @admin_required
 def fix_clock_out(log_id):
     log_entry = TimeLog.query.filter_by(id=log_id, team_id=g.user.team_id).first()
-    if log_entry:
-        log_entry.clock_out = datetime.now(pytz.timezone("America/Chicago")).strftime("%I:%M:%S %p")
+    if log_entry and log_entry.clock_out_at is None:
+        # Recorded as an admin punch that closes exactly this shift, even if it was forgotten days ago.
+        record_punch(log_entry.user, 'out', source='admin', pairs_with_id=log_entry.clock_in_event_id)
+        enqueue_webhook(g.user.team_id, 'time_log.updated', time_log_data(log_entry))
         db.session.commit()
     return redirect(url_for('admin.dashboard'))
 
@@ -271,13 +663,15 @@ def fix_clock_out(log_id):
 @admin_required
 def delete_time_log(log_id):
     log_entry = TimeLog.query.filter_by(id=log_id, team_id=g.user.team_id).first_or_404()
-    db.session.delete(log_entry)
+    enqueue_webhook(g.user.team_id, 'time_log.deleted', time_log_data(log_entry))
+    void_shift(log_entry)
     db.session.commit()
     flash("Time log entry has been successfully deleted.", "success")
     return redirect(url_for('admin.time_log'))
 
 @admin_bp.route("/audit_log")
 @admin_required
+@workload('reporting')
 def audit_log():
     logs = AuditLog.query.filter_by(team_id=g.user.team_id).order_by(AuditLog.timestamp.desc()).all()
     return render_template("admin/audit_log.html", logs=logs)
@@ -285,6 +679,7 @@ def audit_log():
 @admin_bp.route("/generate_qr_code")
 @admin_required
 def generate_qr_code():
+    import qrcode  # Pulls in Pillow; only the QR routes need it.
     join_link = url_for('employee.join_team', join_token=g.user.team.join_token, _external=True)
     qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_L, box_size=10, border=4)
     qr.add_data(join_link)
@@ -302,6 +697,8 @@ def print_qr_code():
     Generates a QR code from the team's join link AND renders the
     branded, printer-friendly page all in one step.
     """
+    import qrcode  # Pulls in Pillow; only the QR routes need it.
+
     # 1. Build the join link
     join_link = url_for('employee.join_team', join_token=g.user.team.join_token, _external=True)
 
@@ -326,6 +723,35 @@ def print_qr_code():
     # 5. Render the beautiful print template with the image data
     return render_template("admin/print_qr.html", qr_code_image_src=qr_code_image_src)
 
+@admin_bp.route("/print_qr_code/pdf")
+@admin_required
+def print_qr_code_pdf():
+    """The join QR code as a print-ready PDF poster. It only changes with the join link or team name."""
+    join_link = url_for('employee.join_team', join_token=g.user.team.join_token, _external=True)
+    team_name = g.user.team.name
+    if not fits_pdf_fonts(team_name):
+        flash("The team name uses characters the PDF cannot show, so this is the print view instead.", "warning")
+        return redirect(url_for('admin.print_qr_code'))
+    key = pdf_cache_key('qr_poster', team_name, join_link)
+    return cached_pdf_response(key, "qr_poster.pdf", lambda: render_qr_posters([(team_name, join_link)]))
+
+@admin_bp.route("/kiosk")
+@admin_required
+def kiosk_display():
+    """Full-screen page for a tablet at the door that shows the rotating QR code."""
+    return render_template("admin/kiosk.html", team_name=g.user.team.name)
+
+@admin_bp.route("/kiosk/token")
+@admin_required
+def kiosk_token():
+    """Polled by the kiosk display; returns the current join link and when to fetch the next one."""
+    token, expires_in = make_rotating_token(g.user.team_id)
+    return jsonify({
+        "join_link": url_for('employee.join_team', join_token=token, _external=True),
+        "expires_in": round(expires_in, 1),
+        "period": current_app.config.get('ROTATING_QR_PERIOD_SECONDS'),
+    })
+
 @admin_bp.route("/users/toggle_floating/<int:user_id>", methods=["POST"])
 @admin_required
 def toggle_floating_user(user_id):
@@ -0,0 +1,256 @@
+# app/Project/api.py
+
+from flask import Blueprint, request, jsonify, g
+from .extensions import db
+from .models import User, AuditLog, ApiKey, PunchEvent, Device
+from .devices import hash_device_token
+from .database import workload
+from .punches import ShiftProjector, MAX_SHIFT
+from .changes import changes_since, DEFAULT_CHANGES_PAGE_SIZE
+from .webhooks import enqueue_webhook, punch_data
+from .timekeeping import utcnow
+from collections import defaultdict
+from datetime import datetime, timedelta
+from functools import wraps
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+import hashlib
+import secrets
+import pytz
+
+api_bp = Blueprint('api', __name__, url_prefix='/api/v1')
+
+MAX_PUNCHES_PER_BATCH = 1000
+# Offline kiosks may upload punches that are days old, but not arbitrarily old.
+MAX_PUNCH_AGE = timedelta(days=7)
+# Allowed clock skew for punches stamped slightly in the future.
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+
+
+# --- API keys ---
+def hash_api_key(key):
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+def generate_api_key():
+    """Returns (plaintext_key, key_hash, key_prefix). The plaintext is shown to the admin once."""
+    key = f"qrk_{secrets.token_urlsafe(32)}"
+    return key, hash_api_key(key), key[:12]
+
+def api_key_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        auth_header = request.headers.get('Authorization', '')
+        key = auth_header[7:].strip() if auth_header.startswith('Bearer ') else None
+        api_key = ApiKey.query.filter_by(key_hash=hash_api_key(key), revoked=False).first() if key else None
+        if not api_key:
+            return jsonify({'error': 'invalid_api_key'}), 401
+        if api_key.team.plan != 'Pro':
+            return jsonify({'error': 'The punch API is a Pro feature.'}), 403
+        api_key.last_used_at = utcnow()
+        g.api_key = api_key
+        g.api_team = api_key.team
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+# --- Punch ingestion ---
+def parse_punch_time(value):
+    """Parses an ISO-8601 timestamp into naive UTC; naive input is taken to be UTC."""
+    if not isinstance(value, str):
+        raise ValueError("timestamp must be an ISO-8601 string")
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(pytz.utc).replace(tzinfo=None)
+    return parsed.replace(microsecond=0)
+
+def ingest_punches(team, punches):
+    """
+    Validates a batch of punches for one team and appends them to the punch log
+    in a single transaction. Each punch is {"id", "user_id" | "device_token",
+    "timestamp", "action"?, "lat"?, "lon"?}; without an explicit "in"/"out"
+    action a punch toggles the user's state, exactly like the kiosk flow.
+    Returns one result dict per punch, in order.
+    """
+    from .employee import get_team_settings, check_geofence
+
+    results = [None] * len(punches)
+    now = utcnow()
+    settings = get_team_settings(team.id)
+    location_check_required = settings.get('LocationVerificationEnabled') == 'TRUE'
+
+    def reject(index, punch, error):
+        results[index] = {'index': index, 'id': punch.get('id') if isinstance(punch, dict) else None,
+                          'status': 'rejected', 'error': error}
+
+    # 1. Shape validation and user resolution (one query per kind of identifier).
+    parsed = []
+    user_ids, device_tokens = set(), set()
+    for index, punch in enumerate(punches):
+        if not isinstance(punch, dict):
+            reject(index, punch, 'punch must be an object')
+            continue
+        try:
+            at = parse_punch_time(punch.get('timestamp'))
+        except ValueError as e:
+            reject(index, punch, f'invalid timestamp: {e}')
+            continue
+        if at > now + MAX_CLOCK_SKEW or at < now - MAX_PUNCH_AGE:
+            reject(index, punch, 'timestamp out of accepted range')
+            continue
+        action = punch.get('action')
+        if action not in (None, 'in', 'out'):
+            reject(index, punch, "action must be 'in' or 'out'")
+            continue
+        if punch.get('user_id') is not None:
+            try:
+                user_ids.add(int(punch['user_id']))
+            except (TypeError, ValueError):
+                reject(index, punch, 'invalid user_id')
+                continue
+        elif punch.get('device_token'):
+            device_tokens.add(punch['device_token'])
+        else:
+            reject(index, punch, 'user_id or device_token is required')
+            continue
+        parsed.append((index, punch, at, action))
+
+    users_by_id = {u.id: u for u in User.query.filter(
+        User.team_id == team.id, User.id.in_(user_ids)).all()} if user_ids else {}
+    users_by_token = {}
+    if device_tokens:
+        hashes = {hash_device_token(token): token for token in device_tokens}
+        rows = db.session.query(Device.token_hash, User).join(User, Device.user_id == User.id).filter(
+            Device.token_hash.in_(list(hashes)), Device.revoked == False, User.team_id == team.id).all()
+        users_by_token = {hashes[token_hash]: user for token_hash, user in rows}
+
+    by_user, users = defaultdict(list), {}
+    for index, punch, at, action in parsed:
+        user = users_by_id.get(int(punch['user_id'])) if punch.get('user_id') is not None else users_by_token.get(punch['device_token'])
+        if not user:
+            reject(index, punch, 'unknown user for this team')
+            continue
+        by_user[user.id].append((index, punch, at, action))
+        users[user.id] = user
+
+    # 2. Load the state every punch depends on: existing punches at the same
+    #    instants (duplicates), each user's latest punch and their open shifts.
+    projector = ShiftProjector(team.id)
+    existing, latest = set(), {}
+    if by_user:
+        uids = list(by_user.keys())
+        times = {item[2] for items in by_user.values() for item in items}
+        existing = set(db.session.query(PunchEvent.user_id, PunchEvent.occurred_at).filter(
+            PunchEvent.user_id.in_(uids), PunchEvent.occurred_at.in_(times)).all())
+        latest = dict(db.session.query(PunchEvent.user_id, func.max(PunchEvent.occurred_at)).filter(
+            PunchEvent.user_id.in_(uids), PunchEvent.voided == False).group_by(PunchEvent.user_id).all())
+        projector.load_open_shifts(uids)
+
+    # 3. Decide each user's punches in time order, then insert them all at once.
+    accepted, to_apply, rebuild_from = [], [], {}
+    for user_id, items in by_user.items():
+        open_shift = projector.open_shift(user_id, now)
+        open_since = open_shift.clock_in_at if open_shift else None
+        for index, punch, at, action in sorted(items, key=lambda item: item[2]):
+            if (user_id, at) in existing:
+                results[index] = {'index': index, 'id': punch.get('id'), 'status': 'duplicate'}
+                continue
+
+            if location_check_required:
+                try:
+                    within, distance_feet, _ = check_geofence(settings, punch.get('lat'), punch.get('lon'))
+                except (TypeError, ValueError, AttributeError):
+                    reject(index, punch, 'location required and could not be verified')
+                    continue
+                if not within:
+                    db.session.add(AuditLog(team_id=team.id, user_id=user_id, event_type="Geofence Failure",
+                                            details=f"API punch failed. User was {int(distance_feet)} feet from the geofence center."))
+                    reject(index, punch, 'outside_geofence')
+                    continue
+
+            out_of_order = latest.get(user_id) is not None and at < latest[user_id]
+            if out_of_order:
+                # The state at a past instant is only known after replaying, so
+                # late punches must say what they are.
+                if action is None:
+                    reject(index, punch, 'out-of-order punch requires an explicit action')
+                    continue
+                kind = action
+                rebuild_from[user_id] = min(rebuild_from.get(user_id, at), at)
+            else:
+                is_open = open_since is not None and at - open_since <= MAX_SHIFT
+                if action == 'in' and is_open:
+                    reject(index, punch, 'already_clocked_in')
+                    continue
+                if action == 'out' and not is_open:
+                    reject(index, punch, 'not_clocked_in')
+                    continue
+                kind = action or ('out' if is_open else 'in')
+                open_since = at if kind == 'in' else None
+                latest[user_id] = at
+
+            event = projector.append(user_id, kind, at, 'api', flush=False)
+            existing.add((user_id, at))
+            accepted.append(event)
+            if not out_of_order:
+                to_apply.append(event)
+            results[index] = {'index': index, 'id': punch.get('id'),
+                              'status': 'clock_in' if kind == 'in' else 'clock_out'}
+
+    db.session.flush()
+    for event in sorted(to_apply, key=lambda e: e.occurred_at):
+        if event.user_id not in rebuild_from:
+            projector.apply(event)
+    for user_id, since in rebuild_from.items():
+        projector.rebuild(user_id, since=since)
+    for event in accepted:
+        enqueue_webhook(team.id, 'clock_in' if event.kind == 'in' else 'clock_out', punch_data(users[event.user_id], event))
+
+    db.session.commit()
+    return results
+
+
+@api_bp.route("/punches", methods=["POST"])
+@api_key_required
+@workload('kiosk')
+def post_punches():
+    """Accepts a batch of punches from a badge reader or an offline kiosk's upload queue."""
+    payload = request.get_json(silent=True)
+    punches = payload.get('punches') if isinstance(payload, dict) else None
+    if not isinstance(punches, list):
+        return jsonify({'error': "body must be a JSON object with a 'punches' list"}), 400
+    if len(punches) > MAX_PUNCHES_PER_BATCH:
+        return jsonify({'error': f'at most {MAX_PUNCHES_PER_BATCH} punches per batch'}), 413
+
+    try:
+        results = ingest_punches(g.api_team, punches)
+    except IntegrityError:
+        # Another upload for the same user committed first. Retrying is safe:
+        # punches already stored are reported as duplicates.
+        db.session.rollback()
+        return jsonify({'error': 'conflict', 'retry': True}), 409
+    accepted = sum(1 for r in results if r['status'] in ('clock_in', 'clock_out'))
+    return jsonify({
+        'accepted': accepted,
+        'duplicates': sum(1 for r in results if r['status'] == 'duplicate'),
+        'rejected': sum(1 for r in results if r['status'] == 'rejected'),
+        'results': results,
+    })
+
+
+# --- Change feed ---
+@api_bp.route("/time_logs/changes", methods=["GET"])
+@api_key_required
+@workload('reporting')
+def time_log_changes():
+    """
+    Time log rows created, edited or deleted since `cursor`, for payroll syncs.
+    Keep calling with the returned `next_cursor` until `has_more` is false, then
+    store it for the next run.
+    """
+    try:
+        limit = int(request.args.get('limit', DEFAULT_CHANGES_PAGE_SIZE))
+        changes, next_cursor, has_more = changes_since(g.api_team.id, request.args.get('cursor'), limit)
+    except ValueError:
+        return jsonify({'error': 'invalid cursor or limit'}), 400
+    db.session.commit()  # Saves api_key.last_used_at.
+    return jsonify({'changes': changes, 'next_cursor': next_cursor, 'has_more': has_more})
@@ -1,13 +1,22 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session, current_app
-from .extensions import db, bcrypt, mail  # <-- CORRECT: Get tools from the central hub
+from .extensions import db, mail  # <-- CORRECT: Get tools from the central hub
 from .models import User, Team, TeamSetting # <-- CORRECT: Get data blueprints from models
+from .database import workload
+from .devices import resolve_device
+from .jointokens import rotating_qr_required
+from .ratelimit import rate_limited, remember_pending_action, restore_pending_action
+from .passwords import hash_password, verify_password, needs_rehash
+from .sharding import route_by_key, route_to_team, team_for_key
 from flask_mail import Message
+from concurrent.futures import TimeoutError as HashTimeoutError
 import random
 import os
 
 auth_bp = Blueprint('auth', __name__)
 
 @auth_bp.route("/")
+@workload('kiosk')
+@rate_limited('device', 'ip')
 def home():
     # --- THIS IS THE FIX ---
     # Check if the user just came from the logout page.
@@ -19,10 +28,19 @@ def home():
     # If they are a genuine new or returning visitor, run the auto-clock-in logic.
     device_token = request.cookies.get('device_token')
     if device_token:
-        user = User.query.filter_by(device_token=device_token).first()
+        # A phone reloading the page reuses the action prepared a moment ago.
+        if restore_pending_action(device_token):
+            return redirect(url_for('employee.confirm_entry'))
+        user = resolve_device(device_token)
+        if user and rotating_qr_required(user.team_id):
+            # The team only accepts the kiosk screen's rotating code, so opening
+            # the site is not proof of being there.
+            flash("Scan the QR code on the kiosk screen to clock in or out.", "error")
+            return redirect(url_for('employee.scan'))
         if user:
             from .employee import prepare_and_store_action
             prepare_and_store_action(user)
+            remember_pending_action(device_token)
             return redirect(url_for('employee.confirm_entry'))
             
     return render_template("marketing/index.html")
@@ -53,8 +71,8 @@ def admin_signup():
         password = request.form.get('password')
         role = request.form.get('role') or 'Admin'
 
-        # Prevent duplicate emails
-        if User.query.filter_by(email=email).first():
+        # Prevent duplicate emails (on any shard)
+        if User.query.filter_by(email=email).first() or team_for_key('email', email):
             flash("An account with that email already exists. Please log in.", "error")
             return redirect(url_for('auth.login'))
 
@@ -65,13 +83,14 @@ def admin_signup():
                 flash("Please provide a team invitation token to join.", "error")
                 return redirect(url_for('auth.admin_signup'))
 
+            route_by_key('join_token', join_token)
             team = Team.query.filter_by(join_token=join_token).first()
             if not team:
                 flash("Invalid team invitation token.", "error")
                 return redirect(url_for('auth.admin_signup'))
 
             try:
-                hashed_password = bcrypt.generate_password_hash(password).decode('utf-8')
+                hashed_password = hash_password(password)
                 new_user = User(
                     name=request.form.get('name'),
                     email=email,
@@ -85,21 +104,28 @@ def admin_signup():
                 # Auto-login newly created employee
                 session.clear()
                 session['user_id'] = new_user.id
+                session['team_id'] = new_user.team_id
                 flash("Your account has been created and you are now logged in.", "success")
                 return redirect(url_for('employee.dashboard'))
+            except HashTimeoutError:
+                db.session.rollback()
+                flash("We're busy signing people in. Please try again in a moment.", "error")
+                return redirect(url_for('auth.admin_signup'))
             except Exception as e:
                 current_app.logger.error(f"Failed to create employee account: {e}")
                 db.session.rollback()
                 flash("Could not create your account. Please try again.", "error")
                 return redirect(url_for('auth.admin_signup'))
 
-        # Admin signup flow (create a new team)
+        # Admin signup flow (create a new team, always on the primary shard)
+        route_to_team(None)
         try:
+            # Hashed first, so a busy hashing pool never leaves a team without its admin.
+            hashed_password = hash_password(password)
             new_team = Team(name=request.form.get('team_name'))
             db.session.add(new_team)
             db.session.commit()
 
-            hashed_password = bcrypt.generate_password_hash(password).decode('utf-8')
             new_admin = User(
                 name=request.form.get('name'),
                 email=email,
@@ -118,8 +144,13 @@ def admin_signup():
 
             session.clear()
             session['user_id'] = new_admin.id
+            session['team_id'] = new_admin.team_id
             flash("Your team and account have been created successfully!", "success")
             return redirect(url_for('admin.dashboard'))
+        except HashTimeoutError:
+            db.session.rollback()
+            flash("We're busy signing people in. Please try again in a moment.", "error")
+            return redirect(url_for('auth.admin_signup'))
         except Exception as e:
             current_app.logger.error(f"CRITICAL: Failed to create admin account: {e}")
             db.session.rollback()
@@ -144,7 +175,8 @@ def verify_email():
         submitted_code = request.form.get('code')
         
         if submitted_code == signup_data['code']:
-            # Step 1: Create the new team
+            # Step 1: Create the new team (new teams start on the primary shard)
+            route_to_team(None)
             new_team = Team(name=signup_data['team_name'])
             db.session.add(new_team)
             db.session.commit()
@@ -177,6 +209,7 @@ def verify_email():
             # Step 5: Log the new user in
             session.clear()
             session['user_id'] = new_admin.id
+            session['team_id'] = new_admin.team_id
             flash("Email verified! Your team and account are now active.", "success")
             return redirect(url_for('admin.dashboard'))
         else:
@@ -192,11 +225,28 @@ def login():
     if request.method == 'POST':
         email = request.form.get('email')
         password = request.form.get('password')
+        route_by_key('email', email)
         user = User.query.filter_by(email=email).first()
 
-        if user and user.password and bcrypt.check_password_hash(user.password, password):
+        try:
+            verified = bool(user and user.password and verify_password(user.password, password))
+        except HashTimeoutError:
+            flash("We're busy signing people in. Please try again in a moment.", "error")
+            return render_template("auth/login.html"), 503
+
+        if verified:
+            # Transparently upgrade hashes made at an older cost setting.
+            if needs_rehash(user.password):
+                try:
+                    user.password = hash_password(password)
+                    db.session.commit()
+                except HashTimeoutError:
+                    # The password checked out; the upgrade waits for a quieter login.
+                    current_app.logger.warning("Skipped rehashing the password of user %s: hashing pool busy", user.id)
+
             # Log the user in
             session['user_id'] = user.id
+            session['team_id'] = user.team_id
             # Clear any pending action so a freshly-logged-in user isn't immediately
             # redirected to the clock-in/confirm page (this caused confusion).
             session.pop('pending_action', None)
@@ -0,0 +1,97 @@
+# app/Project/changes.py
+
+from flask import g
+from .extensions import db
+from .database import PRIMARY_SHARD
+from .dataversion import change_horizon
+from .models import TimeLog, TimeLogTombstone, User
+from sqlalchemy import and_, or_, select
+
+DEFAULT_CHANGES_PAGE_SIZE = 500
+MAX_CHANGES_PAGE_SIZE = 5000
+
+
+# --- Cursors ---
+# A position in a team's change feed is (shard, change_txid, kind, id): kind 0
+# is a live row (id = TimeLog.id), kind 1 a deletion (id = TimeLogTombstone.id).
+# One transaction stamps all its rows with the same change_txid, so the id
+# breaks ties. change_txid values only compare within one database, so a cursor
+# from the shard a team has since moved away from restarts the client from a
+# full snapshot, as does one from the older timestamp-based feed.
+_START = (0, 0, 0)
+
+
+def _current_shard():
+    return g.get('db_shard') or PRIMARY_SHARD
+
+
+def encode_cursor(position):
+    change_txid, kind, row_id = position
+    return f"{_current_shard()}.{change_txid}.{kind}.{row_id}"
+
+
+def decode_cursor(cursor):
+    """Parses a cursor from a previous page; raises ValueError if it is malformed."""
+    if not cursor:
+        return _START
+    *shard, change_txid, kind, row_id = cursor.split('.')
+    change_txid, kind, row_id = int(change_txid), int(kind), int(row_id)
+    if kind not in (0, 1) or len(shard) > 1:
+        raise ValueError("invalid cursor")
+    return (change_txid, kind, row_id) if shard == [_current_shard()] else _START
+
+
+def _iso(at):
+    return at.isoformat() + 'Z' if at else None
+
+
+# --- Feed ---
+def changes_since(team_id, cursor=None, limit=DEFAULT_CHANGES_PAGE_SIZE):
+    """
+    One page of a team's TimeLog changes after `cursor`, oldest first. Returns
+    (changes, next_cursor, has_more). Each change is {"op": "upsert", ...row} or
+    {"op": "delete", "id": ...}; a row edited several times appears once, in its
+    latest state. With no cursor the feed starts from the beginning, so the
+    first sync is a full snapshot.
+
+    Changes are ordered by the change_txid the database assigned them, and the
+    feed stops at change_horizon(): a write still uncommitted there is held back
+    until it commits, however long it takes, so it can never end up behind a
+    cursor already handed out.
+    """
+    change_txid, kind, row_id = decode_cursor(cursor)
+    limit = max(1, min(int(limit), MAX_CHANGES_PAGE_SIZE))
+    # Read from the same pool (a replica, for reporting) as the rows below.
+    horizon = change_horizon(db.session.connection(
+        bind_arguments={'mapper': TimeLog.__mapper__, 'clause': select(TimeLog.id)}))
+
+    # Each side uses its (team_id, change_txid) index and stops after limit + 1 rows.
+    live_after = TimeLog.change_txid > change_txid
+    if kind == 0:
+        live_after = or_(live_after, and_(TimeLog.change_txid == change_txid, TimeLog.id > row_id))
+        deleted_after = TimeLogTombstone.change_txid >= change_txid
+    else:
+        deleted_after = or_(TimeLogTombstone.change_txid > change_txid,
+                            and_(TimeLogTombstone.change_txid == change_txid, TimeLogTombstone.id > row_id))
+    live = db.session.query(TimeLog, User.name).join(User, TimeLog.user_id == User.id).filter(
+        TimeLog.team_id == team_id, live_after, TimeLog.change_txid < horizon
+    ).order_by(TimeLog.change_txid, TimeLog.id).limit(limit + 1).all()
+    deleted = TimeLogTombstone.query.filter(
+        TimeLogTombstone.team_id == team_id, deleted_after, TimeLogTombstone.change_txid < horizon
+    ).order_by(TimeLogTombstone.change_txid, TimeLogTombstone.id).limit(limit + 1).all()
+
+    merged = sorted(
+        [((log.change_txid, 0, log.id), {
+            'op': 'upsert', 'id': log.id, 'user_id': log.user_id, 'name': name, 'date': log.date,
+            'clock_in_at': _iso(log.clock_in_at), 'clock_out_at': _iso(log.clock_out_at),
+            'missed_clock_out': log.missed_clock_out, 'changed_at': _iso(log.changed_at),
+        }) for log, name in live] +
+        [((tomb.change_txid, 1, tomb.id), {
+            'op': 'delete', 'id': tomb.time_log_id, 'user_id': tomb.user_id,
+            'deleted_at': _iso(tomb.deleted_at),
+        }) for tomb in deleted],
+        key=lambda item: item[0]
+    )
+    page = merged[:limit]
+    next_cursor = encode_cursor(page[-1][0] if page else (change_txid, kind, row_id))
+    return [change for _, change in page], next_cursor, len(merged) > limit
@@ -0,0 +1,240 @@
+# app/Project/commands.py
+
+import os
+import click
+
+@click.command("create-super-admin")
+@click.argument("name")
+@click.argument("email")
+@click.argument("password")
+def create_super_admin(name, email, password):
+    """Creates the Super Admin user."""
+    from .models import db, User, Team
+    from .passwords import hash_password
+
+    # Check if the super admin email from environment variables is set
+    super_admin_env_email = os.environ.get('SUPER_ADMIN_USERNAME')
+    if not super_admin_env_email or email != super_admin_env_email:
+        print(f"Error: The provided email '{email}' does not match the SUPER_ADMIN_USERNAME environment variable.")
+        return
+
+    # Check if user already exists
+    if User.query.filter_by(email=email).first():
+        print(f"User with email {email} already exists.")
+        return
+
+    # Find or create a special team for system users
+    system_team = Team.query.filter_by(name="System Administration").first()
+    if not system_team:
+        system_team = Team(name="System Administration")
+        db.session.add(system_team)
+        db.session.commit()
+        print("Created the 'System Administration' team.")
+
+    # Create the super admin user
+    hashed_password = hash_password(password)
+    new_super_admin = User(
+        name=name,
+        email=email,
+        password=hashed_password,
+        role='Admin',  # Super admin still has the 'Admin' role for access
+        team_id=system_team.id
+    )
+    db.session.add(new_super_admin)
+    db.session.commit()
+    print(f"Super Admin '{name}' created successfully.")
+
+@click.command("bench-passwords")
+@click.option("--seconds", default=2.0, help="How long to measure each cost setting.")
+@click.argument("rounds", nargs=-1, type=int)
+def bench_passwords(seconds, rounds):
+    """Measures bcrypt logins/sec per core for each cost (default 10-13)."""
+    from .passwords import benchmark, configured_rounds
+
+    print(f"Configured BCRYPT_LOG_ROUNDS: {configured_rounds()}  (CPUs: {os.cpu_count()})")
+    for cost in rounds or (10, 11, 12, 13):
+        per_second = benchmark(cost, seconds)
+        print(f"cost {cost:>2}: {per_second:8.1f} logins/sec/core  ({1000 / per_second:6.1f} ms each)")
+
+@click.command("rebuild-shifts")
+@click.option("--team-id", type=int, default=None, help="Only rebuild this team.")
+@click.option("--shard", multiple=True, help="Only teams on this shard (repeatable). Defaults to every shard.")
+def rebuild_shifts(team_id, shard):
+    """Re-derives every TimeLog shift from the punch event log."""
+    from .models import db, Team, User
+    from .punches import ShiftProjector
+    from .sharding import each_shard
+
+    for _ in each_shard(shard):
+        teams = Team.query.filter_by(id=team_id).all() if team_id else Team.query.all()
+        for team in teams:
+            projector = ShiftProjector(team.id)
+            user_ids = [u.id for u in User.query.with_entities(User.id).filter_by(team_id=team.id)]
+            for user_id in user_ids:
+                projector.rebuild(user_id)
+            db.session.commit()
+            print(f"Rebuilt shifts for {len(user_ids)} users on team '{team.name}'.")
+
+@click.command("expire-devices")
+@click.option("--days", type=int, default=180, show_default=True, help="Remove devices not seen for this many days.")
+@click.option("--shard", default='primary', show_default=True, help="Shard to clean (run once per shard).")
+def expire_devices(days, shard):
+    """Deletes stale employee devices in batches (safe to run from a scheduler)."""
+    from .devices import expire_stale_devices
+    from .sharding import use_shard
+
+    with use_shard(shard):
+        print(f"Removed {expire_stale_devices(days)} devices not seen in {days} days.")
+
+@click.command("print-qr-posters")
+@click.argument("output", type=click.Path(dir_okay=False, writable=True))
+@click.option("--base-url", required=True, help="Public URL of the site, e.g. https://qrcheckin.example.com")
+@click.option("--team-id", type=int, multiple=True, help="Only these teams (repeatable). Defaults to every team.")
+@click.option("--shard", multiple=True, help="Only teams on this shard (repeatable). Defaults to every shard.")
+def print_qr_posters(output, base_url, team_id, shard):
+    """Writes one PDF with a QR poster page for each team, in a single pass."""
+    from flask import current_app, url_for
+    from .models import Team
+    from .pdfs import fits_pdf_fonts, render_qr_posters
+    from .sharding import each_shard
+
+    def posters():
+        for _ in each_shard(shard):
+            teams = Team.query.with_entities(Team.name, Team.join_token).order_by(Team.name)
+            if team_id:
+                teams = teams.filter(Team.id.in_(team_id))
+            for name, token in teams.yield_per(500):
+                if not fits_pdf_fonts(name):
+                    print(f"Warning: the PDF cannot show every character of '{name}'; print that team's poster "
+                          f"from its dashboard instead.")
+                yield name, url_for('employee.join_team', join_token=token, _external=True)
+
+    with current_app.test_request_context(base_url=base_url):
+        chunks = 0
+        with open(output, 'wb') as f:
+            for chunk in render_qr_posters(posters()):
+                f.write(chunk)
+                chunks += 1
+    # One chunk per page, plus the PDF header and trailer.
+    print(f"Wrote {chunks - 2} posters to {output}.")
+
+@click.command("export-time-logs")
+@click.argument("output", type=click.Path(dir_okay=False, writable=True))
+@click.option("--format", "fmt", type=click.Choice(['csv', 'xlsx', 'parquet', 'arrow']), default='parquet', show_default=True)
+@click.option("--team-id", type=int, multiple=True, help="Only these teams (repeatable). Defaults to every team.")
+@click.option("--since", type=click.DateTime(formats=["%Y-%m-%d"]), default=None, help="First day (UTC) to include.")
+@click.option("--until", type=click.DateTime(formats=["%Y-%m-%d"]), default=None, help="Day (UTC) to stop before.")
+@click.option("--shard", multiple=True, help="Only teams on this shard (repeatable). Defaults to every shard.")
+def export_time_logs(output, fmt, team_id, since, until, shard):
+    """Streams time logs to a file in bounded memory (e.g. a year of every team for the warehouse)."""
+    from .models import db, Team
+    from .exports import export_query, export_chunks, columnar_available, COLUMNAR_FORMATS, EXPORT_BATCH_SIZE
+    from .sharding import each_shard
+
+    if fmt in COLUMNAR_FORMATS and not columnar_available():
+        print("Error: Parquet and Arrow exports need the pyarrow package (pip install pyarrow).")
+        return
+    exported = set()
+
+    def rows():
+        # One file for every shard: each shard's rows follow the last one's.
+        for _ in each_shard(shard):
+            teams = db.session.query(Team.id)
+            if team_id:
+                teams = teams.filter(Team.id.in_(team_id))
+            team_ids = [tid for (tid,) in teams]
+            exported.update(team_ids)
+            if team_ids:
+                yield from export_query(team_ids, since, until).yield_per(EXPORT_BATCH_SIZE)
+
+    with open(output, 'wb') as f:
+        for chunk in export_chunks(fmt, rows()):
+            f.write(chunk)
+    print(f"Exported time logs for {len(exported)} teams to {output}.")
+
+@click.command("dispatch-webhooks")
+@click.option("--once", is_flag=True, help="Exit once nothing is due instead of polling.")
+@click.option("--concurrency", default=8, show_default=True, help="Endpoints delivered to in parallel.")
+@click.option("--interval", default=1.0, show_default=True, help="Seconds to sleep when the outbox is empty.")
+@click.option("--shard", default='primary', show_default=True, help="Shard whose outbox to deliver (one dispatcher per shard).")
+def dispatch_webhooks(once, concurrency, interval, shard):
+    """Delivers queued webhook events (run as its own process, see Procfile)."""
+    from .webhooks import run_dispatcher
+    from .sharding import use_shard
+
+    with use_shard(shard):
+        run_dispatcher(concurrency=concurrency, idle_sleep=interval, once=once)
+
+@click.command("send-digests")
+@click.option("--dry-run", is_flag=True, help="Count the digests that are due without sending or recording anything.")
+@click.option("--shard", default='primary', show_default=True, help="Shard whose teams to send to (run once per shard).")
+def send_digests(dry_run, shard):
+    """Emails every due daily/weekly attendance digest. Run hourly from a scheduler."""
+    import time
+    from .digests import send_digests as run
+    from .sharding import use_shard
+
+    started = time.perf_counter()
+    with use_shard(shard):
+        sent, skipped, failed = run(dry_run=dry_run)
+    verb = "Would send" if dry_run else "Sent"
+    print(f"{verb} {sent} digests ({skipped} teams had no activity, {failed} failed) "
+          f"in {time.perf_counter() - started:.1f}s.")
+
+@click.command("debug-smtp-server")
+@click.option("--port", default=1025, show_default=True)
+def debug_smtp_server(port):
+    """Runs a local SMTP server that prints every message it receives (MAIL_SERVER=localhost, MAIL_PORT=1025)."""
+    from .digests import DebugSmtpServer
+
+    server = DebugSmtpServer(port=port, echo=True)
+    print(f"Debug SMTP server listening on {server.host}:{server.port}. Press Ctrl+C to stop.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+@click.command("init-shard")
+@click.argument("name")
+def init_shard(name):
+    """Prepares a shard listed in SHARD_DATABASE_URLS (after `DATABASE_URL=<its url> flask db upgrade`)."""
+    from .sharding import init_shard as run
+
+    first_id = run(name)
+    if first_id is None:
+        print(f"Shard '{name}' needs no id range (primary or SQLite); moves check for id collisions instead.")
+    else:
+        print(f"Shard '{name}' now allocates ids from {first_id}.")
+
+@click.command("move-team")
+@click.argument("team_id", type=int)
+@click.argument("shard")
+@click.option("--settle", default=None, type=float,
+              help="Seconds to wait for every process to see a routing change (default: the route cache lifetime).")
+def move_team(team_id, shard, settle):
+    """Moves a team to another shard while it stays online (writes pause for a few seconds)."""
+    from .sharding import move_team as run, ShardMoveError, ROUTE_CACHE_SECONDS
+
+    try:
+        copied, paused = run(team_id, shard, settle_seconds=ROUTE_CACHE_SECONDS if settle is None else settle)
+    except ShardMoveError as e:
+        print(f"Error: {e}")
+        return
+    print(f"Team {team_id} is now on '{shard}' ({copied} rows, writes paused {paused:.1f}s).")
+
+@click.command("rebuild-tenant-directory")
+def rebuild_tenant_directory():
+    """Refills the shard directory (login emails, join tokens, API keys, devices) from every shard."""
+    from .sharding import rebuild_directory
+
+    print(f"Directory rebuilt with {rebuild_directory()} keys.")
+
+@click.command("refresh-tenant-stats")
+def refresh_tenant_stats():
+    """Recomputes the super admin's tenant overview from every shard. Run every few minutes from a scheduler."""
+    import time
+    from .tenantstats import refresh_tenant_stats as run
+
+    started = time.perf_counter()
+    count = run()
+    print(f"Refreshed stats for {count} teams in {time.perf_counter() - started:.1f}s.")
@@ -0,0 +1,83 @@
+# app/Project/compression.py
+
+from flask import current_app, g, request, session
+from werkzeug.http import parse_accept_header
+import gzip
+import importlib.util
+
+DEFAULT_COMPRESS_MIN_BYTES = 4096
+COMPRESSIBLE_MIMETYPES = frozenset(('text/html', 'application/json'))
+# Per-request compression trades ratio for speed; pre-rendered pages are compressed once, at the maximum.
+GZIP_LEVEL, BROTLI_QUALITY = 6, 4
+GZIP_LEVEL_MAX, BROTLI_QUALITY_MAX = 9, 11
+# Flash category for one-time secrets (new API keys, webhook signing secrets). The
+# page showing one is never compressed: an attacker who can add text of their own
+# to it (a key name, a filter) could recover the secret from the compressed size
+# (BREACH).
+SECRET_FLASH_CATEGORY = 'secret'
+
+
+def brotli_available():
+    """Brotli responses need the optional `brotli` package; without it everything is gzip."""
+    return importlib.util.find_spec('brotli') is not None
+
+
+def available_encodings():
+    """Content-Encodings we can produce, best first."""
+    return ('br', 'gzip') if brotli_available() else ('gzip',)
+
+
+def negotiate_encoding(accept_encoding, encodings):
+    """The first of `encodings` the Accept-Encoding header allows, or None for an uncompressed body."""
+    accept = parse_accept_header(accept_encoding)
+    for encoding in encodings:
+        if accept[encoding] > 0:
+            return encoding
+    return None
+
+
+def compress(body, encoding, best=False):
+    if encoding == 'br':
+        import brotli
+        return brotli.compress(body, quality=BROTLI_QUALITY_MAX if best else BROTLI_QUALITY)
+    # mtime=0 keeps the output (and so any ETag derived from it) identical across restarts.
+    return gzip.compress(body, compresslevel=GZIP_LEVEL_MAX if best else GZIP_LEVEL, mtime=0)
+
+
+def note_pending_secret():
+    """
+    before_request hook: remembers whether a secret is waiting to be shown. The
+    flash is consumed while the page renders, so compress_response cannot look
+    for it afterwards.
+    """
+    # '_flashes' is where Flask keeps (category, message) pairs until they are shown.
+    g.shows_secret = any(category == SECRET_FLASH_CATEGORY for category, _ in session.get('_flashes', ()))
+
+
+def compress_response(response):
+    """
+    after_request hook: compresses large HTML and JSON responses (the admin
+    time log, reports, API pages) for clients that accept it. Streamed and
+    file responses (exports, PDFs) are left alone, and so is anything marked
+    `Cache-Control: no-store`, which includes every page that shows a secret.
+    """
+    if g.get('shows_secret'):
+        response.cache_control.no_store = True
+    min_bytes = current_app.config.get('COMPRESS_MIN_BYTES', DEFAULT_COMPRESS_MIN_BYTES)
+    if (not min_bytes or response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES or 'Content-Encoding' in response.headers
+            or response.cache_control.no_store):
+        return response
+    body = response.get_data()
+    if len(body) < min_bytes:
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'), available_encodings())
+    if encoding:
+        response.set_data(compress(body, encoding))
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag:
+            # Each encoding is a different representation, so it needs its own validator.
+            response.set_etag(f"{etag}-{encoding}", weak=weak)
+    return response
@@ -0,0 +1,217 @@
+# app/Project/database.py
+
+from flask import g, has_app_context, request, current_app
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, inspect, text
+from contextlib import contextmanager
+import os
+import re
+import time
+
+# Traffic classes that get their own connection pool (and statement timeout), so
+# a long report can never take the connections a kiosk clock-in is waiting for.
+WORKLOADS = ('kiosk', 'reporting')
+
+DEFAULT_STATEMENT_TIMEOUTS_MS = {None: 15000, 'kiosk': 5000, 'reporting': 60000}
+# Set on a connection's info while without_statement_timeout() is lifting its timeout.
+_NO_TIMEOUT = 'statement_timeout_off'
+
+# The default database is always a shard too: every team starts there (see sharding.py).
+PRIMARY_SHARD = 'primary'
+# Tables that only exist on the primary, whatever shard the request is routed to.
+DIRECTORY_TABLES = frozenset(('team_shard', 'tenant_key', 'tenant_stats', 'sessions'))
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value not in (None, '') else default
+
+
+def _is_sqlite_memory(url):
+    return url.startswith('sqlite') and (':memory:' in url or url.rstrip('/') in ('sqlite:', 'sqlite:/'))
+
+
+def engine_options_from_env(url, prefix=''):
+    """
+    Builds SQLAlchemy engine options for one pool from environment variables.
+    `prefix` selects a workload's overrides, e.g. KIOSK_DB_POOL_SIZE falls back
+    to DB_POOL_SIZE and then to the built-in default.
+    """
+    def setting(name, default):
+        return _env_int(f"{prefix}{name}", _env_int(name, default))
+
+    options = {
+        'pool_pre_ping': os.environ.get(f"{prefix}DB_POOL_PRE_PING", os.environ.get('DB_POOL_PRE_PING', 'True')) == 'True',
+        'pool_recycle': setting('DB_POOL_RECYCLE', 1800),
+    }
+    # In-memory SQLite uses a single static connection; pool sizing does not apply.
+    if not _is_sqlite_memory(url):
+        options['pool_size'] = setting('DB_POOL_SIZE', 5)
+        options['max_overflow'] = setting('DB_MAX_OVERFLOW', 10)
+        options['pool_timeout'] = setting('DB_POOL_TIMEOUT', 10)
+    return options
+
+
+def shard_urls_from_env():
+    """
+    Parses SHARD_DATABASE_URLS, e.g. "eu=postgresql://...,us2=postgresql://...",
+    into {name: url}. Empty (the default) means no sharding.
+    """
+    shards = {}
+    for entry in os.environ.get('SHARD_DATABASE_URLS', '').split(','):
+        if not entry.strip():
+            continue
+        name, _, url = entry.strip().partition('=')
+        if not re.fullmatch(r'[a-z0-9_-]+', name) or name == PRIMARY_SHARD or not url:
+            raise ValueError(f"Invalid SHARD_DATABASE_URLS entry: {entry.strip()!r}")
+        shards[name] = url
+    return shards
+
+
+def configure_database(app):
+    """Fills in the engine, bind and statement-timeout config for create_app."""
+    url = app.config['SQLALCHEMY_DATABASE_URI']
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options_from_env(url or ''))
+
+    timeouts = {None: _env_int('DB_STATEMENT_TIMEOUT_MS', DEFAULT_STATEMENT_TIMEOUTS_MS[None])}
+    binds = {}
+    # Separate pools only make sense for a real database; an in-memory SQLite
+    # URL would give each pool its own empty database.
+    isolate = os.environ.get('DB_ISOLATE_WORKLOADS', 'True') == 'True' and url and not _is_sqlite_memory(url)
+    if isolate:
+        for workload in WORKLOADS:
+            prefix = f"{workload.upper()}_"
+            # Reporting can be pointed at a read replica; writes still go to the primary.
+            bind_url = os.environ.get(f"{prefix}DATABASE_URL") or url
+            binds[workload] = {'url': bind_url, **engine_options_from_env(bind_url, prefix)}
+            timeouts[workload] = _env_int(f"{prefix}STATEMENT_TIMEOUT_MS", DEFAULT_STATEMENT_TIMEOUTS_MS[workload])
+    # One pool per extra shard; SHARD_DB_POOL_SIZE etc. override the defaults for all of them.
+    # Each shard also gets its own kiosk and reporting pools, sized like the primary's.
+    shards = shard_urls_from_env()
+    for name, shard_url in shards.items():
+        binds[f"shard:{name}"] = {'url': shard_url, **engine_options_from_env(shard_url, 'SHARD_')}
+        timeouts[f"shard:{name}"] = timeouts[None]
+        if isolate:
+            for workload in WORKLOADS:
+                binds[f"shard:{name}:{workload}"] = {
+                    'url': shard_url, **engine_options_from_env(shard_url, f"{workload.upper()}_")}
+                timeouts[f"shard:{name}:{workload}"] = timeouts[workload]
+    app.config.setdefault('SQLALCHEMY_BINDS', binds)
+    app.config.setdefault('DB_STATEMENT_TIMEOUTS_MS', timeouts)
+    app.config.setdefault('SHARDS', (PRIMARY_SHARD, *shards))
+
+
+def install_statement_timeouts(app, db):
+    """Applies each pool's statement timeout to every connection it opens."""
+    with app.app_context():
+        for key, engine in db.engines.items():
+            timeout_ms = app.config['DB_STATEMENT_TIMEOUTS_MS'].get(key)
+            if timeout_ms:
+                _install_statement_timeout(engine, timeout_ms)
+
+
+def _install_statement_timeout(engine, timeout_ms):
+    if engine.dialect.name == 'postgresql':
+        @event.listens_for(engine, 'connect')
+        def set_statement_timeout(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute(f"SET statement_timeout = {int(timeout_ms)}")
+            cursor.close()
+
+    elif engine.dialect.name == 'sqlite':
+        # SQLite has no statement_timeout; a progress handler that aborts the
+        # running statement once its deadline passes gives the same behaviour.
+        @event.listens_for(engine, 'connect')
+        def set_progress_handler(dbapi_connection, connection_record):
+            info = connection_record.info
+            info['statement_deadline'] = None
+
+            def check_deadline():
+                deadline = info.get('statement_deadline')
+                return 1 if deadline is not None and time.monotonic() > deadline else 0
+
+            dbapi_connection.set_progress_handler(check_deadline, 10000)
+
+        @event.listens_for(engine, 'before_cursor_execute')
+        def start_deadline(conn, cursor, statement, parameters, context, executemany):
+            if not conn.info.get(_NO_TIMEOUT):
+                conn.info['statement_deadline'] = time.monotonic() + timeout_ms / 1000.0
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def clear_deadline(conn, cursor, statement, parameters, context, executemany):
+            conn.info['statement_deadline'] = None
+
+
+@contextmanager
+def without_statement_timeout(connection):
+    """
+    Lifts the pool's statement timeout on one connection for the block, for
+    maintenance that legitimately runs long: migrations (see migrations/env.py)
+    backfill and index whole tables through the default engine.
+    """
+    postgres = connection.dialect.name == 'postgresql'
+    if postgres:
+        previous = connection.exec_driver_sql("SHOW statement_timeout").scalar()
+        connection.exec_driver_sql("SET statement_timeout = 0")
+        connection.commit()
+    connection.info[_NO_TIMEOUT] = True
+    try:
+        yield connection
+    finally:
+        connection.info.pop(_NO_TIMEOUT, None)
+        if postgres:
+            connection.rollback()
+            connection.execute(text("SELECT set_config('statement_timeout', :value, false)"), {'value': previous})
+            connection.commit()
+
+
+def _touches_directory(mapper, clause):
+    if mapper is not None:
+        return inspect(mapper).local_table.name in DIRECTORY_TABLES
+    table = getattr(clause, 'table', None)
+    if table is not None:
+        return table.name in DIRECTORY_TABLES
+    froms = clause.get_final_froms() if hasattr(clause, 'get_final_froms') else ()
+    return any(getattr(table, 'name', None) in DIRECTORY_TABLES for table in froms)
+
+
+class WorkloadSession(Session):
+    """
+    Routes statements to the pool for the current request's workload. Kiosk
+    requests use the kiosk pool for everything; reporting requests send only
+    SELECTs to the reporting pool (which may be a replica), so flushes such as
+    the server-side session save still reach the primary.
+
+    A request routed to a team on another shard (g.db_shard, see sharding.py)
+    sends everything there, to that shard's pool for the workload, except the
+    directory tables, which stay on the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context():
+            engines = self._db.engines
+            shard = g.get('db_shard')
+            database = f"shard:{shard}" if shard and not _touches_directory(mapper, clause) else None
+            workload = g.get('db_workload')
+            if workload == 'kiosk' or (
+                    workload == 'reporting' and clause is not None and getattr(clause, 'is_select', False)):
+                key = workload if database is None else f"{database}:{workload}"
+                if key in engines:
+                    return engines[key]
+            if database is not None:
+                return engines[database]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def workload(name):
+    """Marks a view as kiosk or reporting traffic so its queries use that pool."""
+    def decorator(f):
+        f.db_workload = name
+        return f
+    return decorator
+
+
+def select_request_workload():
+    """before_request hook: picks the pool before any query (even load_logged_in_user) runs."""
+    view = current_app.view_functions.get(request.endpoint)
+    g.db_workload = getattr(view, 'db_workload', None)
@@ -0,0 +1,128 @@
+# app/Project/dataversion.py
+
+from flask import current_app, has_app_context
+from .extensions import db
+from .models import ChangeCounter, Team, TimeLog, TimeLogTombstone, User
+from .timekeeping import utcnow
+from sqlalchemy import event, func, insert, literal, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+# Writes to these change what a team's reports show.
+VERSIONED_MODELS = (TimeLog, User)
+_PENDING_BUMPS = 'data_version_bumps'
+
+
+def team_data_version(team_id):
+    return db.session.query(Team.data_version).filter(Team.id == team_id).scalar() or 0
+
+
+def bump_data_version(session, team_ids):
+    """
+    Marks each team's data as changed by the session's transaction. Their data
+    versions (which cached reports are keyed on) go up right after it commits,
+    in a transaction of their own, so the team row is never held locked while
+    a clock-in's transaction runs.
+    """
+    team_ids = {team_id for team_id in team_ids if team_id is not None}
+    if not team_ids:
+        return
+    # The engine the transaction writes to: the team's shard, via the request's pool.
+    bind = session.get_bind(mapper=Team.__mapper__)
+    session.info.setdefault(_PENDING_BUMPS, {}).setdefault(bind.engine, set()).update(team_ids)
+
+
+@event.listens_for(Session, 'after_commit')
+def _bump_after_commit(session):
+    # A report cached between the commit and this bump is keyed on the old version
+    # but already holds the new data, so it is merely dropped a little early.
+    pending = session.info.pop(_PENDING_BUMPS, None)
+    if not pending:
+        return
+    team = Team.__table__
+    for engine, team_ids in pending.items():
+        try:
+            with engine.begin() as conn:
+                conn.execute(update(team).where(team.c.id.in_(sorted(team_ids)))
+                             .values(data_version=team.c.data_version + 1))
+        except SQLAlchemyError as e:
+            # The write itself is committed; its teams' cached reports refresh on their next write.
+            if has_app_context():
+                current_app.logger.warning("Data version bump for teams %s failed: %s", sorted(team_ids), e)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_bumps(session):
+    session.info.pop(_PENDING_BUMPS, None)
+
+
+# --- Change ordering ---
+def next_change_txid(conn):
+    """
+    The change_txid for rows the transaction on `conn` writes, assigned by the
+    database rather than read from any host's clock. On Postgres it is the
+    transaction's own id. On SQLite it is the next value of the change_counter
+    row: bumping it takes the database's write lock, which is held until commit,
+    so the values follow commit order.
+    """
+    if conn.dialect.name == 'postgresql':
+        return conn.execute(select(func.txid_current())).scalar()
+    counter = ChangeCounter.__table__
+    return conn.execute(sqlite_insert(counter).values(id=1, value=1).on_conflict_do_update(
+        index_elements=[counter.c.id], set_={'value': counter.c.value + 1}
+    ).returning(counter.c.value)).scalar()
+
+
+def change_horizon(conn):
+    """
+    Every change_txid below this belongs to a finished transaction, and every
+    write from now on gets one at or above it. The change feed reads no further,
+    and a shard move re-syncs the rows stamped from here on.
+    """
+    if conn.dialect.name == 'postgresql':
+        # The oldest transaction still running, or the next id if none is.
+        return conn.execute(select(func.txid_snapshot_xmin(func.txid_current_snapshot()))).scalar()
+    counter = ChangeCounter.__table__
+    return (conn.execute(select(counter.c.value).where(counter.c.id == 1)).scalar() or 0) + 1
+
+
+def _timelog_connection(session):
+    # The connection the flush writes TimeLog rows on: the team's shard, via the request's pool.
+    return session.connection(bind_arguments={'mapper': TimeLog.__mapper__})
+
+
+def record_bulk_delete(session, team_id, query):
+    """
+    Tombstones every TimeLog matched by `query` before the caller deletes them in
+    bulk (query.delete() skips the flush hook below). One INSERT ... SELECT.
+    """
+    bump_data_version(session, [team_id])
+    txid = next_change_txid(_timelog_connection(session))
+    session.execute(insert(TimeLogTombstone).from_select(
+        ['team_id', 'time_log_id', 'user_id', 'deleted_at', 'change_txid'],
+        query.with_entities(TimeLog.team_id, TimeLog.id, TimeLog.user_id, literal(utcnow()), literal(txid))
+    ))
+
+
+@event.listens_for(Session, 'before_flush')
+def _version_changes(session, flush_context, instances):
+    # Bulk query.update()/delete() bypass this; callers that use them bump explicitly.
+    deleted_teams = {obj.id for obj in session.deleted if isinstance(obj, Team)}
+    changed = [(obj, False) for obj in session.new if isinstance(obj, VERSIONED_MODELS)]
+    changed += [(obj, True) for obj in session.deleted if isinstance(obj, VERSIONED_MODELS)]
+    changed += [(obj, False) for obj in session.dirty
+                if isinstance(obj, VERSIONED_MODELS) and session.is_modified(obj, include_collections=False)]
+    changed = [(obj, deleted) for obj, deleted in changed if obj.team_id not in deleted_teams]
+    bump_data_version(session, (obj.team_id for obj, _ in changed))
+
+    changed = [(obj, deleted) for obj, deleted in changed if isinstance(obj, TimeLog)]
+    if not changed:
+        return
+    now, txid = utcnow(), next_change_txid(_timelog_connection(session))
+    for obj, deleted in changed:
+        if deleted:
+            session.add(TimeLogTombstone(team_id=obj.team_id, time_log_id=obj.id, user_id=obj.user_id,
+                                         deleted_at=now, change_txid=txid))
+        else:
+            obj.changed_at, obj.change_txid = now, txid
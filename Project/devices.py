@@ -0,0 +1,133 @@
+# app/Project/devices.py
+
+from .extensions import db
+from .models import User, Device, TeamSetting
+from .timekeeping import utcnow
+from collections import OrderedDict
+from datetime import timedelta
+import hashlib
+import threading
+import time
+
+DEFAULT_MAX_DEVICES_PER_USER = 2
+# token hash -> (expires, user_id). Small and per-process; a device revoked in
+# another worker stops resolving here within DEVICE_CACHE_SECONDS.
+DEVICE_CACHE_SIZE = 4096
+DEVICE_CACHE_SECONDS = 60
+# last_seen_at is only written when it is older than this, so scans stay read-only.
+LAST_SEEN_RESOLUTION = timedelta(hours=1)
+EXPIRY_BATCH_SIZE = 1000
+
+_device_cache = OrderedDict()
+_device_lock = threading.Lock()
+
+
+def hash_device_token(token):
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+# --- Token -> user cache ---
+def _cache_get(token_hash):
+    with _device_lock:
+        cached = _device_cache.get(token_hash)
+        if cached is None:
+            return None
+        if cached[0] <= time.monotonic():
+            del _device_cache[token_hash]
+            return None
+        _device_cache.move_to_end(token_hash)
+        return cached[1]
+
+def _cache_put(token_hash, user_id):
+    with _device_lock:
+        _device_cache[token_hash] = (time.monotonic() + DEVICE_CACHE_SECONDS, user_id)
+        _device_cache.move_to_end(token_hash)
+        while len(_device_cache) > DEVICE_CACHE_SIZE:
+            _device_cache.popitem(last=False)
+
+def invalidate_device_cache(token_hash=None, user_id=None):
+    """Drops one token, every token of one user, or (with no arguments) the whole cache."""
+    with _device_lock:
+        if token_hash is None and user_id is None:
+            _device_cache.clear()
+        elif token_hash is not None:
+            _device_cache.pop(token_hash, None)
+        else:
+            for key in [k for k, v in _device_cache.items() if v[1] == user_id]:
+                del _device_cache[key]
+
+
+# --- Lookups ---
+def resolve_device(token):
+    """Returns the User a device token is registered to, or None (unknown or revoked device)."""
+    if not token:
+        return None
+    token_hash = hash_device_token(token)
+    user_id = _cache_get(token_hash)
+    if user_id is not None:
+        return db.session.get(User, user_id)
+
+    row = db.session.query(Device, User).join(User, Device.user_id == User.id).filter(
+        Device.token_hash == token_hash, Device.revoked == False
+    ).first()
+    if row is None:
+        return None
+    device, user = row
+    now = utcnow()
+    if now - device.last_seen_at > LAST_SEEN_RESOLUTION:
+        device.last_seen_at = now
+        db.session.commit()
+    _cache_put(token_hash, user.id)
+    return user
+
+
+def active_device_count(user):
+    return Device.query.filter_by(user_id=user.id, revoked=False).count()
+
+
+def max_devices_per_user(team_id):
+    setting = TeamSetting.query.filter_by(team_id=team_id, name='MaxDevicesPerUser').first()
+    try:
+        return max(1, int(setting.value)) if setting else DEFAULT_MAX_DEVICES_PER_USER
+    except ValueError:
+        return DEFAULT_MAX_DEVICES_PER_USER
+
+
+# --- Changes (the caller commits) ---
+def register_device(user, token, user_agent=None):
+    """Registers a device token to `user`, taking it over if it belonged to someone else."""
+    token_hash = hash_device_token(token)
+    device = Device.query.filter_by(token_hash=token_hash).first()
+    if device is None:
+        device = Device(token_hash=token_hash)
+        db.session.add(device)
+    device.user_id = user.id
+    device.team_id = user.team_id
+    device.revoked = False
+    device.last_seen_at = utcnow()
+    if user_agent:
+        device.user_agent = user_agent[:200]
+    invalidate_device_cache(token_hash=token_hash)
+    return device
+
+
+def revoke_user_devices(user):
+    """Revokes every device of a user so their next scan registers afresh."""
+    Device.query.filter_by(user_id=user.id, revoked=False).update({'revoked': True}, synchronize_session=False)
+    invalidate_device_cache(user_id=user.id)
+
+
+def expire_stale_devices(days):
+    """Deletes devices not seen for `days` days, in batches so the table is never locked for long."""
+    cutoff = utcnow() - timedelta(days=days)
+    total = 0
+    while True:
+        ids = [device_id for (device_id,) in db.session.query(Device.id).filter(
+            Device.last_seen_at < cutoff).limit(EXPIRY_BATCH_SIZE).all()]
+        if not ids:
+            break
+        Device.query.filter(Device.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        total += len(ids)
+    invalidate_device_cache()
+    return total
@@ -0,0 +1,286 @@
+# app/Project/digests.py
+
+from flask import current_app, render_template
+from flask_mail import Message
+from .extensions import db, mail
+from .models import Team, TeamSetting, TimeLog, User
+from .timekeeping import (compute_workday, workday_containing, parse_rollover, format_log_date, utcnow,
+                          DEFAULT_TIMEZONE)
+from collections import defaultdict
+from datetime import timedelta
+from email import message_from_bytes
+from sqlalchemy import case, func, or_
+import smtplib
+import socketserver
+import threading
+import pytz
+
+DIGEST_FREQUENCIES = ('off', 'daily', 'weekly')
+# Teams are summarised this many at a time, so memory stays flat however many are due.
+DIGEST_TEAM_CHUNK = 500
+DEFAULT_DIGEST_MESSAGES_PER_CONNECTION = 100
+# Employees listed in one digest; the totals still cover everyone.
+DIGEST_MAX_EMPLOYEES = 25
+_DIGEST_SETTINGS = ('DigestFrequency', 'DigestLastSent', 'Timezone', 'DayRolloverTime')
+
+
+# --- Periods ---
+def digest_period(frequency, tz, rollover, now_utc):
+    """
+    The last complete period for a digest: yesterday's work day, or last Monday-Sunday
+    week. Returns (key, label, start_utc, end_utc); the key is stored once it is sent.
+    """
+    today = workday_containing(tz, rollover, pytz.utc.localize(now_utc).astimezone(tz)).day
+    if frequency == 'daily':
+        first, days = today - timedelta(days=1), 1
+        label = first.strftime('%A, ') + format_log_date(first)
+    else:
+        first, days = today - timedelta(days=today.weekday() + 7), 7
+        label = f"Week of {format_log_date(first)}"
+    start = compute_workday(tz, rollover, first).start_utc
+    end = compute_workday(tz, rollover, first + timedelta(days=days)).start_utc
+    return f"{frequency}:{first.isoformat()}", label, start, end
+
+
+def due_teams(now_utc):
+    """
+    {team_id: (key, label, start_utc, end_utc)} for every team whose digest for the
+    last complete period has not been sent. One query for all teams' settings.
+    """
+    opted_in = db.session.query(TeamSetting.team_id).filter(
+        TeamSetting.name == 'DigestFrequency', TeamSetting.value.in_(['daily', 'weekly']))
+    values = defaultdict(dict)
+    for team_id, name, value in db.session.query(TeamSetting.team_id, TeamSetting.name, TeamSetting.value).filter(
+            TeamSetting.team_id.in_(opted_in), TeamSetting.name.in_(_DIGEST_SETTINGS)):
+        values[team_id][name] = value
+
+    due, zones = {}, {}
+    for team_id, settings in values.items():
+        tz_name = settings.get('Timezone') or DEFAULT_TIMEZONE
+        if tz_name not in zones:
+            try:
+                zones[tz_name] = pytz.timezone(tz_name)
+            except pytz.UnknownTimeZoneError:
+                zones[tz_name] = pytz.timezone(DEFAULT_TIMEZONE)
+        period = digest_period(settings['DigestFrequency'], zones[tz_name],
+                               parse_rollover(settings.get('DayRolloverTime')), now_utc)
+        if settings.get('DigestLastSent') != period[0]:
+            due[team_id] = period
+    return due
+
+
+# --- Summaries ---
+def _shift_seconds():
+    if db.engine.dialect.name == 'postgresql':
+        return func.extract('epoch', TimeLog.clock_out_at - TimeLog.clock_in_at)
+    return (func.julianday(TimeLog.clock_out_at) - func.julianday(TimeLog.clock_in_at)) * 86400
+
+
+def summarize(due):
+    """
+    Per-team digests for a chunk of due teams, built from one grouped query per
+    distinct period window (teams sharing a timezone share a window) rather than
+    per user. Returns {team_id: {'totals': {...}, 'employees': [...]}}.
+    """
+    by_window = defaultdict(list)
+    for team_id, (_, _, start, end) in due.items():
+        by_window[(start, end)].append(team_id)
+
+    closed = TimeLog.clock_out_at != None
+    digests = {}
+    for (start, end), team_ids in by_window.items():
+        rows = db.session.query(
+            TimeLog.team_id, User.name,
+            func.count(TimeLog.id),
+            func.sum(case((closed, _shift_seconds()), else_=0)),
+            func.sum(case((or_(TimeLog.clock_out_at == None, TimeLog.missed_clock_out == True), 1), else_=0)),
+        ).join(User, TimeLog.user_id == User.id).filter(
+            TimeLog.team_id.in_(team_ids), TimeLog.clock_in_at >= start, TimeLog.clock_in_at < end
+        ).group_by(TimeLog.team_id, TimeLog.user_id, User.name).all()
+        for team_id, name, shifts, seconds, unclosed in rows:
+            digest = digests.setdefault(team_id, {'employees': [], 'totals': {'shifts': 0, 'hours': 0.0, 'unclosed': 0}})
+            hours = round(float(seconds or 0) / 3600, 2)
+            digest['employees'].append({'name': name, 'shifts': shifts, 'hours': hours, 'unclosed': int(unclosed or 0)})
+            digest['totals']['shifts'] += shifts
+            digest['totals']['hours'] += hours
+            digest['totals']['unclosed'] += int(unclosed or 0)
+    for digest in digests.values():
+        digest['employees'].sort(key=lambda e: (-e['hours'], e['name']))
+        digest['totals']['employees'] = len(digest['employees'])
+        digest['totals']['hours'] = round(digest['totals']['hours'], 2)
+    return digests
+
+
+def _recipients(team_ids):
+    """{team_id: (team name, [admin emails])} in one query."""
+    recipients = {}
+    for team_id, team_name, email in db.session.query(User.team_id, Team.name, User.email).join(
+            Team, User.team_id == Team.id).filter(
+            User.team_id.in_(team_ids), User.role == 'Admin', User.email != None):
+        recipients.setdefault(team_id, (team_name, []))[1].append(email)
+    return recipients
+
+
+def _mark_sent(due, team_ids):
+    """Records each team's sent period: one UPDATE per distinct period plus one bulk insert."""
+    by_key = defaultdict(list)
+    for team_id in team_ids:
+        by_key[due[team_id][0]].append(team_id)
+    existing = {team_id for (team_id,) in db.session.query(TeamSetting.team_id).filter(
+        TeamSetting.team_id.in_(team_ids), TeamSetting.name == 'DigestLastSent')}
+    for key, ids in by_key.items():
+        TeamSetting.query.filter(TeamSetting.team_id.in_(ids), TeamSetting.name == 'DigestLastSent').update(
+            {'value': key}, synchronize_session=False)
+    missing = [{'team_id': team_id, 'name': 'DigestLastSent', 'value': due[team_id][0]}
+               for team_id in team_ids if team_id not in existing]
+    if missing:
+        db.session.execute(TeamSetting.__table__.insert(), missing)
+    db.session.commit()
+
+
+def _digest_message(team_name, emails, label, frequency, digest):
+    employees = digest['employees']
+    context = dict(team_name=team_name, label=label, totals=digest['totals'],
+                   employees=employees[:DIGEST_MAX_EMPLOYEES], more=max(0, len(employees) - DIGEST_MAX_EMPLOYEES))
+    return Message(subject=f"{frequency.capitalize()} attendance digest for {team_name}: {label}",
+                   recipients=emails,
+                   body=render_template("email/digest.txt", **context),
+                   html=render_template("email/digest.html", **context))
+
+
+# --- Job ---
+def send_digests(now_utc=None, dry_run=False):
+    """
+    Sends every due digest. Meant to run hourly from a scheduler (never in a web
+    worker); periods already sent are skipped, so reruns and overlaps are harmless.
+    Mail goes out over one SMTP connection per batch of messages, and teams are
+    marked sent after each batch, so a crash resends at most one batch.
+    Teams with no shifts in the period get no mail. Returns (sent, skipped, failed).
+    """
+    now_utc = now_utc or utcnow()
+    per_connection = current_app.config.get('DIGEST_MESSAGES_PER_CONNECTION', DEFAULT_DIGEST_MESSAGES_PER_CONNECTION)
+    due = due_teams(now_utc)
+    team_ids = sorted(due)
+    sent = skipped = failed = 0
+
+    for i in range(0, len(team_ids), DIGEST_TEAM_CHUNK):
+        chunk = {team_id: due[team_id] for team_id in team_ids[i:i + DIGEST_TEAM_CHUNK]}
+        digests = summarize(chunk)
+        recipients = _recipients(list(digests))
+        outbox, quiet = [], []
+        for team_id, (key, label, _, _) in chunk.items():
+            if team_id in digests and team_id in recipients:
+                team_name, emails = recipients[team_id]
+                outbox.append((team_id, _digest_message(team_name, emails, label, key.split(':')[0], digests[team_id])))
+            else:
+                quiet.append(team_id)
+        skipped += len(quiet)
+        if dry_run:
+            sent += len(outbox)
+            continue
+        _mark_sent(chunk, quiet)
+
+        for j in range(0, len(outbox), per_connection):
+            batch, delivered = outbox[j:j + per_connection], []
+            with mail.connect() as connection:
+                for team_id, message in batch:
+                    try:
+                        connection.send(message)
+                        delivered.append(team_id)
+                    except smtplib.SMTPServerDisconnected:
+                        raise
+                    except smtplib.SMTPException as e:
+                        # A rejected recipient fails that team only; it is retried next run.
+                        current_app.logger.warning("Digest for team %s failed: %s", team_id, e)
+                        failed += 1
+            _mark_sent(chunk, delivered)
+            sent += len(delivered)
+    return sent, skipped, failed
+
+
+# --- Local debugging SMTP server ---
+class DebugSmtpServer:
+    """
+    A minimal SMTP server that accepts every message and keeps it in `messages`
+    (email.message.Message objects); `connections` counts SMTP sessions. Stand-in
+    for a real relay in tests and local development: point MAIL_SERVER/MAIL_PORT at
+    it with MAIL_USE_TLS off. No TLS; any AUTH PLAIN login is accepted.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, echo=False):
+        self.messages = []
+        self.connections = 0
+        self.echo = echo
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line):
+                self.wfile.write(line.encode('ascii') + b'\r\n')
+
+            def handle(self):
+                with server._lock:
+                    server.connections += 1
+                self.reply('220 localhost QrCheckin debug SMTP')
+                recipients = []
+                while True:
+                    line = self.rfile.readline()
+                    if not line:
+                        return
+                    command = line.decode('utf-8', 'replace').strip()
+                    verb = command.split(' ', 1)[0].upper()
+                    if verb == 'EHLO':
+                        self.reply('250-localhost')
+                        self.reply('250-AUTH PLAIN')
+                        self.reply('250 8BITMIME')
+                    elif verb == 'HELO':
+                        self.reply('250 localhost')
+                    elif verb == 'AUTH':
+                        self.reply('235 Authentication successful')
+                    elif verb == 'MAIL':
+                        recipients = []
+                        self.reply('250 OK')
+                    elif verb == 'RCPT':
+                        recipients.append(command.split(':', 1)[-1].strip(' <>'))
+                        self.reply('250 OK')
+                    elif verb == 'DATA':
+                        self.reply('354 End data with <CR><LF>.<CR><LF>')
+                        lines = []
+                        for data in self.rfile:
+                            if data in (b'.\r\n', b'.\n'):
+                                break
+                            lines.append(data[1:] if data.startswith(b'..') else data)
+                        server._received(message_from_bytes(b''.join(lines)), recipients)
+                        self.reply('250 OK')
+                    elif verb in ('RSET', 'NOOP'):
+                        self.reply('250 OK')
+                    elif verb == 'QUIT':
+                        self.reply('221 Bye')
+                        return
+                    else:
+                        self.reply('502 Command not implemented')
+
+        class Server(socketserver.ThreadingTCPServer):
+            daemon_threads = True
+            allow_reuse_address = True
+
+        self.server = Server((host, port), Handler)
+        self.host, self.port = self.server.server_address[:2]
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def _received(self, message, recipients):
+        with self._lock:
+            self.messages.append(message)
+        if self.echo:
+            print(f"--- {message['Subject']} -> {', '.join(recipients)}", flush=True)
+
+    def serve_forever(self):
+        self.server.serve_forever()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
@@ -1,9 +1,23 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session, make_response, current_app, g
-from .extensions import db, bcrypt, mail
-from .models import User, Team, TimeLog, TeamSetting, AuditLog
-from datetime import datetime
-import pytz
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, make_response, current_app, g, jsonify
+from .extensions import db, mail
+from .models import User, Team, TimeLog, TeamSetting, AuditLog, PunchEvent
+from .database import workload
+from .devices import (resolve_device, register_device, active_device_count,
+                      max_devices_per_user)
+from .names import clean_display_name, find_user_by_name, suggest_names, invalidate_name_index
+from .jointokens import is_rotating_token, verify_rotating_token, rotating_qr_required
+from .ratelimit import rate_limited, forget_pending_action, remember_pending_action, restore_pending_action
+from .passwords import hash_password
+from .timekeeping import get_team_workday, utcnow
+from .punches import find_open_shift, record_punch, MAX_SHIFT
+from .webhooks import enqueue_webhook, punch_data
+from .summaries import get_user_summary, current_streak
+from .sharding import team_for_key
 from math import radians, sin, cos, sqrt, atan2
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+from concurrent.futures import TimeoutError as HashTimeoutError
+from datetime import datetime
 import os
 from flask_mail import Message
 import random
@@ -13,11 +27,9 @@ import uuid
 employee_bp = Blueprint('employee', __name__)
 
 FREE_TIER_USER_LIMIT = 5
+HISTORY_PAGE_SIZE = 20
 
 # --- Helper Functions ---
-def get_day_with_suffix(d):
-    return f"{d}{'th' if 11<=d<=13 else {1:'st',2:'nd',3:'rd'}.get(d%10, 'th')}"
-
 def calculate_distance(lat1, lon1, lat2, lon2):
     R = 6371000
     lat1_rad, lon1_rad = radians(lat1), radians(lon1)
@@ -28,6 +40,34 @@ def calculate_distance(lat1, lon1, lat2, lon2):
     c = 2 * atan2(sqrt(a), sqrt(1 - a))
     return R * c
 
+def check_geofence(settings, lat, lon):
+    """
+    Checks a coordinate against the team's geofence.
+    Returns (within, distance_feet, allowed_radius_feet); raises TypeError/ValueError
+    when the geofence is not configured or the coordinates are not numbers.
+    """
+    building_lat = float(settings.get('BuildingLatitude') or os.environ.get("BUILDING_LATITUDE"))
+    building_lon = float(settings.get('BuildingLongitude') or os.environ.get("BUILDING_LONGITUDE"))
+    allowed_radius_feet = int(settings.get('GeofenceRadiusFeet') or 500)
+    distance_feet = calculate_distance(building_lat, building_lon, float(lat), float(lon)) * 3.28084
+    return distance_feet <= allowed_radius_feet, distance_feet, allowed_radius_feet
+
+def geofence_failure(user, settings, lat, lon):
+    """
+    Runs the team's location check for a clock action. Returns None when it
+    passes, otherwise the message to show; a distance failure is audit-logged.
+    """
+    try:
+        within, distance_feet, allowed_radius_feet = check_geofence(settings, lat, lon)
+    except (TypeError, ValueError, AttributeError):
+        return "Could not verify location due to a configuration error."
+    if within:
+        return None
+    log_detail = f"Clock-in failed. User was {int(distance_feet)} feet from the geofence center."
+    db.session.add(AuditLog(team_id=user.team_id, user_id=user.id, event_type="Geofence Failure", details=log_detail))
+    db.session.commit()
+    return f"You are too far away. You must be within {allowed_radius_feet} feet."
+
 def get_team_settings(team_id):
     settings_list = TeamSetting.query.filter_by(team_id=team_id).all()
     settings = {s.name: s.value for s in settings_list}
@@ -35,38 +75,102 @@ def get_team_settings(team_id):
     return settings
 
 def prepare_and_store_action(user):
-    now = datetime.now(pytz.timezone("America/Chicago"))
-    today_date = now.strftime(f"%b. {get_day_with_suffix(now.day)}, %Y")
-    log_entry = TimeLog.query.filter_by(user_id=user.id, date=today_date, clock_out=None).first()
-    already_clocked_out = TimeLog.query.filter(TimeLog.user_id == user.id, TimeLog.date == today_date, TimeLog.clock_out != None).first()
-    action_type = 'Clock Out' if log_entry else 'Clock In'
-    if already_clocked_out:
-        action_type = 'Already Clocked Out'
-    session['pending_action'] = {'user_id': user.id, 'action_type': action_type}
+    # Shifts are derived from punches, so a user may clock in again after clocking out
+    # (split shifts, lunch punches) and an open shift may have started yesterday.
+    action_type = 'Clock Out' if find_open_shift(user.id) else 'Clock In'
+    # Any debounced action for this device is out of date now.
+    forget_pending_action(request.cookies.get('device_token'))
+    # The key travels with the confirmation so a double-submitted form records one punch.
+    session['pending_action'] = {'user_id': user.id, 'action_type': action_type, 'key': str(uuid.uuid4())}
+
+def lock_user(user_id):
+    """
+    Loads the user with their row locked until commit, so concurrent actions for
+    the same person run one at a time. SQLite has no row locks: a no-op UPDATE
+    takes its write lock up front instead, before the compare-and-set reads.
+    """
+    if db.session.get_bind(mapper=User.__mapper__).dialect.name == 'sqlite':
+        db.session.execute(User.__table__.update().where(User.id == user_id).values(id=User.id))
+    return db.session.get(User, user_id, with_for_update=True)
+
+def apply_confirmed_action(user, kind, key):
+    """
+    Records a confirmed clock in/out exactly once (the caller holds the user's
+    row lock) and returns the status for the success page.
+    """
+    # The action may have been confirmed from another of the user's devices or the dashboard.
+    forget_pending_action(None, user_id=user.id)
+    status_type = 'clock_out' if kind == 'out' else 'clock_in'
+    if not action_already_applied(user, kind, key):
+        try:
+            event, _ = record_punch(user, kind, idempotency_key=key)
+            enqueue_webhook(user.team_id, status_type, punch_data(user, event))
+            db.session.commit()
+        except IntegrityError:
+            # A concurrent submit won the race (ux_time_log_open_shift or the
+            # idempotency key); its punch is the one that counts.
+            db.session.rollback()
+    return status_type
+
+def action_already_applied(user, kind, key):
+    """
+    Compare-and-set check before recording a confirmed action: True when this
+    exact submission was already recorded, or when the user is already in the
+    state the action would put them in (a second tab, a double tap).
+    """
+    if key and PunchEvent.query.filter_by(idempotency_key=key).first():
+        return True
+    is_open = find_open_shift(user.id) is not None
+    return is_open if kind == 'in' else not is_open
 
 @employee_bp.route("/join/<join_token>")
+@workload('kiosk')
+@rate_limited('device', 'ip', 'join')
 def join_team(join_token):
     device_token = request.cookies.get('device_token')
 
-    # This is the primary check for a returning user on a known device.
+    # Rotating kiosk codes are verified first and without a database lookup, so
+    # an expired screenshot or a forged code is turned away cheaply.
+    rotating_team_id = None
+    if is_rotating_token(join_token):
+        rotating_team_id = verify_rotating_token(join_token)
+        if rotating_team_id is None:
+            return render_template("qr_expired.html"), 403
+
+    # This is the primary check for a returning user on a known device. It gets
+    # the one-shot page: one tap, then a single POST that verifies, clocks and
+    # shows the result (see clock_now), with no redirects or session writes.
     if device_token:
-        user = User.query.filter_by(device_token=device_token).first()
-        if user:
-            # --- THIS IS THE FIX ---
-            # We must set the team information in the session here,
-            # because the user is skipping the 'scan' page.
-            session['join_team_id'] = user.team_id
-            session['join_team_name'] = user.team.name
-            admin = User.query.filter_by(team_id=user.team_id, role='Admin').first()
-            session['join_admin_name'] = admin.name if admin else 'N/A'
-
-            # Now that the session is correctly set up, we can prepare the action.
-            prepare_and_store_action(user)
-            return redirect(url_for('employee.confirm_entry'))
-            # --- END OF FIX ---
+        # A repeated scan within the debounce window shows the page prepared a
+        # moment ago, key included, so however many tabs it opens record one punch.
+        page = restore_pending_action(device_token, page=True)
+        user = None if page else resolve_device(device_token)
+        team_id = page['team_id'] if page else user.team_id if user else None
+        if team_id is not None:
+            # A rotating code only works for its own team's devices; otherwise any
+            # team's kiosk screen would clock in everyone.
+            if rotating_team_id is not None and rotating_team_id != team_id:
+                return render_template("qr_expired.html"), 403
+            if rotating_team_id is None and rotating_qr_required(team_id):
+                return render_template("qr_expired.html"), 403
+            if not page:
+                settings = get_team_settings(team_id)
+                page = {'user_id': user.id, 'team_id': team_id, 'worker_name': user.name,
+                        'action_type': 'Clock Out' if find_open_shift(user.id) else 'Clock In',
+                        'key': str(uuid.uuid4()),
+                        'location_required': settings.get('LocationVerificationEnabled') == 'TRUE'}
+                remember_pending_action(device_token, page=page)
+            return render_template("quick_clock.html", join_token=join_token, worker_name=page['worker_name'],
+                                   action_type=page['action_type'], key=page['key'],
+                                   location_required=page['location_required'])
 
     # If the device is not recognized, proceed to the name entry page.
-    team = Team.query.filter_by(join_token=join_token).first_or_404()
+    if rotating_team_id is not None:
+        team = Team.query.get_or_404(rotating_team_id)
+    else:
+        team = Team.query.filter_by(join_token=join_token).first_or_404()
+        if rotating_qr_required(team.id):
+            return render_template("qr_expired.html"), 403
     session['join_team_id'] = team.id
     session['join_team_name'] = team.name
     admin = User.query.filter_by(team_id=team.id, role='Admin').first()
@@ -80,10 +184,52 @@ def join_team(join_token):
 
 # In app/Project/employee.py
 
+def continue_scan_as(user_by_name, device_token, team_id):
+    """Runs the device checks for a scan once we know which user the name belongs to."""
+    name = user_by_name.name
+
+    # --- THE FINAL, CORRECT LOGIC ---
+    # The user exists. Now, let's figure out the security.
+
+    # If the user is a "Floating User", they bypass the strict token checks.
+    if user_by_name.is_floating:
+        if device_token:
+            register_device(user_by_name, device_token, request.user_agent.string) # Update token for convenience
+        db.session.commit()
+        prepare_and_store_action(user_by_name)
+        return redirect(url_for('employee.confirm_entry'))
+
+    # For NORMAL users, we enforce strict security.
+    # Check if this device is already registered to a different user.
+    user_by_token = resolve_device(device_token)
+    if user_by_token and user_by_token.id != user_by_name.id:
+        session['typo_conflict'] = {'correct_name': user_by_token.name}
+        return redirect(url_for('employee.handle_typo'))
+    
+    # A new device for this user. A second phone or tablet is fine, up to the
+    # team's limit; beyond that the name stays locked to the devices it has.
+    if not user_by_token and device_token:
+        device_count = active_device_count(user_by_name)
+        if device_count >= max_devices_per_user(team_id):
+            flash(f"<strong>Security Alert:</strong> This name is already registered to other devices. Please ask an admin to click 'Clear Devices' for {name}.", "error")
+            return redirect(url_for('employee.scan'))
+        register_device(user_by_name, device_token, request.user_agent.string)
+        if device_count:
+            db.session.add(AuditLog(team_id=team_id, user_id=user_by_name.id, event_type="Device Added",
+                                    details=f"Registered device #{device_count + 1}: {request.user_agent.string[:150]}"))
+    
+    # All checks passed. This is a secure login.
+    db.session.commit()
+    prepare_and_store_action(user_by_name)
+    return redirect(url_for('employee.confirm_entry'))
+
+# In app/Project/employee.py
+
 @employee_bp.route("/scan", methods=["GET", "POST"])
+@workload('kiosk')
 def scan():
     if request.method == 'POST':
-        name = f"{request.form.get('first_name', '').strip()} {request.form.get('last_name', '').strip()}"
+        name = clean_display_name(f"{request.form.get('first_name', '')} {request.form.get('last_name', '')}")
         device_token = request.cookies.get('device_token')
         team_id = session.get('join_team_id')
 
@@ -91,45 +237,48 @@ def scan():
             flash("You must use a valid invitation link.", "error")
             return redirect(url_for('auth.home'))
 
-        # Find the user by the name they entered.
-        user_by_name = User.query.filter_by(name=name, team_id=team_id).first()
+        # Find the user by the name they entered (ignoring case, accents and extra spaces).
+        user_by_name = find_user_by_name(team_id, name)
 
         if not user_by_name:
+            # Before registering someone new, offer close matches so a typo does
+            # not create a duplicate user.
+            suggestions = suggest_names(team_id, name)
+            if suggestions:
+                session['name_suggestions'] = {'name': name, 'user_ids': [user_id for user_id, _ in suggestions]}
+                return render_template("did_you_mean.html", typed_name=name, suggestions=suggestions)
             # The user does not exist on this team. They are brand new.
             session['new_user_registration'] = {'name': name}
             return redirect(url_for('employee.register'))
 
-        # --- THE FINAL, CORRECT LOGIC ---
-        # The user exists. Now, let's figure out the security.
+        return continue_scan_as(user_by_name, device_token, team_id)
 
-        # If the user is a "Floating User", they bypass the strict token checks.
-        if user_by_name.is_floating:
-            user_by_name.device_token = device_token # Update token for convenience
-            db.session.commit()
-            prepare_and_store_action(user_by_name)
-            return redirect(url_for('employee.confirm_entry'))
+    return render_template("scan.html", team_name=session.get('join_team_name'), admin_name=session.get('join_admin_name'))
 
-        # For NORMAL users, we enforce strict security.
-        # Check if this device is already registered to a different user.
-        user_by_token = User.query.filter_by(device_token=device_token).first()
-        if user_by_token and user_by_token.id != user_by_name.id:
-            session['typo_conflict'] = {'correct_name': user_by_token.name}
-            return redirect(url_for('employee.handle_typo'))
-        
-        # Check if this user is already locked to a different device.
-        if user_by_name.device_token and user_by_name.device_token != device_token:
-            flash(f"<strong>Security Alert:</strong> This name is registered to a different device. Please ask an admin to click 'Clear Token' for {name}.", "error")
-            return redirect(url_for('employee.scan'))
-        
-        # All checks passed. This is a secure login.
-        user_by_name.device_token = device_token
-        db.session.commit()
-        prepare_and_store_action(user_by_name)
-        return redirect(url_for('employee.confirm_entry'))
+@employee_bp.route("/scan/suggestion", methods=["POST"])
+@workload('kiosk')
+def choose_name_suggestion():
+    """Handles the answer on the 'did you mean' page: one of the suggested names, or 'I'm new'."""
+    suggestions = session.pop('name_suggestions', None)
+    team_id = session.get('join_team_id')
+    if not suggestions or not team_id:
+        return redirect(url_for('employee.scan'))
 
-    return render_template("scan.html", team_name=session.get('join_team_name'), admin_name=session.get('join_admin_name'))
+    choice = request.form.get('user_id')
+    if choice == 'new':
+        session['new_user_registration'] = {'name': suggestions['name']}
+        return redirect(url_for('employee.register'))
+
+    # Only the names we actually offered can be picked.
+    user = None
+    if choice and choice.isdigit() and int(choice) in suggestions['user_ids']:
+        user = User.query.filter_by(id=int(choice), team_id=team_id).first()
+    if not user:
+        return redirect(url_for('employee.scan'))
+    return continue_scan_as(user, request.cookies.get('device_token'), team_id)
 
 @employee_bp.route("/register", methods=["GET", "POST"])
+@workload('kiosk')
 def register():
     reg_data = session.get('new_user_registration')
     if not reg_data: return redirect(url_for('employee.scan'))
@@ -158,12 +307,14 @@ def register():
             # --- END OF CORRECTED LOGIC ---
 
             device_token = request.cookies.get('device_token')
-            user = User.query.filter_by(name=name, team_id=team_id).first()
+            user = find_user_by_name(team_id, name)
             if not user:
-                user = User(name=name, team_id=team_id, device_token=device_token)
+                user = User(name=name, team_id=team_id)
                 db.session.add(user)
-            else:
-                user.device_token = device_token
+                db.session.flush()
+                invalidate_name_index(team_id)
+            if device_token:
+                register_device(user, device_token, request.user_agent.string)
             db.session.commit()
             prepare_and_store_action(user)
             return redirect(url_for('employee.confirm_entry'))
@@ -195,6 +346,7 @@ def enable_location():
     return render_template("enable_location.html")
 
 @employee_bp.route("/confirm_entry")
+@workload('kiosk')
 def confirm_entry():
     if 'pending_action' not in session: 
         return redirect(url_for('employee.scan'))
@@ -221,51 +373,29 @@ def confirm_entry():
         return redirect(url_for('employee.enable_location'))
         
     if location_check_required:
-        try:
-            building_lat = float(settings.get('BuildingLatitude') or os.environ.get("BUILDING_LATITUDE"))
-            building_lon = float(settings.get('BuildingLongitude') or os.environ.get("BUILDING_LONGITUDE"))
-            allowed_radius_feet = int(settings.get('GeofenceRadiusFeet') or 500)
-            distance = calculate_distance(building_lat, building_lon, float(user_lat_str), float(request.args.get('lon')))
-            
-            if (distance * 3.28084) > allowed_radius_feet:
-                log_detail = f"Clock-in failed. User was {int(distance * 3.28084)} feet from the geofence center."
-                log_entry = AuditLog(team_id=user.team_id, user_id=user.id, event_type="Geofence Failure", details=log_detail)
-                db.session.add(log_entry)
-                db.session.commit()
-                return redirect(url_for('employee.location_failed', message=f"You are too far away. You must be within {allowed_radius_feet} feet."))
-        except (TypeError, ValueError, AttributeError):
-            return redirect(url_for('employee.location_failed', message="Could not verify location due to a configuration error."))
+        message = geofence_failure(user, settings, user_lat_str, request.args.get('lon'))
+        if message:
+            return redirect(url_for('employee.location_failed', message=message))
             
     return render_template("confirm.html", action_type=action_data['action_type'], worker_name=user.name, location_verified=location_check_required)
 
 @employee_bp.route("/execute_action", methods=["POST"])
+@workload('kiosk')
+@rate_limited('device')
 def execute_action():
     if 'pending_action' not in session: 
         return redirect(url_for('employee.scan'))
         
     action_data = session.pop('pending_action')
-    user = User.query.get(action_data['user_id'])
+    forget_pending_action(request.cookies.get('device_token'))
+    # Locking the user row serialises concurrent actions for the same person.
+    user = lock_user(action_data['user_id'])
 
     if not user:
         flash("This user no longer exists in the system. The action was cancelled.", "error")
         return redirect(url_for('auth.home'))
-
-    now = datetime.now(pytz.timezone("America/Chicago"))
-    today_date = now.strftime(f"%b. {get_day_with_suffix(now.day)}, %Y")
-    current_time = now.strftime("%I:%M:%S %p")
-    status_type = ''
-
-    if action_data['action_type'] == 'Clock Out':
-        log_entry = TimeLog.query.filter_by(user_id=user.id, date=today_date, clock_out=None).first()
-        if log_entry: 
-            log_entry.clock_out = current_time
-        status_type = 'clock_out'
-    else:
-        new_log = TimeLog(user_id=user.id, team_id=user.team_id, date=today_date, clock_in=current_time)
-        db.session.add(new_log)
-        status_type = 'clock_in'
-        
-    db.session.commit()
+    kind = 'out' if action_data['action_type'] == 'Clock Out' else 'in'
+    status_type = apply_confirmed_action(user, kind, action_data.get('key'))
     
     # --- THIS IS THE FIX ---
     # It now points to the new, unique endpoint name: 'employee_success'
@@ -276,9 +406,70 @@ def execute_action():
         user_id=user.id
     ))
     
+@employee_bp.route("/join/<join_token>/clock", methods=["POST"])
+@workload('kiosk')
+@rate_limited('device', 'ip', 'join')
+def clock_now(join_token):
+    """
+    One-shot clock in/out from the join page of a known device: the device
+    cookie, the join token and the coordinates arrive in one POST, and the
+    checks, the punch and the result page come back in the same round trip.
+    A JSON body gets a JSON answer instead of the page.
+    """
+    data = request.get_json(silent=True) if request.is_json else request.form
+    data = data or {}
+
+    def failed(message, template="location_failed.html"):
+        if request.is_json:
+            return jsonify({'error': message}), 403
+        return render_template(template, message=message,
+                               retry_url=url_for('employee.join_team', join_token=join_token)), 403
+
+    rotating_team_id = None
+    if is_rotating_token(join_token):
+        rotating_team_id = verify_rotating_token(join_token)
+        if rotating_team_id is None:
+            return failed("This QR code has expired. Please scan the code on the screen again.", "qr_expired.html")
+    user = resolve_device(request.cookies.get('device_token'))
+    if not user:
+        # Unknown or revoked device: back to the full scan flow.
+        if request.is_json:
+            return jsonify({'error': 'unknown device', 'scan_url': url_for('employee.join_team', join_token=join_token)}), 403
+        return redirect(url_for('employee.join_team', join_token=join_token))
+    if rotating_team_id is not None and rotating_team_id != user.team_id:
+        return failed("This QR code has expired. Please scan the code on the screen again.", "qr_expired.html")
+    if rotating_team_id is None and rotating_qr_required(user.team_id):
+        return failed("This QR code has expired. Please scan the code on the screen again.", "qr_expired.html")
+
+    settings = get_team_settings(user.team_id)
+    location_verified = settings.get('LocationVerificationEnabled') == 'TRUE'
+    if location_verified:
+        if not data.get('lat'):
+            return failed("Could not get location. Please grant permission.")
+        message = geofence_failure(user, settings, data.get('lat'), data.get('lon'))
+        if message:
+            return failed(message)
+
+    forget_pending_action(request.cookies.get('device_token'))
+    # Locking the user row serialises concurrent actions for the same person, as in execute_action.
+    user = lock_user(user.id)
+    # In or out is decided here, from the open shift. The action the page showed
+    # only cross-checks it: when they differ, that action has already happened
+    # (a double tap, another device), so it is reported rather than reversed.
+    kind = 'out' if find_open_shift(user.id) else 'in'
+    shown = {'Clock In': 'in', 'Clock Out': 'out'}.get(data.get('action'), kind)
+    if shown != kind:
+        status_type = 'clock_out' if shown == 'out' else 'clock_in'
+    else:
+        status_type = apply_confirmed_action(user, kind, data.get('key'))
+    if request.is_json:
+        return jsonify({'status': status_type, 'name': user.name, 'user_id': user.id})
+    return render_template("success.html", status_type=status_type, worker_name=user.name, user=user)
+
 # In app/Project/employee.py
 
 @employee_bp.route("/quick_clock_out", methods=["POST"])
+@workload('kiosk')
 def quick_clock_out():
     # User ID is taken from g.user if logged in, or form data if from success page
     user = g.user
@@ -318,21 +509,26 @@ def create_employee_account(user_id):
         email = request.form.get('email')
         password = request.form.get('password')
 
-        if User.query.filter_by(email=email).first():
+        if User.query.filter_by(email=email).first() or team_for_key('email', email):
             flash("That email is already in use. Please choose another.", "error")
             return redirect(url_for('employee.create_employee_account', user_id=user.id))
 
         # --- THIS IS THE NEW, SIMPLIFIED LOGIC ---
         # We are skipping the email verification and creating the account directly.
         
-        hashed_password = bcrypt.generate_password_hash(password).decode('utf-8')
-        
+        try:
+            hashed_password = hash_password(password)
+        except HashTimeoutError:
+            flash("We're busy signing people in. Please try again in a moment.", "error")
+            return render_template("employee/create_account.html", user=user), 503
+
         user.email = email
         user.password = hashed_password
         db.session.commit()
 
         # Log the user in directly.
         session['user_id'] = user.id
+        session['team_id'] = user.team_id
         flash("Your account has been created successfully! You are now logged in.", "success")
         return redirect(url_for('employee.dashboard'))
         # --- END OF NEW LOGIC ---
@@ -341,6 +537,23 @@ def create_employee_account(user_id):
 
 # In app/Project/employee.py
 
+def history_page(user_id, before=None):
+    """
+    One page of a user's shifts, newest first. Paging is keyset-based on
+    (clock_in_at, id), so later pages cost the same as the first; the cursor is
+    'ISO-timestamp_id' of the last row shown. Returns (rows, next_cursor).
+    """
+    query = TimeLog.query.filter(TimeLog.user_id == user_id, TimeLog.clock_in_at != None)
+    if before:
+        at, _, log_id = before.rpartition('_')
+        at, log_id = datetime.fromisoformat(at), int(log_id)
+        query = query.filter(or_(TimeLog.clock_in_at < at, and_(TimeLog.clock_in_at == at, TimeLog.id < log_id)))
+    rows = query.order_by(TimeLog.clock_in_at.desc(), TimeLog.id.desc()).limit(HISTORY_PAGE_SIZE + 1).all()
+    if len(rows) <= HISTORY_PAGE_SIZE:
+        return rows, None
+    last = rows[HISTORY_PAGE_SIZE - 1]
+    return rows[:HISTORY_PAGE_SIZE], f"{last.clock_in_at.isoformat()}_{last.id}"
+
 @employee_bp.route("/dashboard")
 def dashboard():
     user_id = session.get('user_id')
@@ -353,26 +566,48 @@ def dashboard():
     # --- THIS IS THE FIX ---
     # The 'from . import ...' line has been REMOVED.
     # The function can now correctly find the local helper function.
-    now = datetime.now(pytz.timezone("America/Chicago"))
-    today_date = now.strftime(f"%b. {get_day_with_suffix(now.day)}, %Y")
+    workday = get_team_workday(user.team_id)
+    today_date = workday.label
     # --- END OF FIX ---
 
-    todays_log = TimeLog.query.filter_by(user_id=user.id, date=today_date).first()
-    
+    my_logs, next_cursor = history_page(user.id)
+
+    # The newest shift decides today's status: an open shift is always the newest
+    # (ux_time_log_open_shift), so no separate query is needed.
+    todays_log = my_logs[0] if my_logs else None
     current_status = 'not_clocked_in'
-    if todays_log:
-        if todays_log.clock_out is None:
-            current_status = 'clocked_in'
-        else:
-            current_status = 'complete'
+    if todays_log and todays_log.clock_out_at is None and not todays_log.missed_clock_out \
+            and utcnow() - todays_log.clock_in_at <= MAX_SHIFT:
+        current_status = 'clocked_in'
+    elif todays_log and workday.start_utc <= todays_log.clock_in_at < workday.end_utc:
+        current_status = 'complete'
+    else:
+        todays_log = None
 
-    my_logs = TimeLog.query.filter_by(user_id=user.id).order_by(TimeLog.id.desc()).all()
+    summary = get_user_summary(user, workday)
     
     return render_template("employee/dashboard.html", 
                            logs=my_logs, 
+                           next_cursor=next_cursor,
                            current_status=current_status,
                            current_log=todays_log,
-                           today_date=today_date)
+                           today_date=today_date,
+                           summary=summary,
+                           streak=current_streak(summary, workday.day))
+
+@employee_bp.route("/dashboard/history")
+def dashboard_history():
+    """Next page of the dashboard history table, fetched by the 'Load more' button."""
+    if not g.user:
+        return jsonify({'error': 'login required'}), 401
+    try:
+        logs, next_cursor = history_page(g.user.id, request.args.get('before'))
+    except ValueError:
+        return jsonify({'error': 'invalid cursor'}), 400
+    return jsonify({
+        'html': render_template("employee/_history_rows.html", logs=logs),
+        'next': next_cursor,
+    })
 
 @employee_bp.route("/verify_email", methods=["GET", "POST"])
 def verify_employee_email():
@@ -404,6 +639,7 @@ def verify_employee_email():
 
                 session.pop('temp_employee_account_data', None)
                 session['user_id'] = user_to_update.id
+                session['team_id'] = user_to_update.team_id
                 flash("Email verified! Your account is now active and you are logged in.", "success")
                 return redirect(url_for('employee.dashboard'))
             else:
@@ -0,0 +1,294 @@
+# app/Project/exports.py
+
+from .extensions import db
+from .models import TimeLog, User
+from .timekeeping import load_team_clock_settings
+from datetime import datetime
+from xml.sax.saxutils import escape
+import csv
+import importlib.util
+import io
+import pytz
+import re
+import zipfile
+
+# Rows fetched per round trip and written per chunk; memory use is bounded by this, not the export size.
+EXPORT_BATCH_SIZE = 1000
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows'),
+}
+COLUMNAR_FORMATS = ('parquet', 'arrow')
+# Excel's sheet limit is 1,048,576 rows; larger exports continue on another sheet.
+XLSX_MAX_ROWS_PER_SHEET = 1048575
+EXCEL_EPOCH = datetime(1899, 12, 30)
+_XML_ILLEGAL = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def export_query(team_ids, since=None, until=None):
+    """
+    The one query behind every export: columns only (no ORM objects), newest
+    first, meant to be streamed with .yield_per(). `since`/`until` bound
+    clock_in_at (UTC); the caller may add the time log page's filters on top.
+    """
+    query = db.session.query(
+        TimeLog.id, TimeLog.team_id, TimeLog.user_id, User.name, TimeLog.date,
+        TimeLog.clock_in, TimeLog.clock_out, TimeLog.clock_in_at, TimeLog.clock_out_at
+    ).join(User, TimeLog.user_id == User.id).filter(TimeLog.team_id.in_(team_ids))
+    if since is not None:
+        query = query.filter(TimeLog.clock_in_at >= since)
+    if until is not None:
+        query = query.filter(TimeLog.clock_in_at < until)
+    return query.order_by(TimeLog.team_id, TimeLog.clock_in_at.desc(), TimeLog.id.desc())
+
+
+def _batches(rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == EXPORT_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def columnar_available():
+    """Parquet and Arrow exports need the optional `pyarrow` package."""
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+def export_chunks(fmt, rows):
+    """Yields the bytes of an export in `fmt` (see EXPORT_FORMATS), one batch of rows at a time."""
+    return {'csv': csv_chunks, 'xlsx': xlsx_chunks, 'parquet': parquet_chunks, 'arrow': arrow_chunks}[fmt](rows)
+
+
+class _ChunkSink:
+    """Write-only file object whose contents are collected and handed on by drain()."""
+
+    def __init__(self):
+        self.chunks = []
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+# --- CSV ---
+def csv_chunks(rows):
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(['Name', 'Date', 'Clock In', 'Clock Out'])
+    for batch in _batches(rows):
+        writer.writerows((row.name, row.date, row.clock_in, row.clock_out) for row in batch)
+        yield output.getvalue().encode('utf-8')
+        output.seek(0)
+        output.truncate()
+    yield output.getvalue().encode('utf-8')
+
+
+def attendance_csv_chunks(records, tz):
+    """CSV of schedules.Attendance records (scheduled vs actual times), in the team's timezone."""
+    def local(at):
+        return pytz.utc.localize(at).astimezone(tz).strftime('%Y-%m-%d %H:%M') if at else ''
+
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(['Name', 'Date', 'Scheduled Start', 'Scheduled End', 'Clock In', 'Clock Out',
+                     'Status', 'Minutes Late', 'Minutes Left Early'])
+    for batch in _batches(records):
+        writer.writerows((a.name, a.day.isoformat(), local(a.scheduled_start), local(a.scheduled_end),
+                          local(a.clock_in_at), local(a.clock_out_at), a.status, a.minutes_late,
+                          a.minutes_left_early) for a in batch)
+        yield output.getvalue().encode('utf-8')
+        output.seek(0)
+        output.truncate()
+    yield output.getvalue().encode('utf-8')
+
+
+# --- XLSX ---
+_XLSX_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+_REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+_XLSX_STYLES = (
+    f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<styleSheet xmlns="{_XLSX_NS}">'
+    '<numFmts count="1"><numFmt numFmtId="164" formatCode="yyyy-mm-dd hh:mm"/></numFmts>'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font><font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="4"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="2" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles></styleSheet>'
+)
+_XLSX_HEADER_ROW = ('Name', 'Date', 'Clock In', 'Clock Out', 'Hours')
+_XLSX_COLUMNS = 'ABCDE'
+# Cell styles, as indexes into cellXfs above.
+_BOLD, _DATETIME, _DECIMAL = 1, 2, 3
+
+
+def _text_cell(ref, value, style=0):
+    value = escape(_XML_ILLEGAL.sub('', str(value)))
+    style_attr = f' s="{style}"' if style else ''
+    return f'<c r="{ref}" t="inlineStr"{style_attr}><is><t>{value}</t></is></c>'
+
+
+def _number_cell(ref, value, style):
+    return f'<c r="{ref}" s="{style}"><v>{value}</v></c>'
+
+
+def _xlsx_row(number, row, utc_offset):
+    cells = [_text_cell(f'A{number}', row.name), _text_cell(f'B{number}', row.date)]
+    for column, at in (('C', row.clock_in_at), ('D', row.clock_out_at)):
+        if at is not None:
+            seconds = (at - EXCEL_EPOCH).total_seconds()
+            serial = (seconds + utc_offset(row.team_id, seconds, at)) / 86400
+            cells.append(_number_cell(f'{column}{number}', f'{serial:.8f}', _DATETIME))
+    if row.clock_in_at is not None and row.clock_out_at is not None:
+        hours = (row.clock_out_at - row.clock_in_at).total_seconds() / 3600
+        cells.append(_number_cell(f'E{number}', f'{hours:.4f}', _DECIMAL))
+    return f'<row r="{number}">{"".join(cells)}</row>'
+
+
+def xlsx_chunks(rows):
+    """
+    Streams an .xlsx workbook. Cells use inline strings (no shared-string table to
+    hold in memory) and the zip is written with data descriptors, so nothing is
+    buffered beyond one batch. Times are real date cells in each team's timezone.
+    """
+    timezones = {}
+    offsets = {}
+
+    def utc_offset(team_id, seconds, at):
+        # Timezone conversion is most of the cost per row, and offsets only change on
+        # the hour, so each team's offset is looked up once per hour of data.
+        key = (team_id, int(seconds // 3600))
+        if key not in offsets:
+            if team_id not in timezones:
+                timezones[team_id] = load_team_clock_settings(team_id)[0]
+            if len(offsets) > 100000:
+                offsets.clear()
+            offsets[key] = pytz.utc.localize(at).astimezone(timezones[team_id]).utcoffset().total_seconds()
+        return offsets[key]
+
+    sink = _ChunkSink()
+    sheets = 0
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as zf:
+        batches = _batches(rows)
+        pending = next(batches, [])
+        while True:
+            sheets += 1
+            header = ''.join(_text_cell(f'{c}1', h, _BOLD) for c, h in zip(_XLSX_COLUMNS, _XLSX_HEADER_ROW))
+            with zf.open(f'xl/worksheets/sheet{sheets}.xml', 'w') as sheet:
+                sheet.write(f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<worksheet xmlns="{_XLSX_NS}">'
+                            f'<cols><col min="1" max="2" width="24" customWidth="1"/><col min="3" max="4" width="18" customWidth="1"/></cols>'
+                            f'<sheetData><row r="1">{header}</row>'.encode('utf-8'))
+                written = 0
+                while pending and written < XLSX_MAX_ROWS_PER_SHEET:
+                    take = pending[:XLSX_MAX_ROWS_PER_SHEET - written]
+                    pending = pending[len(take):]
+                    sheet.write(''.join(_xlsx_row(written + i + 2, row, utc_offset) for i, row in enumerate(take)).encode('utf-8'))
+                    written += len(take)
+                    yield sink.drain()
+                    if not pending:
+                        pending = next(batches, [])
+                sheet.write(b'</sheetData></worksheet>')
+            if not pending:
+                break
+
+        sheet_list = ''.join(f'<sheet name="Time Log{f" {n}" if n > 1 else ""}" sheetId="{n}" r:id="rId{n}"/>'
+                             for n in range(1, sheets + 1))
+        sheet_rels = ''.join(f'<Relationship Id="rId{n}" Type="{_REL_NS}/worksheet" Target="worksheets/sheet{n}.xml"/>'
+                             for n in range(1, sheets + 1))
+        sheet_types = ''.join(f'<Override PartName="/xl/worksheets/sheet{n}.xml" '
+                              f'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+                              for n in range(1, sheets + 1))
+        zf.writestr('xl/workbook.xml', f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                    f'<workbook xmlns="{_XLSX_NS}" xmlns:r="{_REL_NS}"><sheets>{sheet_list}</sheets></workbook>')
+        zf.writestr('xl/_rels/workbook.xml.rels', f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                    f'<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">{sheet_rels}'
+                    f'<Relationship Id="rId{sheets + 1}" Type="{_REL_NS}/styles" Target="styles.xml"/></Relationships>')
+        zf.writestr('xl/styles.xml', _XLSX_STYLES)
+        zf.writestr('_rels/.rels', '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                    f'<Relationship Id="rId1" Type="{_REL_NS}/officeDocument" Target="xl/workbook.xml"/></Relationships>')
+        zf.writestr('[Content_Types].xml', '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                    '<Default Extension="xml" ContentType="application/xml"/>'
+                    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+                    '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+                    f'{sheet_types}</Types>')
+    yield sink.drain()
+
+
+# --- Parquet / Arrow (requires pyarrow) ---
+def _arrow_schema(pa):
+    return pa.schema([
+        ('id', pa.int64()),
+        ('team_id', pa.int64()),
+        ('user_id', pa.int64()),
+        ('name', pa.string()),
+        ('work_date', pa.string()),
+        ('clock_in_at', pa.timestamp('us', tz='UTC')),
+        ('clock_out_at', pa.timestamp('us', tz='UTC')),
+        ('duration_seconds', pa.int64()),
+    ])
+
+
+def _record_batches(pa, schema, rows):
+    for batch in _batches(rows):
+        yield pa.RecordBatch.from_pydict({
+            'id': [row.id for row in batch],
+            'team_id': [row.team_id for row in batch],
+            'user_id': [row.user_id for row in batch],
+            'name': [row.name for row in batch],
+            'work_date': [row.date for row in batch],
+            # Stored as naive UTC, which is what a UTC timestamp type expects.
+            'clock_in_at': [row.clock_in_at for row in batch],
+            'clock_out_at': [row.clock_out_at for row in batch],
+            'duration_seconds': [int((row.clock_out_at - row.clock_in_at).total_seconds())
+                                 if row.clock_in_at and row.clock_out_at else None for row in batch],
+        }, schema=schema)
+
+
+def parquet_chunks(rows):
+    """Streams a Parquet file, one row group per batch."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema(pa)
+    sink = _ChunkSink()
+    with pq.ParquetWriter(sink, schema) as writer:
+        for record_batch in _record_batches(pa, schema, rows):
+            writer.write_batch(record_batch)
+            yield sink.drain()
+    yield sink.drain()
+
+
+def arrow_chunks(rows):
+    """Streams an Arrow IPC stream (.arrows), one record batch per batch."""
+    import pyarrow as pa
+
+    schema = _arrow_schema(pa)
+    sink = _ChunkSink()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for record_batch in _record_batches(pa, schema, rows):
+            writer.write_batch(record_batch)
+            yield sink.drain()
+    yield sink.drain()
@@ -4,8 +4,25 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_bcrypt import Bcrypt
 from flask_mail import Mail
 from flask_session import Session
+from flask_migrate import Migrate
+from contextlib import contextmanager
+from .database import WorkloadSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': WorkloadSession})
 bcrypt = Bcrypt()
 mail = Mail()
-sess = Session()
\ No newline at end of file
+sess = Session()
+migrate = Migrate()
+
+@contextmanager
+def without_create_all(database):
+    """
+    Flask-Session 0.6 calls db.create_all() from init_app, which runs a round of
+    catalog queries per table on every worker boot. Our tables come from Alembic
+    migrations instead, so we turn the call into a no-op while it initializes.
+    """
+    database.create_all = lambda *args, **kwargs: None
+    try:
+        yield
+    finally:
+        del database.create_all
@@ -0,0 +1,59 @@
+# app/Project/health.py
+
+from flask import Blueprint, current_app, jsonify
+from .extensions import db
+from .ratelimit import metrics
+from .reportcache import report_cache_stats
+
+health_bp = Blueprint('health', __name__, url_prefix='/healthz')
+
+# Once the database is at the revision this code expects it stays there for the
+# life of the worker, so a successful check is remembered.
+_schema_ready = False
+
+def expected_schema_heads():
+    """Returns the Alembic head revision(s) shipped with this code."""
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+
+    config = Config()
+    config.set_main_option('script_location', current_app.extensions['migrate'].directory)
+    return set(ScriptDirectory.from_config(config).get_heads())
+
+def current_schema_revisions():
+    """Returns the revision(s) recorded in the database's alembic_version table."""
+    from alembic.runtime.migration import MigrationContext
+
+    with db.engine.connect() as connection:
+        return set(MigrationContext.configure(connection).get_current_heads())
+
+def check_schema():
+    """Returns (ready, details) describing whether the schema matches the code."""
+    global _schema_ready
+    if _schema_ready:
+        return True, {}
+    expected = expected_schema_heads()
+    current = current_schema_revisions()
+    _schema_ready = expected == current
+    return _schema_ready, {'expected': sorted(expected), 'current': sorted(current)}
+
+@health_bp.route("")
+def liveness():
+    return jsonify({'status': 'ok'})
+
+@health_bp.route("/ready")
+def readiness():
+    """Reports ready only when `flask db upgrade` has brought the schema up to date."""
+    try:
+        ready, details = check_schema()
+    except Exception as e:
+        current_app.logger.error(f"Readiness check failed: {e}")
+        return jsonify({'status': 'unavailable', 'error': str(e)}), 503
+    if not ready:
+        return jsonify({'status': 'schema_mismatch', **details}), 503
+    return jsonify({'status': 'ready'})
+
+@health_bp.route("/metrics")
+def rate_limit_metrics():
+    """Rejected-request and debounce counters for the kiosk routes, and this worker's report cache."""
+    return jsonify({'counters': metrics(), 'report_cache': report_cache_stats()})
@@ -0,0 +1,65 @@
+# app/Project/jointokens.py
+
+from flask import current_app
+from .models import TeamSetting
+import base64
+import hashlib
+import hmac
+import time
+
+# Rotating join tokens look like 'r1.<team_id>.<window>.<signature>'. The
+# signature covers the team and the time window, so a token can be verified
+# with nothing but the app's secret key.
+TOKEN_VERSION = 'r1'
+DEFAULT_PERIOD_SECONDS = 30
+# A code scanned just before it rotates is still accepted for one more window.
+GRACE_WINDOWS = 1
+
+
+def _period():
+    return int(current_app.config.get('ROTATING_QR_PERIOD_SECONDS') or DEFAULT_PERIOD_SECONDS)
+
+def _signing_key():
+    # Derived rather than used directly so the session signing key is never
+    # exposed to a second purpose.
+    return hmac.new(current_app.secret_key.encode('utf-8'), b'rotating-join-token', hashlib.sha256).digest()
+
+def _signature(team_id, window):
+    digest = hmac.new(_signing_key(), f"{team_id}.{window}".encode('utf-8'), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:16]).decode('ascii').rstrip('=')
+
+
+def is_rotating_token(token):
+    return token.startswith(TOKEN_VERSION + '.')
+
+
+def make_rotating_token(team_id, now=None):
+    """Returns (token, seconds_until_it_rotates) for the current time window."""
+    now = time.time() if now is None else now
+    period = _period()
+    window = int(now // period)
+    return f"{TOKEN_VERSION}.{team_id}.{window}.{_signature(team_id, window)}", period - (now % period)
+
+
+def verify_rotating_token(token, now=None):
+    """Returns the team id a valid, unexpired token was issued for, or None. Never touches the database."""
+    try:
+        version, team_id, window, signature = token.split('.')
+        team_id, window = int(team_id), int(window)
+    except ValueError:
+        return None
+    if version != TOKEN_VERSION:
+        return None
+    now = time.time() if now is None else now
+    current = int(now // _period())
+    if not current - GRACE_WINDOWS <= window <= current:
+        return None
+    if not hmac.compare_digest(signature, _signature(team_id, window)):
+        return None
+    return team_id
+
+
+def rotating_qr_required(team_id):
+    """True when the team only accepts rotating codes, so its static printed QR no longer works."""
+    setting = TeamSetting.query.filter_by(team_id=team_id, name='RotatingQrEnabled').first()
+    return bool(setting and setting.value == 'TRUE')
@@ -12,6 +12,9 @@ class Team(db.Model):
     plan = db.Column(db.String(50), nullable=False, default='Free')
     stripe_customer_id = db.Column(db.String(100), nullable=True, unique=True)
     pro_access_expires_at = db.Column(db.DateTime, nullable=True)
+    # Bumped whenever the team's TimeLog or User rows change (see dataversion.py);
+    # cached reports are keyed on it.
+    data_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     # --- THIS IS THE FIX ---
     # We now explicitly tell SQLAlchemy which foreign key is for the "owner"
@@ -21,10 +24,18 @@ class Team(db.Model):
     # We tell the 'users' relationship to use the User.team_id foreign key
     users = db.relationship('User', foreign_keys='User.team_id', backref='team', lazy=True, cascade="all, delete-orphan")
     settings = db.relationship('TeamSetting', backref='team', lazy=True, cascade="all, delete-orphan")
+    api_keys = db.relationship('ApiKey', backref='team', lazy=True, cascade="all, delete-orphan")
+
+    # Shards are routed by team id, so an id must never be reused once its team
+    # has moved away (SQLite would otherwise hand out max(id) + 1 again).
+    __table_args__ = {'sqlite_autoincrement': True}
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
+    # Lower-cased, accent- and whitespace-folded copy of `name` used for matching (kept in sync below).
+    # On Postgres it also has a pg_trgm GIN index, ix_user_name_trgm, created by migration c7.
+    name_normalized = db.Column(db.String(100), nullable=True)
     email = db.Column(db.String(120), unique=True, nullable=True)
     password = db.Column(db.String(60), nullable=True)
     role = db.Column(db.String(20), nullable=False, default='User')
@@ -34,7 +45,6 @@ class User(db.Model):
     team_id = db.Column(db.Integer, db.ForeignKey('team.id'), nullable=False)
     # --- END OF FIX ---
     
-    device_token = db.Column(db.String(36), unique=True, nullable=True)
     show_upgrade_success = db.Column(db.Boolean, default=False)
     # New column to indicate floating (not tied to a specific device)
     is_floating = db.Column(db.Boolean, nullable=False, default=False)
@@ -42,6 +52,15 @@ class User(db.Model):
     # This relationship links back to the "owner_id" on the Team model
     owned_team = db.relationship('Team', foreign_keys=[Team.owner_id], backref='owner', uselist=False)
 
+    __table_args__ = (
+        db.Index('ix_user_team_name_normalized', 'team_id', 'name_normalized'),
+    )
+
+@db.event.listens_for(User.name, 'set')
+def _normalize_user_name(user, value, oldvalue, initiator):
+    from .names import normalize_name
+    user.name_normalized = normalize_name(value)
+
 # ... (TimeLog, TeamSetting, and AuditLog classes remain unchanged) ...
 class TimeLog(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -50,8 +69,81 @@ class TimeLog(db.Model):
     date = db.Column(db.String(50), nullable=False)
     clock_in = db.Column(db.String(50), nullable=False)
     clock_out = db.Column(db.String(50), nullable=True)
+    # UTC timestamps used for range queries; the string columns above are the
+    # display values, rendered in the team's own timezone.
+    clock_in_at = db.Column(db.DateTime, nullable=True)
+    clock_out_at = db.Column(db.DateTime, nullable=True)
+    # TimeLog rows are a projection of PunchEvent; these point at the punches that produced them.
+    clock_in_event_id = db.Column(db.Integer, db.ForeignKey('punch_event.id', ondelete='SET NULL'), nullable=True)
+    clock_out_event_id = db.Column(db.Integer, db.ForeignKey('punch_event.id', ondelete='SET NULL'), nullable=True)
+    # Set when a later clock-in superseded this shift before it was closed.
+    missed_clock_out = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+    # When this row was last inserted or updated (set in dataversion.py), for display.
+    changed_at = db.Column(db.DateTime, nullable=True)
+    # Orders changes for the change feed and shard moves: assigned by the database
+    # in the writing transaction (see next_change_txid in dataversion.py).
+    change_txid = db.Column(db.BigInteger, nullable=True)
+    # No longer written; superseded by change_txid and kept until a later release drops it.
+    change_seq = db.Column(db.Integer, nullable=True)
     user = db.relationship('User', backref=db.backref('time_logs', cascade="all, delete-orphan"))
 
+    __table_args__ = (
+        db.Index('ix_time_log_team_clock_in_at', 'team_id', 'clock_in_at'),
+        db.Index('ix_time_log_team_change_txid', 'team_id', 'change_txid'),
+        db.Index('ix_time_log_user_clock_in_at', 'user_id', 'clock_in_at'),
+        # At most one open shift per user, enforced by the database so concurrent
+        # clock-ins cannot both succeed.
+        db.Index('ux_time_log_open_shift', 'user_id', unique=True,
+                 postgresql_where=db.and_(clock_out_at == None, missed_clock_out == False),
+                 sqlite_where=db.and_(clock_out_at == None, missed_clock_out == False)),
+    )
+
+class TimeLogTombstone(db.Model):
+    """A deleted TimeLog, kept so the change feed (see changes.py) can report the deletion."""
+    id = db.Column(db.Integer, primary_key=True)
+    team_id = db.Column(db.Integer, db.ForeignKey('team.id', ondelete='CASCADE'), nullable=False)
+    time_log_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, nullable=True)  # No foreign key: the user may be deleted too.
+    change_seq = db.Column(db.Integer, nullable=True)  # No longer written, as on TimeLog.
+    change_txid = db.Column(db.BigInteger, nullable=True)  # As on TimeLog.
+    deleted_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(pytz.utc).replace(tzinfo=None))
+
+    __table_args__ = (
+        db.Index('ix_time_log_tombstone_team_change_txid', 'team_id', 'change_txid'),
+    )
+
+class ChangeCounter(db.Model):
+    """
+    A single row on each SQLite database: the last change_txid handed out there,
+    standing in for Postgres transaction ids (see dataversion.py). Unused on Postgres.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+
+class PunchEvent(db.Model):
+    """
+    Append-only record of every clock-in/out. Rows are only ever inserted; the one
+    exception is `voided`, set when an admin deletes the shift a punch produced.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    team_id = db.Column(db.Integer, db.ForeignKey('team.id', ondelete='CASCADE'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    kind = db.Column(db.String(3), nullable=False)  # 'in' or 'out'
+    occurred_at = db.Column(db.DateTime, nullable=False)  # UTC
+    source = db.Column(db.String(20), nullable=False, default='kiosk')  # kiosk, api, admin, legacy
+    # For an 'out' that must close one specific shift (e.g. an admin fixing a forgotten clock-out).
+    pairs_with_id = db.Column(db.Integer, db.ForeignKey('punch_event.id', ondelete='SET NULL'), nullable=True)
+    voided = db.Column(db.Boolean, nullable=False, default=False)
+    # Set by the kiosk flow so a double-submitted confirmation records one punch.
+    idempotency_key = db.Column(db.String(36), unique=True, index=True, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(pytz.utc).replace(tzinfo=None))
+    user = db.relationship('User', backref=db.backref('punch_events', cascade="all, delete-orphan"))
+
+    __table_args__ = (
+        db.Index('ix_punch_event_user_occurred_at', 'user_id', 'occurred_at'),
+        db.Index('ix_punch_event_team_occurred_at', 'team_id', 'occurred_at'),
+    )
+
 class TeamSetting(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     team_id = db.Column(db.Integer, db.ForeignKey('team.id'), nullable=False)
@@ -65,4 +157,150 @@ class AuditLog(db.Model):
     event_type = db.Column(db.String(100), nullable=False)
     details = db.Column(db.String(255), nullable=True)
     timestamp = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(pytz.timezone("America/Chicago")))
-    user = db.relationship('User')
\ No newline at end of file
+    user = db.relationship('User')
+
+class ApiKey(db.Model):
+    """A credential for badge readers and kiosks posting to the punch API. Only the SHA-256 of the key is stored."""
+    id = db.Column(db.Integer, primary_key=True)
+    team_id = db.Column(db.Integer, db.ForeignKey('team.id', ondelete='CASCADE'), nullable=False, index=True)
+    name = db.Column(db.String(100), nullable=False)
+    key_hash = db.Column(db.String(64), unique=True, nullable=False)
+    key_prefix = db.Column(db.String(12), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(pytz.utc).replace(tzinfo=None))
+    last_used_at = db.Column(db.DateTime, nullable=True)
+    revoked = db.Column(db.Boolean, nullable=False, default=False)
+
+class ShiftSchedule(db.Model):
+    """
+    A weekly recurring shift an employee is expected to work, in the team's local
+    time. An end_time at or before start_time means the shift ends the next day.
+    Compared against TimeLog by schedules.py to find late arrivals and no-shows.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    team_id = db.Column(db.Integer, db.ForeignKey('team.id', ondelete='CASCADE'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    weekday = db.Column(db.Integer, nullable=False)  # 0 = Monday
+    start_time = db.Column(db.String(5), nullable=False)  # 'HH:MM'
+    end_time = db.Column(db.String(5), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(pytz.utc).replace(tzinfo=None))
+    user = db.relationship('User', backref=db.backref('shift_schedules', cascade="all, delete-orphan"))
+
+    __table_args__ = (
+        db.Index('ix_shift_schedule_team_user', 'team_id', 'user_id'),
+    )
+
+class WebhookEndpoint(db.Model):
+    """A customer URL that receives signed batches of clock events (see webhooks.py)."""
+    id = db.Column(db.Integer, primary_key=True)
+    team_id = db.Column(db.Integer, db.ForeignKey('team.id', ondelete='CASCADE'), nullable=False, index=True)
+    url = db.Column(db.String(500), nullable=False)
+    # Kept in plaintext because it is the HMAC key; shown to the admin once.
+    secret = db.Column(db.String(64), nullable=False)
+    active = db.Column(db.Boolean, nullable=False, default=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(pytz.utc).replace(tzinfo=None))
+    # Backoff state shared by all of the endpoint's pending deliveries.
+    consecutive_failures = db.Column(db.Integer, nullable=False, default=0)
+    retry_after = db.Column(db.DateTime, nullable=True)
+    last_success_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.String(300), nullable=True)
+    deliveries = db.relationship('WebhookDelivery', backref='endpoint', lazy='dynamic', cascade="all, delete-orphan")
+
+class WebhookDelivery(db.Model):
+    """
+    Outbox row: one event waiting to be sent to one endpoint. Written in the same
+    transaction as the change it describes and deleted once delivered; rows that
+    exhaust their retries stay behind with dead=True.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    endpoint_id = db.Column(db.Integer, db.ForeignKey('webhook_endpoint.id', ondelete='CASCADE'), nullable=False)
+    team_id = db.Column(db.Integer, db.ForeignKey('team.id', ondelete='CASCADE'), nullable=False)
+    event_id = db.Column(db.String(36), nullable=False)  # Same for every endpoint; receivers dedupe on it.
+    event_type = db.Column(db.String(40), nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # JSON
+    created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(pytz.utc).replace(tzinfo=None))
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(pytz.utc).replace(tzinfo=None))
+    dead = db.Column(db.Boolean, nullable=False, default=False)
+
+    __table_args__ = (
+        db.Index('ix_webhook_delivery_due', 'dead', 'next_attempt_at'),
+        db.Index('ix_webhook_delivery_endpoint_id', 'endpoint_id', 'id'),
+    )
+
+class Device(db.Model):
+    """A phone or tablet a user clocks in from. A user may have several; the cookie token is stored only as a SHA-256."""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False, index=True)
+    team_id = db.Column(db.Integer, db.ForeignKey('team.id', ondelete='CASCADE'), nullable=False)
+    token_hash = db.Column(db.String(64), unique=True, nullable=False)
+    user_agent = db.Column(db.String(200), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(pytz.utc).replace(tzinfo=None))
+    last_seen_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(pytz.utc).replace(tzinfo=None))
+    revoked = db.Column(db.Boolean, nullable=False, default=False)
+    user = db.relationship('User', backref=db.backref('devices', lazy=True, cascade="all, delete-orphan"))
+
+    __table_args__ = (
+        db.Index('ix_device_last_seen_at', 'last_seen_at'),
+    )
+
+class UserSummary(db.Model):
+    """
+    Cached dashboard totals for one user, updated incrementally on each clock-out
+    and recomputed from TimeLog whenever the week or pay period rolls over or a
+    shift is edited. Days are the team's work days.
+    """
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    team_id = db.Column(db.Integer, db.ForeignKey('team.id', ondelete='CASCADE'), nullable=False, index=True)
+    week_start = db.Column(db.Date, nullable=False)
+    week_seconds = db.Column(db.Integer, nullable=False, default=0)
+    period_start = db.Column(db.Date, nullable=False)
+    period_seconds = db.Column(db.Integer, nullable=False, default=0)
+    streak_days = db.Column(db.Integer, nullable=False, default=0)
+    last_work_day = db.Column(db.Date, nullable=True)
+    updated_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(pytz.utc).replace(tzinfo=None))
+
+class TeamShard(db.Model):
+    """
+    Routing table: which shard holds a team's rows (see sharding.py). Lives on the
+    primary database, like TenantKey and the sessions table. Teams with no row
+    are on the primary. `frozen` pauses the team's writes while it is being moved.
+    """
+    team_id = db.Column(db.Integer, primary_key=True)  # No foreign key: the team row may be on another database.
+    shard = db.Column(db.String(50), nullable=False)
+    frozen = db.Column(db.Boolean, nullable=False, default=False)
+    updated_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(pytz.utc).replace(tzinfo=None))
+
+class TenantKey(db.Model):
+    """
+    Directory of the unique values a request can identify its team by before it
+    knows the shard (login email, join token, API key hash, device token hash,
+    Stripe customer). Kept up to date by sharding.py while sharding is enabled.
+    `updated_at` lets a lookup tell a key whose team row is still being committed
+    from one left behind by a failed write.
+    """
+    kind = db.Column(db.String(20), primary_key=True)
+    value = db.Column(db.String(128), primary_key=True)
+    team_id = db.Column(db.Integer, nullable=False, index=True)
+    updated_at = db.Column(db.DateTime, nullable=True, default=lambda: datetime.now(pytz.utc).replace(tzinfo=None))
+
+class TenantStats(db.Model):
+    """
+    One row per team for the super admin's overview, rebuilt from every shard by
+    `flask refresh-tenant-stats` (see tenantstats.py) so the page never scans
+    tenants itself. Lives on the primary.
+    """
+    team_id = db.Column(db.Integer, primary_key=True)  # No foreign key: the team may be on another shard.
+    shard = db.Column(db.String(50), nullable=False)
+    name = db.Column(db.String(100), nullable=False)
+    admin_name = db.Column(db.String(100), nullable=True)
+    admin_email = db.Column(db.String(120), nullable=True)
+    members = db.Column(db.Integer, nullable=False, default=0)
+    active_today = db.Column(db.Integer, nullable=False, default=0)  # Distinct employees who punched in the team's current work day.
+    last_punch_at = db.Column(db.DateTime, nullable=True)  # UTC
+    plan = db.Column(db.String(50), nullable=False)
+    pro_access_expires_at = db.Column(db.DateTime, nullable=True)
+    refreshed_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_tenant_stats_name', 'name'),
+    )
@@ -0,0 +1,109 @@
+# app/Project/names.py
+
+from .extensions import db
+from .models import User
+from collections import Counter, defaultdict
+import threading
+import time
+import unicodedata
+
+# Suggestions below this trigram similarity are not worth showing.
+SUGGESTION_THRESHOLD = 0.4
+MAX_SUGGESTIONS = 3
+# Per-process name indexes are rebuilt at most this often; a name added in
+# another worker shows up in suggestions here within this many seconds.
+NAME_INDEX_SECONDS = 60
+
+_name_indexes = {}
+_name_index_lock = threading.Lock()
+
+
+def normalize_name(name):
+    """'  Jón   SMITH ' -> 'jon smith': case, accents and repeated whitespace are ignored when matching."""
+    decomposed = unicodedata.normalize('NFKD', name or '')
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return ' '.join(stripped.casefold().split())
+
+
+def clean_display_name(name):
+    """Collapses the whitespace of a typed name ('Jon  Smith ' -> 'Jon Smith') but keeps its case."""
+    return ' '.join((name or '').split())
+
+
+def trigrams(normalized):
+    """Trigrams the way pg_trgm builds them: each word padded with two leading spaces and one trailing."""
+    grams = set()
+    for word in normalized.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class NameIndex:
+    """In-memory trigram index of one team's names (used on SQLite; Postgres uses pg_trgm)."""
+
+    def __init__(self, rows):
+        self.built_at = time.monotonic()
+        self.names = {}
+        self.grams = {}
+        self.postings = defaultdict(list)
+        for user_id, name, normalized in rows:
+            grams = trigrams(normalized)
+            self.names[user_id] = name
+            self.grams[user_id] = len(grams)
+            for gram in grams:
+                self.postings[gram].append(user_id)
+
+    def search(self, normalized, limit=MAX_SUGGESTIONS, threshold=SUGGESTION_THRESHOLD):
+        """Returns [(user_id, name, similarity)], best first. Similarity is shared / total trigrams, as in pg_trgm."""
+        query = trigrams(normalized)
+        if not query:
+            return []
+        shared = Counter()
+        for gram in query:
+            shared.update(self.postings.get(gram, ()))
+        scored = []
+        for user_id, count in shared.items():
+            similarity = count / (len(query) + self.grams[user_id] - count)
+            if similarity >= threshold:
+                scored.append((similarity, user_id))
+        scored.sort(key=lambda item: (-item[0], self.names[item[1]]))
+        return [(user_id, self.names[user_id], similarity) for similarity, user_id in scored[:limit]]
+
+
+def get_name_index(team_id):
+    cached = _name_indexes.get(team_id)
+    if cached and time.monotonic() - cached.built_at < NAME_INDEX_SECONDS:
+        return cached
+    rows = db.session.query(User.id, User.name, User.name_normalized).filter(User.team_id == team_id).all()
+    index = NameIndex(rows)
+    with _name_index_lock:
+        _name_indexes[team_id] = index
+    return index
+
+
+def invalidate_name_index(team_id):
+    with _name_index_lock:
+        _name_indexes.pop(team_id, None)
+
+
+def find_user_by_name(team_id, name):
+    """Exact match on the normalized name, so 'jon  SMITH' finds 'Jon Smith'."""
+    return User.query.filter_by(team_id=team_id, name_normalized=normalize_name(name)).first()
+
+
+def suggest_names(team_id, name, limit=MAX_SUGGESTIONS):
+    """Returns [(user_id, name)] of the team's closest names to a typed one, best first."""
+    normalized = normalize_name(name)
+    if not normalized:
+        return []
+    if db.engine.dialect.name == 'postgresql':
+        # '%' uses the GIN trigram index (ix_user_name_trgm); similarity() ranks the hits.
+        similarity = db.func.similarity(User.name_normalized, normalized)
+        rows = db.session.query(User.id, User.name).filter(
+            User.team_id == team_id,
+            User.name_normalized.op('%')(normalized),
+            similarity >= SUGGESTION_THRESHOLD
+        ).order_by(similarity.desc(), User.name).limit(limit).all()
+        return [(user_id, user_name) for user_id, user_name in rows]
+    return [(user_id, user_name) for user_id, user_name, _ in get_name_index(team_id).search(normalized, limit)]
@@ -0,0 +1,330 @@
+# app/Project/online_migrations.py
+
+"""
+Helpers for Alembic revisions that change big tables while the app keeps
+serving clock-ins. A change is split into steps that each hold locks for
+milliseconds:
+
+    def upgrade():
+        add_column_nullable('time_log', sa.Column('source', sa.String(20)))
+        time_log = sa.table('time_log', sa.column('id'), sa.column('source'))
+        backfill('c15_time_log_source', time_log, {'source': 'qr'}, where=time_log.c.source.is_(None))
+        create_index_online('ix_time_log_source', 'time_log', ['source'])
+        set_not_null_online('time_log', 'source')
+
+Every step is safe to re-run, so an interrupted `flask db upgrade` is simply
+run again: finished steps are skipped and the backfill resumes where it
+stopped. Deploy code that writes the new column before running the backfill,
+so rows inserted meanwhile never need it. Migrations run without the app's
+statement timeout (see migrations/env.py), so index builds may take as long
+as they need.
+"""
+
+from alembic import op
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import logging
+import os
+import sqlalchemy as sa
+import time
+
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_BATCH_PAUSE = 0.1
+# How long DDL may wait for a table lock. Past this it gives up (and is retried) rather
+# than queueing every clock-in behind it.
+DEFAULT_LOCK_TIMEOUT_MS = 3000
+DDL_RETRIES = 5
+
+logger = logging.getLogger('alembic.online')
+
+progress_table = sa.Table(
+    'online_migration_progress', sa.MetaData(),
+    sa.Column('name', sa.String(100), primary_key=True),
+    sa.Column('last_key', sa.BigInteger(), nullable=True),
+    sa.Column('rows_done', sa.BigInteger(), nullable=False, default=0),
+    sa.Column('finished', sa.Boolean(), nullable=False, default=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+)
+
+
+def _has_column(table, column):
+    return any(c['name'] == column for c in sa.inspect(op.get_bind()).get_columns(table))
+
+
+def table_exists(table):
+    """For revisions that create a table before their online steps: a re-run finds it already committed."""
+    return sa.inspect(op.get_bind()).has_table(table)
+
+
+def _has_index(table, name):
+    return any(i['name'] == name for i in sa.inspect(op.get_bind()).get_indexes(table))
+
+
+def _now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+@contextmanager
+def outside_transaction():
+    """
+    Runs the block in autocommit mode, so each statement commits on its own and
+    no lock outlives it. Commits whatever the revision did before the block.
+    """
+    context = op.get_context()
+    if context.as_sql:
+        raise RuntimeError("Online migration steps need a live connection; they cannot run with --sql.")
+    with context.autocommit_block():
+        yield op.get_bind()
+
+
+def _ddl_with_retries(conn, statements):
+    """
+    Runs short DDL statements with a lock_timeout on Postgres, retrying when the
+    lock could not be had in time (a long report was reading the table), so the
+    statement never sits in the lock queue blocking the writers behind it.
+    """
+    postgres = conn.dialect.name == 'postgresql'
+    if postgres:
+        conn.execute(sa.text(f"SET lock_timeout = {DEFAULT_LOCK_TIMEOUT_MS}"))
+    try:
+        for statement in statements:
+            for attempt in range(1, DDL_RETRIES + 1):
+                try:
+                    conn.execute(sa.text(statement))
+                    break
+                except sa.exc.OperationalError as e:
+                    if not postgres or 'lock timeout' not in str(e) or attempt == DDL_RETRIES:
+                        raise
+                    logger.info("Lock not available, retrying in %ss (attempt %s of %s)", attempt, attempt, DDL_RETRIES)
+                    time.sleep(attempt)
+    finally:
+        if postgres:
+            conn.execute(sa.text("RESET lock_timeout"))
+
+
+# --- Step 1: add the column ---
+def _add_column(table, column):
+    if _has_column(table, column.name):
+        logger.info("%s.%s already exists", table, column.name)
+        return
+    with outside_transaction() as conn:
+        spec = sa.schema.CreateColumn(column).compile(dialect=conn.dialect)
+        quote = conn.dialect.identifier_preparer.quote
+        _ddl_with_retries(conn, [f"ALTER TABLE {quote(table)} ADD COLUMN {spec}"])
+
+
+def add_column_nullable(table, column):
+    """
+    Adds a nullable column in place. Nullable with no default (or a constant
+    default, on Postgres 11+) is a catalog-only change on Postgres and an
+    in-place ALTER on SQLite: no table rewrite, unlike batch_alter_table.
+    """
+    column.nullable = True
+    _add_column(table, column)
+
+
+def add_column_with_default(table, column):
+    """
+    Adds a NOT NULL column with a constant server_default in place. Postgres 11+
+    stores the default in the catalog instead of writing it into every row, and
+    SQLite adds it without rebuilding the table.
+    """
+    if column.server_default is None:
+        raise ValueError(f"{table}.{column.name} needs a constant server_default to be added in place.")
+    _add_column(table, column)
+
+
+def drop_column_online(table, column):
+    """
+    Drops a column without copying the table: a catalog-only DROP COLUMN on
+    Postgres, SQLite's own ALTER TABLE DROP COLUMN otherwise. SQLite refuses that
+    for a UNIQUE column; only then is the table rebuilt (batch_alter_table).
+    Drop the column's indexes first.
+    """
+    if not _has_column(table, column):
+        logger.info("%s.%s already dropped", table, column)
+        return
+    with outside_transaction() as conn:
+        quote = conn.dialect.identifier_preparer.quote
+        try:
+            _ddl_with_retries(conn, [f"ALTER TABLE {quote(table)} DROP COLUMN {quote(column)}"])
+            return
+        except sa.exc.OperationalError as e:
+            if conn.dialect.name != 'sqlite':
+                raise
+            logger.info("SQLite cannot drop %s.%s in place (%s); rebuilding the table", table, column, e.orig)
+    with op.batch_alter_table(table, schema=None) as batch_op:
+        batch_op.drop_column(column)
+
+
+# --- Step 2: backfill ---
+def _load_progress(conn, name):
+    progress_table.create(conn, checkfirst=True)
+    row = conn.execute(sa.select(progress_table).where(progress_table.c.name == name)).first()
+    if row is None:
+        conn.execute(progress_table.insert().values(name=name, last_key=None, rows_done=0, finished=False,
+                                                    updated_at=_now()))
+        return None, 0, False
+    return row.last_key, row.rows_done, row.finished
+
+
+def _save_progress(conn, name, last_key, rows_done, finished=False):
+    conn.execute(progress_table.update().where(progress_table.c.name == name).values(
+        last_key=last_key, rows_done=rows_done, finished=finished, updated_at=_now()))
+
+
+def backfill(name, table, values, where=None, key='id', batch_size=None, pause=None):
+    """
+    UPDATE table SET values [WHERE where] in primary key order, batch_size rows
+    per statement, each committed on its own and followed by a `pause` so
+    replication and the app's own writes keep up. Progress is saved under
+    `name` after each batch, so a re-run continues from the last saved batch
+    (the batch in flight when it stopped may run twice, so values must be
+    idempotent, as a plain SET is).
+
+    `table` is a sa.table() with the columns used; `values` maps column names
+    to SQL expressions, or is a callable(conn, low, high) that updates the rows
+    with low < key <= high itself (for values computed in Python).
+    MIGRATION_BATCH_SIZE / MIGRATION_BATCH_PAUSE override the defaults without
+    editing the revision.
+    """
+    batch_size = batch_size or int(os.environ.get('MIGRATION_BATCH_SIZE', DEFAULT_BATCH_SIZE))
+    pause = pause if pause is not None else float(os.environ.get('MIGRATION_BATCH_PAUSE', DEFAULT_BATCH_PAUSE))
+    key_column = table.c[key]
+
+    with outside_transaction() as conn:
+        last_key, rows_done, finished = _load_progress(conn, name)
+        if finished:
+            logger.info("%s: already backfilled (%s rows)", name, rows_done)
+            return rows_done
+        # Rows inserted after this point are written by the new code, not the backfill.
+        end_key = conn.execute(sa.select(sa.func.max(key_column))).scalar()
+        if end_key is None:
+            _save_progress(conn, name, last_key, rows_done, finished=True)
+            return rows_done
+        if last_key is None:
+            last_key = conn.execute(sa.select(sa.func.min(key_column))).scalar() - 1
+
+        started = time.monotonic()
+        while last_key < end_key:
+            # The key batch_size rows on, found through the primary key index; sparse ids stay even batches.
+            high = conn.execute(sa.select(key_column).where(key_column > last_key, key_column <= end_key)
+                                .order_by(key_column).offset(batch_size - 1).limit(1)).scalar()
+            high = end_key if high is None else high
+            if callable(values):
+                updated = values(conn, last_key, high)
+            else:
+                statement = table.update().where(key_column > last_key, key_column <= high).values(values)
+                if where is not None:
+                    statement = statement.where(where)
+                updated = conn.execute(statement).rowcount
+            rows_done += max(updated or 0, 0)
+            _save_progress(conn, name, high, rows_done)
+            last_key = high
+            logger.info("%s: %s rows, up to %s=%s of %s (%.0fs)", name, rows_done, key, last_key, end_key,
+                        time.monotonic() - started)
+            if pause and last_key < end_key:
+                time.sleep(pause)
+        _save_progress(conn, name, last_key, rows_done, finished=True)
+    return rows_done
+
+
+def forget_backfill(name):
+    """Clears a backfill's progress; call it from downgrade() so upgrading again refills the column."""
+    conn = op.get_bind()
+    if sa.inspect(conn).has_table(progress_table.name):
+        op.execute(progress_table.delete().where(progress_table.c.name == name))
+
+
+# --- Step 3: indexes and constraints ---
+def create_index_online(name, table, columns, unique=False, **kw):
+    """
+    CREATE INDEX CONCURRENTLY on Postgres: writes continue during the build. A
+    build that failed part way leaves an INVALID index behind; it is dropped and
+    rebuilt. SQLite has no concurrent build, so it is a plain CREATE INDEX.
+    """
+    with outside_transaction() as conn:
+        if conn.dialect.name == 'postgresql':
+            valid = conn.execute(sa.text(
+                "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name"
+            ), {'name': name}).scalar()
+            if valid:
+                logger.info("Index %s already exists", name)
+                return
+            if valid is False:
+                logger.info("Dropping invalid index %s left by an earlier attempt", name)
+                op.drop_index(name, table_name=table, postgresql_concurrently=True)
+            op.create_index(name, table, columns, unique=unique, postgresql_concurrently=True, **kw)
+        elif _has_index(table, name):
+            logger.info("Index %s already exists", name)
+        else:
+            op.create_index(name, table, columns, unique=unique, **kw)
+
+
+def drop_index_online(name, table):
+    """DROP INDEX CONCURRENTLY on Postgres, so queued writers never wait behind it; plain DROP INDEX on SQLite."""
+    with outside_transaction() as conn:
+        if not _has_index(table, name):
+            logger.info("Index %s already dropped", name)
+        elif conn.dialect.name == 'postgresql':
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
+        else:
+            op.drop_index(name, table_name=table)
+
+
+def add_check_constraint_online(name, table, condition):
+    """
+    Adds a CHECK constraint NOT VALID (instant) and then validates it, which on
+    Postgres scans the table without blocking writes. SQLite cannot add
+    constraints to an existing table without rebuilding it, so there it is
+    skipped and the application stays responsible for the rule.
+    """
+    conn = op.get_bind()
+    if conn.dialect.name != 'postgresql':
+        logger.info("Skipping CHECK %s on %s (SQLite would rebuild the table)", name, table)
+        return
+    quote = conn.dialect.identifier_preparer.quote
+    with outside_transaction() as conn:
+        exists = conn.execute(sa.text("SELECT 1 FROM pg_constraint WHERE conname = :name"), {'name': name}).scalar()
+        if not exists:
+            _ddl_with_retries(conn, [f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} CHECK ({condition}) NOT VALID"])
+        conn.execute(sa.text(f"ALTER TABLE {quote(table)} VALIDATE CONSTRAINT {quote(name)}"))
+
+
+def add_foreign_key_online(name, table, column, referent, ondelete=None):
+    """
+    Adds a foreign key NOT VALID (instant) and then validates it without blocking
+    writes, as add_check_constraint_online does. Skipped on SQLite, which cannot
+    add a constraint to an existing table without rebuilding it.
+    """
+    conn = op.get_bind()
+    if conn.dialect.name != 'postgresql':
+        logger.info("Skipping foreign key %s on %s (SQLite would rebuild the table)", name, table)
+        return
+    quote = conn.dialect.identifier_preparer.quote
+    on_delete = f" ON DELETE {ondelete}" if ondelete else ""
+    with outside_transaction() as conn:
+        exists = conn.execute(sa.text("SELECT 1 FROM pg_constraint WHERE conname = :name"), {'name': name}).scalar()
+        if not exists:
+            _ddl_with_retries(conn, [f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} FOREIGN KEY "
+                                     f"({quote(column)}) REFERENCES {quote(referent)} (id){on_delete} NOT VALID"])
+        conn.execute(sa.text(f"ALTER TABLE {quote(table)} VALIDATE CONSTRAINT {quote(name)}"))
+
+
+def set_not_null_online(table, column):
+    """
+    Makes a backfilled column NOT NULL. On Postgres 12+ a validated
+    `column IS NOT NULL` check lets SET NOT NULL skip its full-table scan, so
+    the exclusive lock is held for an instant; the helper check is dropped
+    afterwards. Skipped on SQLite (it would rebuild the table).
+    """
+    conn = op.get_bind()
+    if conn.dialect.name != 'postgresql':
+        logger.info("Skipping NOT NULL on %s.%s (SQLite would rebuild the table)", table, column)
+        return
+    quote = conn.dialect.identifier_preparer.quote
+    check = f"{table}_{column}_not_null"[:63]
+    add_check_constraint_online(check, table, f"{quote(column)} IS NOT NULL")
+    with outside_transaction() as conn:
+        _ddl_with_retries(conn, [f"ALTER TABLE {quote(table)} ALTER COLUMN {quote(column)} SET NOT NULL",
+                                 f"ALTER TABLE {quote(table)} DROP CONSTRAINT IF EXISTS {quote(check)}"])
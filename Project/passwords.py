@@ -0,0 +1,102 @@
+# app/Project/passwords.py
+
+from flask import current_app
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import bcrypt as _bcrypt
+import os
+import threading
+import time
+
+DEFAULT_LOG_ROUNDS = 12
+
+# One executor per process, created on first use so it is never inherited
+# across a gunicorn --preload fork.
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+# --- Work functions (module level so a process pool can pickle them) ---
+def _hash(password, rounds):
+    return _bcrypt.hashpw(password, _bcrypt.gensalt(rounds=rounds)).decode('utf-8')
+
+def _check(password, stored_hash):
+    try:
+        return _bcrypt.checkpw(password, stored_hash)
+    except ValueError:
+        # Malformed or legacy hash; treat it as a failed login rather than a 500.
+        return False
+
+
+def _get_executor():
+    """
+    Returns the bounded pool that runs bcrypt. bcrypt releases the GIL, so with
+    gunicorn's gthread workers (see gunicorn.conf.py) the worker's other threads
+    keep serving while a request waits here. PASSWORD_HASH_EXECUTOR=process
+    moves the work out of the request process entirely, and 'inline' disables
+    offloading.
+    """
+    global _executor, _executor_pid
+    kind = current_app.config.get('PASSWORD_HASH_EXECUTOR', 'thread')
+    if kind == 'inline':
+        return None
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            workers = current_app.config.get('PASSWORD_HASH_WORKERS') or os.cpu_count() or 1
+            pool_class = ProcessPoolExecutor if kind == 'process' else ThreadPoolExecutor
+            _executor = pool_class(max_workers=workers)
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def _run(fn, *args):
+    """
+    Runs fn in the pool. Raises concurrent.futures.TimeoutError if the pool is
+    too backed up to answer within PASSWORD_HASH_TIMEOUT seconds; callers ask
+    the user to try again rather than hold the request any longer.
+    """
+    executor = _get_executor()
+    if executor is None:
+        return fn(*args)
+    timeout = current_app.config.get('PASSWORD_HASH_TIMEOUT', 10)
+    return executor.submit(fn, *args).result(timeout=timeout)
+
+
+def configured_rounds():
+    return int(current_app.config.get('BCRYPT_LOG_ROUNDS') or DEFAULT_LOG_ROUNDS)
+
+
+def hash_password(password, rounds=None):
+    """Hashes a password at the configured cost. Returns the hash as a str."""
+    return _run(_hash, password.encode('utf-8'), rounds or configured_rounds())
+
+
+def verify_password(stored_hash, password):
+    """Checks a password against a stored bcrypt hash."""
+    if not stored_hash or password is None:
+        return False
+    return _run(_check, password.encode('utf-8'), stored_hash.encode('utf-8'))
+
+
+def hash_rounds(stored_hash):
+    """Reads the cost parameter out of a '$2b$12$...' hash (None if unreadable)."""
+    try:
+        return int(stored_hash.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def needs_rehash(stored_hash):
+    """True when a hash was made at a different cost than the one now configured."""
+    return hash_rounds(stored_hash) != configured_rounds()
+
+
+def benchmark(rounds, seconds=2.0):
+    """Returns verifications per second on a single core for the given cost."""
+    stored_hash = _hash(b'benchmark-password', rounds).encode('utf-8')
+    count = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        _check(b'benchmark-password', stored_hash)
+        count += 1
+    return count / (time.perf_counter() - started)
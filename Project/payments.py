@@ -4,15 +4,26 @@ from flask import Blueprint, request, redirect, url_for, g, flash, render_templa
 from .extensions import db
 from .models import Team, User
 from .decorators import admin_required
-import stripe
+from .sharding import route_by_key, route_to_team
 import os
 from datetime import datetime
 
 payments_bp = Blueprint('payments', __name__)
 
+def get_stripe():
+    """
+    Imports and configures the Stripe SDK on first use. The import alone takes
+    most of a second, and only the billing routes ever need it.
+    """
+    import stripe
+    if not stripe.api_key:
+        stripe.api_key = current_app.config.get('STRIPE_SECRET_KEY')
+    return stripe
+
 @payments_bp.route("/create-checkout-session", methods=["POST"])
 @admin_required
 def create_checkout_session():
+    stripe = get_stripe()
     price_id = os.environ.get('STRIPE_PRICE_ID')
     try:
         checkout_session = stripe.checkout.Session.create(
@@ -58,6 +69,7 @@ def create_portal_session():
         flash("No subscription found to manage.", "error")
         return redirect(url_for('admin.dashboard'))
     
+    stripe = get_stripe()
     portal_session = stripe.billing_portal.Session.create(
         customer=g.user.team.stripe_customer_id,
         return_url=url_for('admin.dashboard', _external=True),
@@ -74,6 +86,7 @@ def stripe_webhook():
     payload = request.get_data(as_text=True)
     sig_header = request.headers.get("Stripe-Signature")
     webhook_secret = os.environ.get("STRIPE_WEBHOOK_SECRET")
+    stripe = get_stripe()
 
     # If webhook secret is not configured, log warning but don't fail
     if not webhook_secret:
@@ -105,6 +118,7 @@ def stripe_webhook():
             customer_id = session.customer
 
             if team_id:
+                route_to_team(int(team_id))
                 team = Team.query.get(int(team_id))
                 if team:
                     team.plan = "Pro"
@@ -119,6 +133,7 @@ def stripe_webhook():
         # Event 2: A subscription is updated (e.g., a user cancels or renews).
         elif event_type == "customer.subscription.updated":
             customer_id = obj.get("customer")
+            route_by_key('stripe_customer', customer_id)
             team = Team.query.filter_by(stripe_customer_id=customer_id).first()
 
             if team:
@@ -144,6 +159,7 @@ def stripe_webhook():
         # Event 3: The subscription is TRULY deleted by Stripe at the period end.
         elif event_type == "customer.subscription.deleted":
             customer_id = obj.get("customer")
+            route_by_key('stripe_customer', customer_id)
             team = Team.query.filter_by(stripe_customer_id=customer_id).first()
             if team:
                 team.plan = "Free"
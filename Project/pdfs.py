@@ -0,0 +1,286 @@
+# app/Project/pdfs.py
+
+from flask import current_app, send_file, stream_with_context, Response
+import hashlib
+import json
+import os
+import threading
+import zlib
+
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792  # US Letter, in points
+MARGIN = 50
+TIMESHEET_ROWS_PER_PAGE = 38
+TIMESHEET_ROW_HEIGHT = 16
+# (header, x position, max width) of each timesheet column.
+TIMESHEET_COLUMNS = (('Name', 50, 170), ('Date', 230, 150), ('Clock In', 390, 85), ('Clock Out', 480, 85))
+DEFAULT_PDF_CACHE_MB = 100
+
+# Helvetica advance widths (1/1000 em) for ASCII 32-126, from the standard AFM.
+# Helvetica-Bold is measured with the same table, which is close enough for centering.
+_HELVETICA_WIDTHS = (
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+)
+
+_prune_lock = threading.Lock()
+
+
+# --- PDF writer ---
+def text_width(text, size):
+    return sum(_HELVETICA_WIDTHS[ord(c) - 32] if 32 <= ord(c) <= 126 else 556 for c in text) * size / 1000
+
+
+def fits_pdf_fonts(*texts):
+    """
+    Whether the built-in fonts (WinAnsi, i.e. cp1252) can show every character;
+    anything else (Cyrillic, CJK, Arabic...) would print as '?'. The routes send
+    such documents to the browser's print view instead.
+    """
+    try:
+        for text in texts:
+            str(text or '').encode('cp1252')
+    except UnicodeEncodeError:
+        return False
+    return True
+
+
+def fit_text(text, size, width):
+    """Truncates `text` with '...' so it fits in `width` points."""
+    if text_width(text, size) <= width:
+        return text
+    while text and text_width(text + '...', size) > width:
+        text = text[:-1]
+    return text + '...'
+
+
+class Canvas:
+    """Drawing operations for one page, in PDF user space (origin bottom-left)."""
+
+    def __init__(self):
+        self.ops = []
+
+    def text(self, x, y, text, size=10, bold=False):
+        encoded = str(text).encode('cp1252', 'replace')
+        encoded = encoded.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+        self.ops.append(b'BT /%s %d Tf %.2f %.2f Td (%s) Tj ET' % (b'F2' if bold else b'F1', size, x, y, encoded))
+
+    def centered_text(self, y, text, size=10, bold=False):
+        self.text((PAGE_WIDTH - text_width(str(text), size)) / 2, y, text, size, bold)
+
+    def rect(self, x, y, width, height, fill=True):
+        self.ops.append(b'%.2f %.2f %.2f %.2f re %s' % (x, y, width, height, b'f' if fill else b'S'))
+
+    def line(self, x1, y1, x2, y2, width=0.5):
+        self.ops.append(b'%.2f w %.2f %.2f m %.2f %.2f l S' % (width, x1, y1, x2, y2))
+
+    def content(self):
+        return b'\n'.join(self.ops)
+
+
+class PdfWriter:
+    """
+    Minimal PDF 1.4 writer that hands back each page's bytes as soon as it is
+    added, so a long report streams out without being held in memory. The page
+    tree and cross-reference table are written by finish(). Text uses the
+    built-in Helvetica fonts, so nothing is embedded.
+    """
+    CATALOG, PAGES, FONT, BOLD_FONT = 1, 2, 3, 4
+
+    def __init__(self):
+        self.offset = 0
+        self.offsets = {}
+        self.page_ids = []
+        self.next_id = 5
+
+    def _object(self, object_id, body):
+        self.offsets[object_id] = self.offset
+        data = b'%d 0 obj\n%s\nendobj\n' % (object_id, body)
+        self.offset += len(data)
+        return data
+
+    def start(self):
+        data = b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'
+        self.offset += len(data)
+        return data
+
+    def page(self, canvas):
+        content_id, page_id = self.next_id, self.next_id + 1
+        self.next_id += 2
+        self.page_ids.append(page_id)
+        stream = zlib.compress(canvas.content())
+        return self._object(content_id, b'<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream' % (len(stream), stream)) + \
+            self._object(page_id, b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] '
+                                  b'/Resources << /Font << /F1 %d 0 R /F2 %d 0 R >> >> /Contents %d 0 R >>'
+                                  % (self.PAGES, PAGE_WIDTH, PAGE_HEIGHT, self.FONT, self.BOLD_FONT, content_id))
+
+    def finish(self):
+        kids = b' '.join(b'%d 0 R' % page_id for page_id in self.page_ids)
+        data = b''.join([
+            self._object(self.FONT, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>'),
+            self._object(self.BOLD_FONT, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>'),
+            self._object(self.PAGES, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, len(self.page_ids))),
+            self._object(self.CATALOG, b'<< /Type /Catalog /Pages %d 0 R >>' % self.PAGES),
+        ])
+        xref_at = self.offset
+        xref = [b'xref\n0 %d\n0000000000 65535 f \n' % self.next_id]
+        xref += [b'%010d 00000 n \n' % self.offsets[object_id] for object_id in range(1, self.next_id)]
+        trailer = b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (self.next_id, self.CATALOG, xref_at)
+        return data + b''.join(xref) + trailer
+
+
+# --- Documents ---
+def _timesheet_page(title, subtitle, rows, page_number):
+    canvas = Canvas()
+    top = PAGE_HEIGHT - MARGIN
+    canvas.text(MARGIN, top, title, size=16, bold=True)
+    canvas.text(MARGIN, top - 18, subtitle, size=9)
+    header_y = top - 45
+    for header, x, _ in TIMESHEET_COLUMNS:
+        canvas.text(x, header_y, header, size=10, bold=True)
+    canvas.line(MARGIN, header_y - 5, PAGE_WIDTH - MARGIN, header_y - 5)
+    y = header_y - 5 - TIMESHEET_ROW_HEIGHT
+    for row in rows:
+        for value, (_, x, width) in zip(row, TIMESHEET_COLUMNS):
+            canvas.text(x, y, fit_text(value or 'N/A', 9, width), size=9)
+        y -= TIMESHEET_ROW_HEIGHT
+    if not rows:
+        canvas.text(MARGIN, y, "No time entries match these filters.", size=10)
+    canvas.centered_text(MARGIN - 20, f"Page {page_number}", size=8)
+    return canvas
+
+
+def render_timesheet(rows, title, subtitle):
+    """
+    Yields a timesheet PDF one page at a time. `rows` is an iterable of
+    (name, date, clock in, clock out) tuples, ideally a streamed query.
+    """
+    pdf = PdfWriter()
+    yield pdf.start()
+    page, pages = [], 0
+    for row in rows:
+        page.append(row)
+        if len(page) == TIMESHEET_ROWS_PER_PAGE:
+            pages += 1
+            yield pdf.page(_timesheet_page(title, subtitle, page, pages))
+            page = []
+    if page or not pages:
+        yield pdf.page(_timesheet_page(title, subtitle, page, pages + 1))
+    yield pdf.finish()
+
+
+def _qr_poster_page(team_name, join_link):
+    import qrcode  # Pulls in Pillow; only the QR routes need it.
+
+    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_L, border=4)
+    qr.add_data(join_link)
+    qr.make(fit=True)
+    matrix = qr.get_matrix()
+
+    canvas = Canvas()
+    canvas.centered_text(PAGE_HEIGHT - 110, "QrCheckin", size=36, bold=True)
+    canvas.centered_text(PAGE_HEIGHT - 135, "Employee Clock-In", size=16)
+    canvas.centered_text(PAGE_HEIGHT - 175, fit_text(team_name, 22, PAGE_WIDTH - 2 * MARGIN), size=22, bold=True)
+
+    # The code is drawn as vector rectangles (one per run of dark modules), so it prints sharp at any size.
+    size = 340
+    module = size / len(matrix)
+    left, top = (PAGE_WIDTH - size) / 2, PAGE_HEIGHT - 210
+    for r, row in enumerate(matrix):
+        c = 0
+        while c < len(row):
+            if row[c]:
+                start = c
+                while c < len(row) and row[c]:
+                    c += 1
+                canvas.rect(left + start * module, top - (r + 1) * module, (c - start) * module, module)
+            else:
+                c += 1
+    canvas.rect(left, top - size, size, size, fill=False)
+
+    canvas.centered_text(top - size - 45, "Scan to Clock In or Out", size=22, bold=True)
+    canvas.centered_text(top - size - 70, "Open the camera app on your phone and point it at the code above.", size=12)
+    canvas.centered_text(MARGIN, fit_text(join_link, 8, PAGE_WIDTH - 2 * MARGIN), size=8)
+    return canvas
+
+
+def render_qr_posters(posters):
+    """Yields one PDF with a poster page per (team name, join link) pair, one page at a time."""
+    pdf = PdfWriter()
+    yield pdf.start()
+    for team_name, join_link in posters:
+        yield pdf.page(_qr_poster_page(team_name, join_link))
+    yield pdf.finish()
+
+
+# --- Cache ---
+def pdf_cache_key(*parts):
+    """Content address of a document: a hash of everything that determines its bytes."""
+    return hashlib.sha256(json.dumps(parts, default=str).encode('utf-8')).hexdigest()
+
+
+def _cache_dir():
+    path = current_app.config.get('PDF_CACHE_DIR') or os.path.join(current_app.instance_path, 'pdf_cache')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _prune(directory, max_bytes):
+    """Deletes the least recently used PDFs until the cache fits in `max_bytes`."""
+    with _prune_lock:
+        entries = []
+        for entry in os.scandir(directory):
+            if entry.name.endswith('.pdf'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+def _stream_into_cache(chunks, path, max_bytes):
+    # Written next to its final name and renamed once complete, so a reader never
+    # sees half a PDF and an abandoned download leaves nothing behind.
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    complete = False
+    try:
+        with open(tmp, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+                yield chunk
+        os.replace(tmp, path)
+        complete = True
+    finally:
+        if not complete and os.path.exists(tmp):
+            os.remove(tmp)
+    _prune(os.path.dirname(path), max_bytes)
+
+
+def cached_pdf_response(key, filename, render):
+    """
+    Serves the PDF stored under `key`, or streams `render()` to the client while
+    storing it. Because the key covers the data version, a cached file never goes
+    stale; it just stops being asked for and is pruned.
+    """
+    path = os.path.join(_cache_dir(), key + '.pdf')
+    max_bytes = current_app.config.get('PDF_CACHE_MAX_MB', DEFAULT_PDF_CACHE_MB) * 1024 * 1024
+    if os.path.exists(path):
+        os.utime(path)  # Marks it recently used for pruning.
+        response = send_file(path, mimetype='application/pdf', download_name=filename, etag=key, conditional=True)
+    else:
+        response = Response(stream_with_context(_stream_into_cache(render(), path, max_bytes)),
+                            mimetype='application/pdf')
+        response.headers['Content-Disposition'] = f'inline; filename="{filename}"'
+        response.set_etag(key)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
@@ -0,0 +1,83 @@
+# app/Project/prerender.py
+
+from .compression import available_encodings, compress, negotiate_encoding
+from werkzeug.http import parse_cookie, parse_etags, quote_etag
+import hashlib
+
+# The static marketing pages. The home page is not here: it redirects returning devices.
+PRERENDERED_ENDPOINTS = ('auth.features', 'auth.about_page', 'auth.pricing', 'auth.how_to_start',
+                         'auth.help_page', 'auth.privacy_policy', 'auth.terms_of_service')
+DEFAULT_MARKETING_CACHE_SECONDS = 300
+
+
+def _render(app, endpoint, path, base_url):
+    with app.test_request_context(path, base_url=base_url):
+        return app.view_functions[endpoint]().encode('utf-8')
+
+
+def render_pages(app, endpoints=PRERENDERED_ENDPOINTS):
+    """
+    Renders each endpoint once through its real view and returns
+    {path: {encoding or None: (body, etag)}}, with every compressed variant
+    made up front at the highest setting.
+
+    Absolute URLs (url_for(..., _external=True)) are built from SERVER_NAME and
+    PREFERRED_URL_SCHEME. Without SERVER_NAME there is no host to build them
+    from, so a page whose output depends on the request's host is left out and
+    keeps being rendered per request.
+    """
+    from flask import url_for
+
+    server_name = app.config.get('SERVER_NAME')
+    scheme = app.config.get('PREFERRED_URL_SCHEME') or 'http'
+    pages = {}
+    with app.test_request_context():
+        paths = [(endpoint, url_for(endpoint)) for endpoint in endpoints]
+    for endpoint, path in paths:
+        if server_name:
+            body = _render(app, endpoint, path, f"{scheme}://{server_name}")
+        else:
+            body = _render(app, endpoint, path, 'http://prerender-a.invalid')
+            if body != _render(app, endpoint, path, 'http://prerender-b.invalid'):
+                continue
+        etag = hashlib.sha1(body).hexdigest()[:20]
+        variants = {None: (body, etag)}
+        for encoding in available_encodings():
+            variants[encoding] = (compress(body, encoding, best=True), f"{etag}-{encoding}")
+        pages[path] = variants
+    return pages
+
+
+class PrerenderedPages:
+    """
+    WSGI middleware in front of Flask that answers GET/HEAD for the marketing
+    pages from memory, before any request context, session load or query.
+    Requests that carry a session cookie go through to the normal view, since
+    that visitor may have a flashed message waiting (e.g. a cancelled checkout
+    lands on /pricing).
+    """
+
+    def __init__(self, wsgi_app, pages, session_cookie_name, max_age=DEFAULT_MARKETING_CACHE_SECONDS):
+        self.wsgi_app = wsgi_app
+        self.pages = pages
+        self.session_cookie_name = session_cookie_name
+        self.cache_control = f"public, max-age={max_age}"
+
+    def __call__(self, environ, start_response):
+        variants = self.pages.get(environ.get('PATH_INFO'))
+        if (variants is None or environ.get('REQUEST_METHOD') not in ('GET', 'HEAD')
+                or self.session_cookie_name in parse_cookie(environ)):
+            return self.wsgi_app(environ, start_response)
+
+        encoding = negotiate_encoding(environ.get('HTTP_ACCEPT_ENCODING'), [e for e in variants if e])
+        body, etag = variants[encoding]
+        headers = [('ETag', quote_etag(etag)), ('Cache-Control', self.cache_control),
+                   ('Vary', 'Accept-Encoding, Cookie')]
+        if parse_etags(environ.get('HTTP_IF_NONE_MATCH')).contains_weak(etag):
+            start_response('304 Not Modified', headers)
+            return []
+        headers += [('Content-Type', 'text/html; charset=utf-8'), ('Content-Length', str(len(body)))]
+        if encoding:
+            headers.append(('Content-Encoding', encoding))
+        start_response('200 OK', headers)
+        return [] if environ['REQUEST_METHOD'] == 'HEAD' else [body]
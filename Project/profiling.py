@@ -0,0 +1,198 @@
+# app/Project/profiling.py
+
+from flask import Flask, current_app, g, request
+from collections import Counter
+import atexit
+import os
+import random
+import sys
+import threading
+import time
+
+PROFILE_TOKEN_HEADER = 'X-Profile-Token'
+# How often a process rewrites an endpoint's file while it keeps being sampled.
+FLUSH_SECONDS = 10
+# Distinct stacks kept per endpoint; rarer ones beyond this are counted under one "[other]" stack.
+MAX_STACKS_PER_ENDPOINT = 5000
+
+# Stacks are cut at Flask's entry point, so the server's own frames are left out.
+_WSGI_APP_CODE = Flask.wsgi_app.__code__
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of selected requests from one background thread, every
+    `interval` seconds, and aggregates them per endpoint into collapsed-stack
+    files (`frame;frame;frame count`, the input of flamegraph.pl and speedscope).
+    A request that is not selected costs one random() call; the sampler thread
+    sleeps whenever no selected request is running.
+    """
+
+    def __init__(self, directory, interval, max_bytes, root):
+        self.directory = directory
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self.root = root
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.active = {}      # thread id -> Counter of the running request's stacks
+        self.endpoints = {}   # endpoint -> Counter of stacks since this process started
+        self.flushed_at = {}  # endpoint -> time.monotonic() of the last write
+        self.labels = {}      # code object -> frame label
+        self.thread = None
+        self.pid = None
+
+    # --- Sampling ---
+    def _label(self, code):
+        label = self.labels.get(code)
+        if label is None:
+            path = code.co_filename
+            marker = path.rfind('site-packages' + os.sep)
+            if marker != -1:
+                path = path[marker + len('site-packages') + 1:]
+            elif path.startswith(self.root):
+                path = path[len(self.root):].lstrip(os.sep)
+            label = self.labels[code] = f"{code.co_name} ({path}:{code.co_firstlineno})".replace(';', ':')
+        return label
+
+    def _stack(self, frame):
+        labels = []
+        while frame is not None:
+            labels.append(self._label(frame.f_code))
+            if frame.f_code is _WSGI_APP_CODE:
+                break
+            frame = frame.f_back
+        return ';'.join(reversed(labels))
+
+    def _run(self):
+        while True:
+            if not self.active:
+                self.wake.wait()
+                self.wake.clear()
+            time.sleep(self.interval)
+            with self.lock:
+                targets = list(self.active.items())
+            frames = sys._current_frames()
+            for thread_id, samples in targets:
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                stack = self._stack(frame)
+                # stop() may have taken this request's samples meanwhile and be reading them.
+                with self.lock:
+                    if self.active.get(thread_id) is samples:
+                        samples[stack] += 1
+            del frames
+
+    def _ensure_thread(self):
+        # Started on first use so it is never inherited across a gunicorn --preload fork.
+        if self.thread is None or self.pid != os.getpid():
+            with self.lock:
+                if self.thread is None or self.pid != os.getpid():
+                    self.active, self.endpoints, self.flushed_at = {}, {}, {}
+                    self.thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+                    self.thread.start()
+                    self.pid = os.getpid()
+
+    def start(self):
+        """Begins sampling the current thread's request."""
+        self._ensure_thread()
+        with self.lock:
+            self.active[threading.get_ident()] = Counter()
+        self.wake.set()
+
+    def stop(self, endpoint):
+        """Stops sampling the current thread and adds its stacks to `endpoint`'s totals."""
+        with self.lock:
+            samples = self.active.pop(threading.get_ident(), None)
+            if not samples:
+                return
+            totals = self.endpoints.setdefault(endpoint, Counter())
+            for stack, count in samples.items():
+                if stack in totals or len(totals) < MAX_STACKS_PER_ENDPOINT:
+                    totals[stack] += count
+                else:
+                    totals['[other]'] += count
+            due = time.monotonic() - self.flushed_at.get(endpoint, 0) >= FLUSH_SECONDS
+        if due:
+            self.flush(endpoint)
+
+    # --- Files ---
+    def flush(self, endpoint=None):
+        """Rewrites the collapsed-stack file of `endpoint` (or of every endpoint) for this process."""
+        if not self.endpoints:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        with self.lock:
+            endpoints = [endpoint] if endpoint else list(self.endpoints)
+            snapshots = [(name, sorted(self.endpoints[name].items())) for name in endpoints if name in self.endpoints]
+            now = time.monotonic()
+            for name, _ in snapshots:
+                self.flushed_at[name] = now
+        for name, stacks in snapshots:
+            path = os.path.join(self.directory, f"{name}.{os.getpid()}.collapsed")
+            tmp = f"{path}.tmp"
+            with open(tmp, 'w') as f:
+                f.writelines(f"{stack} {count}\n" for stack, count in stacks)
+            os.replace(tmp, path)
+        self._prune()
+
+    def _prune(self):
+        """Deletes the oldest files until the directory fits in max_bytes."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.collapsed'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+# --- Flask hooks ---
+def _should_profile():
+    config = current_app.config
+    if request.endpoint in config['PROFILE_ENDPOINTS']:
+        return True
+    token = config['PROFILE_TOKEN']
+    if token and request.headers.get(PROFILE_TOKEN_HEADER) == token:
+        return True
+    return random.random() < config['PROFILE_SAMPLE_RATE']
+
+
+def _begin_profile():
+    if _should_profile():
+        current_app.extensions['profiler'].start()
+        g.profiling = True
+
+
+def _end_profile(exc):
+    if g.get('profiling'):
+        current_app.extensions['profiler'].stop(request.endpoint or 'unmatched')
+
+
+def profiling_enabled(app):
+    config = app.config
+    return bool(config['PROFILE_SAMPLE_RATE'] or config['PROFILE_ENDPOINTS'] or config['PROFILE_TOKEN'])
+
+
+def install_profiler(app):
+    """
+    Registers the profiling hooks when profiling is configured. Must run before
+    any other before_request hook so their time is included.
+    """
+    directory = app.config['PROFILE_DIR'] or os.path.join(app.instance_path, 'profiles')
+    profiler = SamplingProfiler(directory, app.config['PROFILE_INTERVAL_MS'] / 1000,
+                                app.config['PROFILE_MAX_MB'] * 1024 * 1024, os.path.dirname(app.root_path))
+    app.extensions['profiler'] = profiler
+    app.before_request(_begin_profile)
+    app.teardown_request(_end_profile)
+    # Whatever was sampled since the last write.
+    atexit.register(profiler.flush)
+    return profiler
@@ -0,0 +1,183 @@
+# app/Project/punches.py
+
+from .extensions import db
+from .models import TimeLog, PunchEvent
+from .timekeeping import load_team_clock_settings, workday_containing, format_log_time, utcnow
+from .summaries import record_clock_out, invalidate_summaries
+from .dataversion import record_bulk_delete
+from datetime import timedelta
+from sqlalchemy import func, or_
+import pytz
+
+# An open shift older than this is treated as a forgotten clock-out: the next
+# punch starts a new shift and the old one waits for an admin to fix it.
+MAX_SHIFT = timedelta(hours=16)
+
+
+def find_open_shift(user_id, at=None):
+    """Returns the user's current open shift (within MAX_SHIFT of `at`), if any."""
+    at = at or utcnow()
+    return TimeLog.query.filter(
+        TimeLog.user_id == user_id,
+        TimeLog.clock_out_at == None,
+        TimeLog.missed_clock_out == False,
+        TimeLog.clock_in_at > at - MAX_SHIFT,
+        TimeLog.clock_in_at <= at
+    ).order_by(TimeLog.clock_in_at.desc()).first()
+
+
+def open_shifts_filter(team_id, at=None):
+    """SQL filter for every shift on a team that is open right now (crossing midnight included)."""
+    at = at or utcnow()
+    return db.and_(TimeLog.team_id == team_id, TimeLog.clock_out_at == None,
+                   TimeLog.missed_clock_out == False, TimeLog.clock_in_at > at - MAX_SHIFT)
+
+
+class ShiftProjector:
+    """
+    Derives TimeLog shifts from the PunchEvent log for one team. Each 'in' opens
+    a shift and the next 'out' closes it, so a user can have any number of shifts
+    per day and a shift may cross midnight. The projection is incremental:
+    in-order punches touch only the user's open shift, and a late (out-of-order)
+    punch replays just that user's events from the affected shift onward.
+
+    A user has at most one open shift (ux_time_log_open_shift); an 'in' that
+    arrives while one is still open marks it as a missed clock-out first.
+    """
+
+    def __init__(self, team_id):
+        self.team_id = team_id
+        self.tz, self.rollover = load_team_clock_settings(team_id)
+        self._open_shifts = {}
+        self._replaying = False
+
+    def _local(self, at):
+        return pytz.utc.localize(at).astimezone(self.tz)
+
+    def load_open_shifts(self, user_ids):
+        """Loads the open shift (stale or not) for many users in one query."""
+        for user_id in user_ids:
+            self._open_shifts[user_id] = None
+        rows = TimeLog.query.filter(
+            TimeLog.user_id.in_(list(user_ids)),
+            TimeLog.clock_out_at == None,
+            TimeLog.missed_clock_out == False
+        ).all()
+        for shift in rows:
+            self._open_shifts[shift.user_id] = shift
+
+    def _current_open_shift(self, user_id):
+        if user_id not in self._open_shifts:
+            self.load_open_shifts([user_id])
+        return self._open_shifts[user_id]
+
+    def open_shift(self, user_id, at):
+        """The user's open shift as of `at`, ignoring one left open longer than MAX_SHIFT."""
+        shift = self._current_open_shift(user_id)
+        if shift is not None and at - shift.clock_in_at > MAX_SHIFT:
+            return None
+        return shift
+
+    def apply(self, event):
+        """Projects one event. Returns the shift it opened or closed, or None for an unmatched 'out'."""
+        local = self._local(event.occurred_at)
+        if event.kind == 'in':
+            previous = self._current_open_shift(event.user_id)
+            if previous is not None and previous.clock_out_at is None:
+                previous.missed_clock_out = True
+            shift = TimeLog(
+                user_id=event.user_id, team_id=event.team_id,
+                date=workday_containing(self.tz, self.rollover, local).label,
+                clock_in=format_log_time(local), clock_in_at=event.occurred_at,
+                clock_in_event_id=event.id
+            )
+            db.session.add(shift)
+            self._open_shifts[event.user_id] = shift
+            return shift
+
+        if event.pairs_with_id:
+            shift = TimeLog.query.filter_by(user_id=event.user_id, clock_in_event_id=event.pairs_with_id).first()
+        else:
+            shift = self.open_shift(event.user_id, event.occurred_at)
+        if shift is None or shift.clock_out_at is not None or event.occurred_at <= shift.clock_in_at:
+            # Nothing to close; the punch stays in the log for the audit trail.
+            return None
+        shift.clock_out = format_log_time(local)
+        shift.clock_out_at = event.occurred_at
+        shift.clock_out_event_id = event.id
+        if self._open_shifts.get(event.user_id) is shift:
+            self._open_shifts[event.user_id] = None
+        if not self._replaying:
+            day = workday_containing(self.tz, self.rollover, self._local(shift.clock_in_at)).day
+            record_clock_out(shift, day)
+        return shift
+
+    def append(self, user_id, kind, at, source, pairs_with_id=None, idempotency_key=None, flush=True):
+        """
+        Inserts a punch into the log (caller commits) and returns the event. Batch
+        callers pass flush=False and flush once before applying the events.
+        """
+        event = PunchEvent(team_id=self.team_id, user_id=user_id, kind=kind, occurred_at=at,
+                           source=source, pairs_with_id=pairs_with_id, idempotency_key=idempotency_key)
+        db.session.add(event)
+        if flush:
+            db.session.flush()
+        return event
+
+    def rebuild(self, user_id, since=None):
+        """Re-derives a user's shifts from `since` (or from the beginning) by replaying their events."""
+        start = since
+        if since is not None:
+            # Start from the shift that was open at `since`, so it is re-paired too.
+            containing = TimeLog.query.filter(
+                TimeLog.user_id == user_id,
+                TimeLog.clock_in_at < since,
+                TimeLog.clock_in_at > since - MAX_SHIFT,
+                or_(TimeLog.clock_out_at == None, TimeLog.clock_out_at >= since)
+            ).order_by(TimeLog.clock_in_at).first()
+            if containing:
+                start = containing.clock_in_at
+
+        # Only projected rows are replaced; a row with no punch behind it is left alone.
+        stale = TimeLog.query.filter(TimeLog.user_id == user_id, TimeLog.clock_in_event_id != None)
+        events = PunchEvent.query.filter(PunchEvent.user_id == user_id, PunchEvent.voided == False)
+        if start is not None:
+            stale = stale.filter(TimeLog.clock_in_at >= start)
+            events = events.filter(PunchEvent.occurred_at >= start)
+        record_bulk_delete(db.session, self.team_id, stale)
+        stale.delete(synchronize_session='fetch')
+        # Whatever is still open before `start` is what the replay continues from.
+        self._open_shifts.pop(user_id, None)
+
+        self._replaying = True
+        try:
+            for event in events.order_by(PunchEvent.occurred_at, PunchEvent.id).all():
+                self.apply(event)
+        finally:
+            self._replaying = False
+        invalidate_summaries(user_id=user_id)
+
+    def record(self, user_id, kind, at, source, pairs_with_id=None, idempotency_key=None):
+        """Appends a punch and projects it, replaying if it arrived out of order."""
+        latest = db.session.query(func.max(PunchEvent.occurred_at)).filter(
+            PunchEvent.user_id == user_id, PunchEvent.voided == False
+        ).scalar()
+        event = self.append(user_id, kind, at, source, pairs_with_id, idempotency_key)
+        if latest is not None and at < latest:
+            self.rebuild(user_id, since=at)
+            return event, None
+        return event, self.apply(event)
+
+
+def record_punch(user, kind, at=None, source='kiosk', pairs_with_id=None, idempotency_key=None):
+    """Convenience wrapper for a single punch. The caller commits."""
+    return ShiftProjector(user.team_id).record(user.id, kind, at or utcnow(), source, pairs_with_id, idempotency_key)
+
+
+def void_shift(shift):
+    """Removes a shift by voiding the punches it was derived from (the log itself is never deleted)."""
+    event_ids = [i for i in (shift.clock_in_event_id, shift.clock_out_event_id) if i]
+    if event_ids:
+        PunchEvent.query.filter(PunchEvent.id.in_(event_ids)).update({'voided': True}, synchronize_session=False)
+    invalidate_summaries(user_id=shift.user_id)
+    db.session.delete(shift)
@@ -0,0 +1,259 @@
+# app/Project/ratelimit.py
+
+from flask import current_app, request, session
+from collections import OrderedDict
+from functools import wraps
+import json
+import os
+import threading
+import time
+
+# Defaults as (requests per minute, burst). A device is one phone, so it gets a
+# tight limit; an IP or a join token is shared by everyone scanning at a site
+# during shift change, so those are generous.
+DEFAULT_LIMITS = {
+    'device': (20, 10),
+    'ip': (300, 100),
+    'join': (300, 100),
+}
+DEFAULT_DEBOUNCE_SECONDS = 5
+
+# The session keys a kiosk scan sets up, replayed as-is by the debounce.
+PENDING_SESSION_KEYS = ('pending_action', 'join_team_id', 'join_team_name', 'join_admin_name')
+
+_store = None
+_store_pid = None
+_store_lock = threading.Lock()
+
+
+# --- Stores ---
+class MemoryStore:
+    """Per-process store. Buckets are evicted least-recently-used beyond `max_keys`."""
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()
+        self._values = OrderedDict()
+        self._counters = {}
+
+    def take(self, key, rate_per_minute, burst, now=None):
+        """Takes one token from `key`'s bucket. Returns (allowed, retry_after_seconds)."""
+        now = time.monotonic() if now is None else now
+        rate = rate_per_minute / 60.0
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (float(burst), now))
+            tokens = min(float(burst), tokens + (now - updated) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, 0 if allowed else (1 - tokens) / rate
+
+    def get(self, key):
+        with self._lock:
+            item = self._values.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires <= time.monotonic():
+                del self._values[key]
+                return None
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._values.pop(key, None)
+            self._values[key] = (value, time.monotonic() + ttl)
+            if len(self._values) > self.max_keys:
+                self._values.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._values.pop(key, None)
+
+    def incr(self, name):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + 1
+
+    def counters(self):
+        with self._lock:
+            return dict(self._counters)
+
+
+class RedisStore:
+    """Store shared by every worker and dyno. Requires the `redis` package."""
+
+    # Token bucket as one atomic script: refill, try to take, write back.
+    TAKE_SCRIPT = """
+    local tokens = tonumber(redis.call('HGET', KEYS[1], 't') or ARGV[2])
+    local updated = tonumber(redis.call('HGET', KEYS[1], 'u') or ARGV[3])
+    local rate = tonumber(ARGV[1])
+    tokens = math.min(tonumber(ARGV[2]), tokens + (tonumber(ARGV[3]) - updated) * rate)
+    local allowed = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+        allowed = 1
+    end
+    redis.call('HSET', KEYS[1], 't', tostring(tokens), 'u', ARGV[3])
+    redis.call('EXPIRE', KEYS[1], math.ceil(tonumber(ARGV[2]) / rate) + 1)
+    return {allowed, tostring(tokens)}
+    """
+
+    def __init__(self, url, prefix='qrcheckin:'):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._take = self.client.register_script(self.TAKE_SCRIPT)
+
+    def take(self, key, rate_per_minute, burst, now=None):
+        rate = rate_per_minute / 60.0
+        allowed, tokens = self._take(keys=[self.prefix + 'rl:' + key],
+                                     args=[rate, burst, time.time() if now is None else now])
+        return bool(allowed), 0 if allowed else (1 - float(tokens)) / rate
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, json.dumps(value), ex=max(1, int(ttl)))
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def incr(self, name):
+        self.client.hincrby(self.prefix + 'metrics', name, 1)
+
+    def counters(self):
+        return {k.decode(): int(v) for k, v in self.client.hgetall(self.prefix + 'metrics').items()}
+
+
+def get_store():
+    """
+    Returns this process's store: Redis when RATELIMIT_STORAGE_URL is set, so
+    limits hold across workers, otherwise in-memory. Created on first use so it
+    is never inherited across a gunicorn --preload fork.
+    """
+    global _store, _store_pid
+    with _store_lock:
+        if _store is None or _store_pid != os.getpid():
+            url = current_app.config.get('RATELIMIT_STORAGE_URL')
+            _store = RedisStore(url) if url else MemoryStore()
+            _store_pid = os.getpid()
+        return _store
+
+
+def parse_limit(value, default):
+    """Parses 'PER_MINUTE/BURST' (e.g. '20/10'); falls back to `default` when unset or malformed."""
+    try:
+        per_minute, burst = (int(part) for part in value.split('/'))
+        return per_minute, burst
+    except (AttributeError, ValueError):
+        return default
+
+
+def limits_from_env():
+    return {scope: parse_limit(os.environ.get(f'RATELIMIT_{scope.upper()}'), default)
+            for scope, default in DEFAULT_LIMITS.items()}
+
+
+# --- Rate limiting ---
+def _scope_key(scope):
+    if scope == 'device':
+        return request.cookies.get('device_token')
+    if scope == 'ip':
+        return request.remote_addr
+    if scope == 'join':
+        return (request.view_args or {}).get('join_token')
+    return None
+
+
+def rate_limited(*scopes):
+    """
+    Token-bucket limit on a kiosk route, one bucket per device token, client IP
+    and/or join token. A request over any limit gets a 429 and is counted in the
+    `rejected.<scope>` metric.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if current_app.config.get('RATELIMIT_ENABLED', True):
+                store = get_store()
+                limits = current_app.config.get('RATELIMITS') or DEFAULT_LIMITS
+                for scope in scopes:
+                    key = _scope_key(scope)
+                    if not key:
+                        continue
+                    per_minute, burst = limits[scope]
+                    allowed, retry_after = store.take(f'{scope}:{key}', per_minute, burst)
+                    if not allowed:
+                        store.incr(f'rejected.{scope}')
+                        return ("Too many requests. Please wait a moment and try again.", 429,
+                                {'Retry-After': str(max(1, int(retry_after + 0.999)))})
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+
+# --- Scan debounce ---
+def _pending_key(device_token, page):
+    return f"{'quick' if page else 'pending'}:{device_token}"
+
+
+def remember_pending_action(device_token, page=None):
+    """
+    Caches the action just prepared for this device for SCAN_DEBOUNCE_SECONDS:
+    the session's pending keys, or with `page` the one-shot clock page's values
+    (which never touch the session), kept apart from the former.
+    """
+    ttl = current_app.config.get('SCAN_DEBOUNCE_SECONDS', DEFAULT_DEBOUNCE_SECONDS)
+    if device_token and ttl:
+        if page is not None:
+            cached = {'pending_action': page}
+        else:
+            cached = {k: session[k] for k in PENDING_SESSION_KEYS if k in session}
+        cached['prepared_at'] = time.time()
+        get_store().set(_pending_key(device_token, page is not None), cached, ttl)
+
+
+def restore_pending_action(device_token, page=False):
+    """
+    Puts a recently prepared action back into the session instead of looking the
+    user up again. Returns True on a debounce hit. With `page`, returns the
+    cached one-shot page's values instead (None on a miss).
+    """
+    if not device_token or not current_app.config.get('SCAN_DEBOUNCE_SECONDS', DEFAULT_DEBOUNCE_SECONDS):
+        return None if page else False
+    store = get_store()
+    cached = store.get(_pending_key(device_token, page))
+    if not cached or 'pending_action' not in cached:
+        return None if page else False
+    # The user may have acted since, from this or any of their other devices.
+    acted_at = store.get(f"acted:{cached['pending_action']['user_id']}")
+    prepared_at = cached.pop('prepared_at', 0)
+    if acted_at and acted_at >= prepared_at:
+        return None if page else False
+    store.incr('debounce.hits')
+    if page:
+        return cached['pending_action']
+    session.update(cached)
+    return True
+
+
+def forget_pending_action(device_token, user_id=None):
+    """Drops the debounced action of a device; with `user_id`, of every device that user has."""
+    store = get_store()
+    if device_token:
+        store.delete(_pending_key(device_token, False))
+        store.delete(_pending_key(device_token, True))
+    ttl = current_app.config.get('SCAN_DEBOUNCE_SECONDS', DEFAULT_DEBOUNCE_SECONDS)
+    if user_id is not None and ttl:
+        store.set(f'acted:{user_id}', time.time(), ttl)
+
+
+def metrics():
+    """Counters for the metrics endpoint, e.g. {'rejected.device': 3, 'debounce.hits': 12}."""
+    return get_store().counters()
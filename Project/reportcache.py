@@ -0,0 +1,135 @@
+# app/Project/reportcache.py
+
+from flask import current_app
+from .dataversion import team_data_version
+from collections import OrderedDict
+import sys
+import threading
+
+DEFAULT_REPORT_CACHE_MB = 32
+# A single result bigger than this share of the cache is never stored (a huge export would flush everything else).
+MAX_ENTRY_SHARE = 4
+
+# (team_id, data_version, view, *filters) -> (size, value), least recently used first.
+_cache = OrderedDict()
+_cache_bytes = 0
+_team_versions = {}
+_stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0, 'too_large': 0}
+_cache_lock = threading.Lock()
+
+
+def _max_bytes():
+    return current_app.config.get('REPORT_CACHE_MAX_MB', DEFAULT_REPORT_CACHE_MB) * 1024 * 1024
+
+
+def approximate_size(value):
+    """Rough bytes held by a cached result: bytes/str, or rows (tuples) of plain values, or lists of those."""
+    if isinstance(value, (bytes, str)):
+        return sys.getsizeof(value)
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(approximate_size(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(approximate_size(k) + approximate_size(v) for k, v in value.items())
+    return sys.getsizeof(value)
+
+
+def report_cache_key(team_id, view, *filters):
+    """
+    The key for one report: the team, its current data version (bumped on
+    every TimeLog/User write, see dataversion.py), the view and its normalized
+    filters. Read the version before running the report's queries, so a write
+    that lands meanwhile can only make the stored result newer than its key.
+    """
+    return (team_id, team_data_version(team_id), view) + tuple(filters)
+
+
+def _drop_older_versions(team_id, version):
+    """A team's results from before its current version can never be hit again; frees them now."""
+    global _cache_bytes
+    if _team_versions.get(team_id, -1) >= version:
+        return
+    _team_versions[team_id] = version
+    for key in [k for k in _cache if k[0] == team_id and k[1] < version]:
+        size, _ = _cache.pop(key)
+        _cache_bytes -= size
+        _stats['invalidations'] += 1
+
+
+def cache_get(key):
+    """The cached result for `key`, or None."""
+    with _cache_lock:
+        _drop_older_versions(key[0], key[1])
+        entry = _cache.get(key)
+        if entry is None:
+            _stats['misses'] += 1
+            return None
+        _cache.move_to_end(key)
+        _stats['hits'] += 1
+        return entry[1]
+
+
+def cache_put(key, value, size=None):
+    """Stores a result, evicting the least recently used ones beyond REPORT_CACHE_MAX_MB."""
+    global _cache_bytes
+    max_bytes = _max_bytes()
+    if not max_bytes:
+        return value
+    size = approximate_size(value) if size is None else size
+    with _cache_lock:
+        if size > max_bytes // MAX_ENTRY_SHARE:
+            _stats['too_large'] += 1
+            return value
+        _drop_older_versions(key[0], key[1])
+        if _team_versions.get(key[0], -1) > key[1]:
+            return value  # Computed for a version that has already moved on.
+        previous = _cache.pop(key, None)
+        if previous:
+            _cache_bytes -= previous[0]
+        _cache[key] = (size, value)
+        _cache_bytes += size
+        while _cache_bytes > max_bytes:
+            _, (evicted_size, _) = _cache.popitem(last=False)
+            _cache_bytes -= evicted_size
+            _stats['evictions'] += 1
+    return value
+
+
+def cached_report(key, compute):
+    """Returns the cached result for `key`, or compute()'s result after storing it."""
+    if not _max_bytes():
+        return compute()
+    value = cache_get(key)
+    if value is None:
+        value = cache_put(key, compute())
+    return value
+
+
+def cache_into(key, chunks):
+    """
+    Passes a streamed report through while collecting it, and stores the
+    complete bytes once the stream ends. Gives up collecting (but keeps
+    streaming) when it outgrows what the cache would accept.
+    """
+    limit = _max_bytes() // MAX_ENTRY_SHARE
+    if not limit:
+        yield from chunks
+        return
+    collected, size = [], 0
+    for chunk in chunks:
+        if collected is not None:
+            collected.append(chunk)
+            size += len(chunk)
+            if size > limit:
+                collected = None
+                with _cache_lock:
+                    _stats['too_large'] += 1
+        yield chunk
+    if collected is not None:
+        cache_put(key, b''.join(collected), size)
+
+
+def report_cache_stats():
+    """Counters and occupancy for the metrics endpoint."""
+    with _cache_lock:
+        return dict(_stats, entries=len(_cache), bytes=_cache_bytes)
+
@@ -0,0 +1,144 @@
+# app/Project/schedules.py
+
+from .extensions import db
+from .models import ShiftSchedule, TeamSetting, TimeLog, User
+from .timekeeping import load_team_clock_settings, to_utc, utcnow
+from .punches import MAX_SHIFT
+from collections import namedtuple
+from operator import itemgetter
+from datetime import datetime, timedelta
+
+DEFAULT_LATE_GRACE_MINUTES = 5
+ATTENDANCE_EXPORT_DAYS = 31
+WEEKDAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+
+# One scheduled shift and what actually happened. status is one of:
+#   upcoming  - not started yet (or still inside the grace period)
+#   missing   - started, grace period over, nobody clocked in yet
+#   absent    - ended with no clock-in (no-show)
+#   late      - clocked in after start + grace
+#   on_time   - clocked in by start + grace
+# minutes_left_early is set when a closed shift ended before the scheduled end.
+Attendance = namedtuple('Attendance', [
+    'user_id', 'name', 'day', 'scheduled_start', 'scheduled_end', 'clock_in_at', 'clock_out_at',
+    'status', 'minutes_late', 'minutes_left_early'])
+
+
+def parse_hhmm(value):
+    """Parses 'HH:MM'; raises ValueError for anything else."""
+    return datetime.strptime(value, "%H:%M").time()
+
+
+def late_grace(team_id):
+    setting = TeamSetting.query.filter_by(team_id=team_id, name='LateGraceMinutes').first()
+    try:
+        return timedelta(minutes=int(setting.value)) if setting else timedelta(minutes=DEFAULT_LATE_GRACE_MINUTES)
+    except ValueError:
+        return timedelta(minutes=DEFAULT_LATE_GRACE_MINUTES)
+
+
+# --- Scheduled intervals ---
+def scheduled_intervals(team_id, first_day, last_day, tz, user_id=None):
+    """
+    Expands a team's weekly schedules into concrete UTC intervals for every day in
+    [first_day, last_day], sorted by (user, start). Each distinct local start/end
+    is converted to UTC once per day, however many employees share it, and the
+    intervals come out already in order (user, then day, then start time).
+    """
+    query = db.session.query(ShiftSchedule.user_id, User.name, ShiftSchedule.weekday,
+                             ShiftSchedule.start_time, ShiftSchedule.end_time).join(
+        User, ShiftSchedule.user_id == User.id).filter(ShiftSchedule.team_id == team_id)
+    if user_id is not None:
+        query = query.filter(ShiftSchedule.user_id == user_id)
+    users = {}
+    for uid, name, weekday, start_time, end_time in query.order_by(ShiftSchedule.user_id, ShiftSchedule.start_time):
+        users.setdefault(uid, (name, [[] for _ in WEEKDAYS]))[1][weekday].append((start_time, end_time))
+
+    days = [first_day + timedelta(days=i) for i in range((last_day - first_day).days + 1)]
+    utc_at = {}
+
+    def window(day, start_time, end_time):
+        key = (day, start_time, end_time)
+        if key not in utc_at:
+            end_day = day + timedelta(days=1) if end_time <= start_time else day
+            utc_at[key] = (to_utc(tz.localize(datetime.combine(day, parse_hhmm(start_time)))),
+                           to_utc(tz.localize(datetime.combine(end_day, parse_hhmm(end_time)))))
+        return utc_at[key]
+
+    intervals = []
+    append = intervals.append
+    for uid, (name, weekly) in users.items():
+        for day in days:
+            for start_time, end_time in weekly[day.weekday()]:
+                start, end = window(day, start_time, end_time)
+                append((uid, start, end, name, day))
+    return intervals
+
+
+def actual_intervals(team_id, start_utc, end_utc, user_id=None):
+    """The team's shifts that could match a schedule in [start_utc, end_utc), sorted by (user, clock-in)."""
+    query = db.session.query(TimeLog.user_id, TimeLog.clock_in_at, TimeLog.clock_out_at, TimeLog.missed_clock_out).filter(
+        TimeLog.team_id == team_id,
+        TimeLog.clock_in_at >= start_utc - MAX_SHIFT,
+        TimeLog.clock_in_at < end_utc)
+    if user_id is not None:
+        query = query.filter(TimeLog.user_id == user_id)
+    # Read in (team_id, clock_in_at) index order; a stable sort by user is cheaper than sorting in SQL.
+    rows = query.order_by(TimeLog.clock_in_at).all()
+    rows.sort(key=itemgetter(0))
+    return rows
+
+
+# --- Matching ---
+def match_attendance(scheduled, actual, now, grace):
+    """
+    Joins scheduled intervals to actual shifts with a single sorted sweep: both
+    lists are ordered by (user, start), so one cursor walks the actual shifts
+    while the scheduled ones are visited in order, and each list is read once.
+    A scheduled shift is matched to the first actual shift that overlaps it, so
+    an early arrival counts as on time. Open shifts run until `now`; a shift
+    superseded by a later clock-in (missed_clock_out) is treated as ending there.
+    """
+    results = []
+    append = results.append
+    minute = timedelta(minutes=1)
+    j, n = 0, len(actual)
+    for user_id, start, end, name, day in scheduled:
+        # Shifts that ended before this one starts cannot match any later scheduled shift either.
+        while j < n:
+            shift_user, clock_in_at, clock_out_at, missed_clock_out = actual[j]
+            if shift_user > user_id:
+                break
+            if shift_user == user_id:
+                shift_end = clock_out_at or (clock_in_at if missed_clock_out else now)
+                if shift_end > start:
+                    break
+            j += 1
+
+        if j == n or actual[j][0] != user_id or actual[j][1] >= end:
+            status = 'upcoming' if now < start + grace else 'missing' if now < end else 'absent'
+            append(Attendance(user_id, name, day, start, end, None, None, status, 0, 0))
+            continue
+        clock_in_at, clock_out_at = actual[j][1], actual[j][2]
+        late = clock_in_at - start
+        left_early = end - clock_out_at if clock_out_at else None
+        append(Attendance(user_id, name, day, start, end, clock_in_at, clock_out_at,
+                          'late' if late > grace else 'on_time',
+                          late // minute if late > grace else 0,
+                          left_early // minute if left_early is not None and left_early > grace else 0))
+    return results
+
+
+def team_attendance(team_id, first_day, last_day, user_id=None, now=None):
+    """
+    Attendance for every scheduled shift of a team between two local dates
+    (inclusive), ordered by (user, start). A fixed handful of queries whatever the team size.
+    """
+    tz, _ = load_team_clock_settings(team_id)
+    scheduled = scheduled_intervals(team_id, first_day, last_day, tz, user_id)
+    if not scheduled:
+        return []
+    start_utc = min(interval[1] for interval in scheduled)
+    end_utc = max(interval[2] for interval in scheduled)
+    actual = actual_intervals(team_id, start_utc, end_utc, user_id)
+    return match_attendance(scheduled, actual, now or utcnow(), late_grace(team_id))
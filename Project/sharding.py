@@ -0,0 +1,591 @@
+# app/Project/sharding.py
+
+from flask import current_app, g, has_app_context, has_request_context, request, session
+from .extensions import db
+from .models import ApiKey, Device, Team, TeamShard, TenantKey, User
+from .database import PRIMARY_SHARD, DIRECTORY_TABLES
+from .dataversion import change_horizon, next_change_txid
+from .devices import hash_device_token
+from .jointokens import is_rotating_token, verify_rotating_token
+from .timekeeping import utcnow
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import chain
+from sqlalchemy import bindparam, event, func, inspect, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+import threading
+import time
+
+# How long a process trusts its cached copy of a team's route. A move waits this
+# long after each routing change so every process has seen it.
+ROUTE_CACHE_SECONDS = 5
+MOVE_BATCH_SIZE = 1000
+# How long a directory key may point at a row its team's shard does not have
+# before a lookup removes it; the writer commits the key first (see _update_directory).
+KEY_REPAIR_GRACE_SECONDS = 60
+# Ids each shard hands out on Postgres (see init_shard), so rows moved between
+# shards never collide. Integer keys leave room for 21 shards.
+SHARD_ID_SPAN = 100_000_000
+
+# Every table holding a team's rows, parents before children. A team always
+# moves as a unit, so joins never cross databases.
+TENANT_TABLES = ('team', 'user', 'punch_event', 'time_log', 'time_log_tombstone', 'team_setting', 'audit_log',
+                 'api_key', 'shift_schedule', 'webhook_endpoint', 'webhook_delivery', 'device', 'user_summary')
+# Rows here are never updated, so the final sync of a move only adds and removes rows.
+_APPEND_ONLY = ('time_log_tombstone', 'audit_log')
+# Large tables whose updated rows can be found without reading every row; the
+# remaining (small) tables are re-copied whole.
+_UPDATED_SINCE = {
+    'time_log': lambda table, since: or_(table.c.change_txid >= since, table.c.change_txid == None),
+    'punch_event': lambda table, since: table.c.voided == True,
+}
+# Tables whose change_txid (see dataversion.py) is only meaningful on the
+# database that assigned it; moved rows are stamped afresh on the target.
+_CHANGE_ORDERED = ('time_log', 'time_log_tombstone')
+# Unique values that identify a team before the request knows its shard:
+# (kind, model, column, attribute holding the team id).
+DIRECTORY_KEYS = (
+    ('email', User, 'email', 'team_id'),
+    ('join_token', Team, 'join_token', 'id'),
+    ('stripe_customer', Team, 'stripe_customer_id', 'id'),
+    ('api_key', ApiKey, 'key_hash', 'team_id'),
+    ('device', Device, 'token_hash', 'team_id'),
+)
+
+_route_cache = {}
+_route_lock = threading.Lock()
+
+
+class TeamMovingError(Exception):
+    """A write to a team whose writes are paused while it moves to another shard."""
+
+
+class ShardMoveError(Exception):
+    pass
+
+
+def sharding_enabled():
+    return len(current_app.config.get('SHARDS', ())) > 1
+
+
+def shard_engine(name):
+    return db.engines[None] if name == PRIMARY_SHARD else db.engines[f"shard:{name}"]
+
+
+# --- Routing ---
+def _read_route(team_id):
+    row = db.session.query(TeamShard.shard, TeamShard.frozen).filter(TeamShard.team_id == team_id).first()
+    return (row.shard, row.frozen) if row else (PRIMARY_SHARD, False)
+
+
+def team_route(team_id):
+    """(shard, frozen) for a team, cached per process for ROUTE_CACHE_SECONDS."""
+    now = time.monotonic()
+    cached = _route_cache.get(team_id)
+    if cached and cached[0] > now:
+        return cached[1]
+    route = _read_route(team_id)
+    with _route_lock:
+        _route_cache[team_id] = (now + ROUTE_CACHE_SECONDS, route)
+    return route
+
+
+def invalidate_route(team_id):
+    with _route_lock:
+        _route_cache.pop(team_id, None)
+
+
+def route_to_team(team_id):
+    """
+    Points the rest of the request (or CLI command) at the team's shard. None
+    means the primary, which is also where new teams are created.
+    """
+    shard, frozen = team_route(team_id) if team_id is not None and sharding_enabled() else (PRIMARY_SHARD, False)
+    g.db_shard = None if shard == PRIMARY_SHARD else shard
+    g.db_team_frozen = frozen
+
+
+def _key_exists(kind, value, team_id):
+    """Whether the team's own shard holds the row a directory key points at."""
+    model, column, team_attr = next((model, column, team_attr)
+                                    for key_kind, model, column, team_attr in DIRECTORY_KEYS if key_kind == kind)
+    query = select(getattr(model, team_attr)).where(getattr(model, column) == value,
+                                                    getattr(model, team_attr) == team_id)
+    shard, _ = team_route(team_id)
+    return db.session.execute(query, bind_arguments={'bind': shard_engine(shard)}).first() is not None
+
+
+def team_for_key(kind, value):
+    """
+    The team a directory key (see DIRECTORY_KEYS) belongs to, or None. Always
+    None without sharding. A key whose row is missing from the team's shard (its
+    write failed after the directory was updated, see _update_directory) is
+    ignored, and removed once it is older than KEY_REPAIR_GRACE_SECONDS.
+    """
+    if not value or not sharding_enabled():
+        return None
+    row = db.session.query(TenantKey.team_id, TenantKey.updated_at).filter(
+        TenantKey.kind == kind, TenantKey.value == value).first()
+    if row is None:
+        return None
+    if _key_exists(kind, value, row.team_id):
+        return row.team_id
+    if row.updated_at is None or row.updated_at < utcnow() - timedelta(seconds=KEY_REPAIR_GRACE_SECONDS):
+        table = TenantKey.__table__
+        with shard_engine(PRIMARY_SHARD).begin() as conn:
+            conn.execute(table.delete().where(table.c.kind == kind, table.c.value == value,
+                                              table.c.team_id == row.team_id))
+    return None
+
+
+def route_by_key(kind, value):
+    """Routes to the team owning a directory key, if any, and returns its id."""
+    team_id = team_for_key(kind, value)
+    if team_id is not None:
+        route_to_team(team_id)
+    return team_id
+
+
+def _team_from_request():
+    join_token = (request.view_args or {}).get('join_token')
+    if join_token:
+        if is_rotating_token(join_token):
+            return verify_rotating_token(join_token)
+        return team_for_key('join_token', join_token)
+    auth_header = request.headers.get('Authorization', '')
+    if auth_header.startswith('Bearer '):
+        from .api import hash_api_key
+        return team_for_key('api_key', hash_api_key(auth_header[7:].strip()))
+    team_id = session.get('team_id') or session.get('join_team_id')
+    if team_id:
+        return team_id
+    device_token = request.cookies.get('device_token')
+    return team_for_key('device', hash_device_token(device_token)) if device_token else None
+
+
+def select_request_shard():
+    """before_request hook: routes to the request's team before load_logged_in_user (or anything else) queries."""
+    g.db_shard, g.db_team_frozen = None, False
+    if sharding_enabled():
+        team_id = _team_from_request()
+        if team_id is not None:
+            route_to_team(team_id)
+
+
+def cross_shard(fn):
+    """
+    Calls fn(session) once per shard, each with its own short-lived session, and
+    returns [(shard, result)]. Reading every tenant is reserved for the super
+    admin (and CLI commands); everything else sees one team's shard.
+    """
+    if has_request_context() and not g.get('is_super_admin'):
+        raise PermissionError("Cross-shard queries are limited to the super admin.")
+    results = []
+    for name in current_app.config.get('SHARDS', (PRIMARY_SHARD,)):
+        with Session(bind=shard_engine(name)) as shard_session:
+            results.append((name, fn(shard_session)))
+    return results
+
+
+@contextmanager
+def use_shard(name):
+    """For jobs that work through one shard at a time: `with use_shard('eu'): ...`."""
+    if name not in current_app.config.get('SHARDS', (PRIMARY_SHARD,)):
+        raise ValueError(f"Unknown shard {name!r}")
+    previous = g.get('db_shard')
+    g.db_shard = None if name == PRIMARY_SHARD else name
+    try:
+        yield
+    finally:
+        # Objects loaded from this shard must not be mistaken for another shard's rows with the same ids.
+        db.session.remove()
+        g.db_shard = previous
+
+
+def each_shard(names=()):
+    """
+    For CLI commands that cover every team: yields each shard's name (only
+    `names`, if given) with the session pointed at it, as use_shard does.
+    """
+    for name in names or current_app.config.get('SHARDS', (PRIMARY_SHARD,)):
+        with use_shard(name):
+            yield name
+
+
+# --- Directory upkeep (in the writer's flush) ---
+def _directory_changes(session):
+    """
+    The directory keys a flush adds or re-points ({(kind, value): team_id}) and
+    the ones it retires ({(kind, value): team_id}), plus the engine the tenant
+    rows were written to.
+    """
+    stale, current, tenant_engine = {}, {}, None
+    for obj in chain(session.new, session.dirty, session.deleted):
+        for kind, model, column, team_attr in DIRECTORY_KEYS:
+            if not isinstance(obj, model):
+                continue
+            if tenant_engine is None:
+                tenant_engine = session.get_bind(mapper=model.__mapper__)
+            state = inspect(obj)
+            history = state.attrs[column].history
+            team_history = state.attrs[team_attr].history
+            old_team_id = (team_history.deleted or [getattr(obj, team_attr)])[0]
+            stale.update(((kind, value), old_team_id) for value in history.deleted if value)
+            value = state.dict.get(column)
+            if obj in session.deleted:
+                stale[(kind, value)] = old_team_id
+            elif value and (obj in session.new or history.added or team_history.added):
+                current[(kind, value)] = getattr(obj, team_attr)
+    stale = {key: team_id for key, team_id in stale.items() if key[1] is not None and key not in current}
+    return current, stale, tenant_engine
+
+
+def _delete_keys(conn, keys):
+    table = TenantKey.__table__
+    for (kind, value), team_id in keys.items():
+        conn.execute(table.delete().where(table.c.kind == kind, table.c.value == value, table.c.team_id == team_id))
+
+
+def _upsert_keys(conn, keys):
+    table = TenantKey.__table__
+    for (kind, value), team_id in keys.items():
+        values = {'team_id': team_id, 'updated_at': utcnow()}
+        if not conn.execute(table.update().where(table.c.kind == kind, table.c.value == value)
+                            .values(**values)).rowcount:
+            conn.execute(table.insert().values(kind=kind, value=value, **values))
+
+
+def _load_old_key(target, value, oldvalue, initiator):
+    pass
+
+
+# A key replaced after its row was expired (by a commit) would otherwise have no old
+# value in its history, and its directory row would never be retired.
+for _, model, column, team_attr in DIRECTORY_KEYS:
+    for attr in {column, team_attr} - {'id'}:
+        event.listen(getattr(model, attr), 'set', _load_old_key, active_history=True)
+
+
+@event.listens_for(Session, 'after_flush')
+def _update_directory(session, flush_context):
+    """
+    Keeps TenantKey in step with the keys a flush writes. On the primary the
+    directory rows join the writer's transaction. A team on another shard
+    cannot share a transaction with the directory, so:
+
+    - new keys are committed to the directory straight away, before the team's
+      rows, so a committed row is always found (a key whose write then fails is
+      skipped and cleaned up by team_for_key);
+    - re-pointed and retired keys are changed once the team's rows are
+      committed, so a rollback leaves the old keys in place.
+    """
+    if not has_app_context() or not sharding_enabled():
+        return
+    current, stale, tenant_engine = _directory_changes(session)
+    if not current and not stale:
+        return
+    directory_engine = session.get_bind(mapper=TenantKey.__mapper__)
+    if directory_engine is tenant_engine:
+        table = TenantKey.__table__
+        for (kind, value) in chain(current, stale):
+            session.execute(table.delete().where(table.c.kind == kind, table.c.value == value))
+        if current:
+            session.execute(table.insert(), [{'kind': kind, 'value': value, 'team_id': team_id}
+                                             for (kind, value), team_id in current.items()])
+        return
+
+    table = TenantKey.__table__
+    added, repointed = {}, {}
+    with directory_engine.begin() as conn:
+        for (kind, value), team_id in current.items():
+            found = conn.execute(select(table.c.team_id).where(table.c.kind == kind, table.c.value == value)).first()
+            (repointed if found else added)[(kind, value)] = team_id
+        if added:
+            # A key another team committed meanwhile fails here, which fails the flush as a unique index would.
+            conn.execute(table.insert(), [{'kind': kind, 'value': value, 'team_id': team_id}
+                                          for (kind, value), team_id in added.items()])
+    session.info.setdefault('directory_after_commit', []).append((directory_engine, repointed, stale))
+
+
+@event.listens_for(Session, 'after_commit')
+def _finish_directory_update(session):
+    for engine, repointed, stale in session.info.pop('directory_after_commit', ()):
+        with engine.begin() as conn:
+            _upsert_keys(conn, repointed)
+            _delete_keys(conn, stale)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_directory_update(session):
+    session.info.pop('directory_after_commit', None)
+
+
+def rebuild_directory():
+    """Refills TenantKey from every shard (after enabling sharding on an existing database). Returns the key count."""
+    keys = {}
+    for _, rows in cross_shard(lambda shard_session: [
+            (kind, value, team_id)
+            for kind, model, column, team_attr in DIRECTORY_KEYS
+            for value, team_id in shard_session.query(getattr(model, column), getattr(model, team_attr)).filter(
+                getattr(model, column) != None)]):
+        for kind, value, team_id in rows:
+            keys[(kind, value)] = team_id
+    TenantKey.query.delete()
+    rows = [{'kind': kind, 'value': value, 'team_id': team_id} for (kind, value), team_id in keys.items()]
+    for i in range(0, len(rows), MOVE_BATCH_SIZE):
+        db.session.execute(TenantKey.__table__.insert(), rows[i:i + MOVE_BATCH_SIZE])
+    db.session.commit()
+    return len(rows)
+
+
+def forget_team(team_id):
+    """Drops a deleted team's routing row and directory keys. The caller commits."""
+    TeamShard.query.filter_by(team_id=team_id).delete()
+    TenantKey.query.filter_by(team_id=team_id).delete()
+    invalidate_route(team_id)
+
+
+# --- Write freeze while a team moves ---
+def _is_tenant_write(obj, session):
+    return obj.__table__.name not in DIRECTORY_TABLES and (
+        obj not in session.dirty or session.is_modified(obj, include_collections=False))
+
+
+@event.listens_for(Session, 'before_flush')
+def _refuse_frozen_writes(session, flush_context, instances):
+    if has_app_context() and g.get('db_team_frozen') and any(
+            _is_tenant_write(obj, session) for obj in chain(session.new, session.dirty, session.deleted)):
+        raise TeamMovingError()
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _refuse_frozen_bulk_writes(state):
+    if not (state.is_insert or state.is_update or state.is_delete):
+        return
+    table = getattr(state.statement, 'table', None)
+    if has_app_context() and g.get('db_team_frozen') and getattr(table, 'name', None) not in DIRECTORY_TABLES:
+        raise TeamMovingError()
+
+
+# --- Moving a team ---
+def _pk(table):
+    return list(table.primary_key.columns)[0]
+
+
+def _owned_by(table, team_id):
+    return table.c.id == team_id if table.name == 'team' else table.c.team_id == team_id
+
+
+def _team_rows(conn, table, team_id, where=None):
+    """A team's rows of one table, MOVE_BATCH_SIZE at a time in primary key order."""
+    pk, last = _pk(table), None
+    while True:
+        query = select(table).where(_owned_by(table, team_id))
+        if where is not None:
+            query = query.where(where)
+        if last is not None:
+            query = query.where(pk > last)
+        rows = [dict(row) for row in conn.execute(query.order_by(pk).limit(MOVE_BATCH_SIZE)).mappings()]
+        if not rows:
+            return
+        yield rows
+        last = rows[-1][pk.name]
+
+
+def _ids(conn, table, team_id):
+    pk = _pk(table)
+    return {row_id for (row_id,) in conn.execute(select(pk).where(_owned_by(table, team_id)))}
+
+
+def _for_target(conn, table, rows):
+    """Rows as they are written to the target shard on `conn`."""
+    if table.name == 'team':
+        # team.owner_id and user.team_id point at each other; the owner is set once the users exist.
+        return [dict(row, owner_id=None) for row in rows]
+    if table.name in _CHANGE_ORDERED:
+        change_txid = next_change_txid(conn)
+        return [dict(row, change_txid=change_txid) for row in rows]
+    return rows
+
+
+def _upsert(conn, table, rows):
+    pk = _pk(table)
+    rows = _for_target(conn, table, rows)
+    existing = {row_id for (row_id,) in conn.execute(select(pk).where(pk.in_([row[pk.name] for row in rows])))}
+    updates = [{**{name: value for name, value in row.items() if name != pk.name}, '_pk': row[pk.name]}
+               for row in rows if row[pk.name] in existing]
+    inserts = [row for row in rows if row[pk.name] not in existing]
+    if updates:
+        conn.execute(table.update().where(pk == bindparam('_pk')), updates)
+    if inserts:
+        conn.execute(table.insert(), inserts)
+    return len(rows)
+
+
+def _set_owner(src_conn, dst_conn, team_id):
+    team = Team.__table__
+    owner_id = src_conn.execute(select(team.c.owner_id).where(team.c.id == team_id)).scalar()
+    dst_conn.execute(team.update().where(team.c.id == team_id).values(owner_id=owner_id))
+
+
+def _delete_team(engine, tables, team_id):
+    """Deletes a team's rows from one shard, children first. Returns the row count."""
+    deleted = 0
+    with engine.begin() as conn:
+        team = Team.__table__
+        conn.execute(team.update().where(team.c.id == team_id).values(owner_id=None))
+        for table in reversed(tables):
+            deleted += conn.execute(table.delete().where(_owned_by(table, team_id))).rowcount
+    return deleted
+
+
+def _sync(src, dst, tables, team_id, since):
+    """
+    Brings the copy on `dst` up to date with the (frozen) source in one
+    transaction: removes rows deleted since the copy, re-copies rows that may
+    have changed since `since`, then adds the missing ones. Removals and updates
+    come first so a row replacing another (a rebuilt open shift) never collides
+    with the stale one on a unique index. Returns the number of rows written.
+    """
+    written = 0
+    with src.connect() as src_conn, dst.begin() as dst_conn:
+        source_ids = {table.name: _ids(src_conn, table, team_id) for table in tables}
+        for table in reversed(tables):
+            pk = _pk(table)
+            removed = sorted(_ids(dst_conn, table, team_id) - source_ids[table.name])
+            for i in range(0, len(removed), MOVE_BATCH_SIZE):
+                written += dst_conn.execute(table.delete().where(pk.in_(removed[i:i + MOVE_BATCH_SIZE]))).rowcount
+        for table in tables:
+            pk = _pk(table)
+            if table.name in _UPDATED_SINCE:
+                for rows in _team_rows(src_conn, table, team_id, _UPDATED_SINCE[table.name](table, since)):
+                    written += _upsert(dst_conn, table, rows)
+            elif table.name not in _APPEND_ONLY:
+                for rows in _team_rows(src_conn, table, team_id):
+                    written += _upsert(dst_conn, table, rows)
+                continue
+            missing = sorted(source_ids[table.name] - _ids(dst_conn, table, team_id))
+            for i in range(0, len(missing), MOVE_BATCH_SIZE):
+                rows = [dict(row) for row in src_conn.execute(
+                    select(table).where(pk.in_(missing[i:i + MOVE_BATCH_SIZE]))).mappings()]
+                written += _upsert(dst_conn, table, rows)
+        _set_owner(src_conn, dst_conn, team_id)
+    return written
+
+
+def set_team_route(team_id, shard, frozen=False):
+    """Writes a team's routing row (committed straight away on the primary)."""
+    table = TeamShard.__table__
+    with shard_engine(PRIMARY_SHARD).begin() as conn:
+        values = {'shard': shard, 'frozen': frozen, 'updated_at': utcnow()}
+        if not conn.execute(table.update().where(table.c.team_id == team_id).values(**values)).rowcount:
+            conn.execute(table.insert().values(team_id=team_id, **values))
+    invalidate_route(team_id)
+
+
+def check_tenant_tables():
+    """Every table with a team_id must be listed in TENANT_TABLES, or a move would leave its rows behind."""
+    unlisted = {table.name for table in db.metadata.tables.values()
+                if 'team_id' in table.c and table.name not in DIRECTORY_TABLES} - set(TENANT_TABLES)
+    if unlisted:
+        raise ShardMoveError(f"Tables missing from TENANT_TABLES: {', '.join(sorted(unlisted))}")
+
+
+def move_team(team_id, target, settle_seconds=ROUTE_CACHE_SECONDS, log=print):
+    """
+    Moves a team to another shard while it stays in use:
+
+    1. copy every row to the target, in batches, while the team keeps working;
+    2. pause the team's writes (reads carry on), wait until every process has
+       seen the pause, then copy whatever changed during step 1;
+    3. route the team to the target and resume writes;
+    4. delete the old rows from the source.
+
+    Writes are refused (503, Retry-After) only during step 2 and the flip in 3,
+    normally a few seconds. A failure before the flip removes the partial copy
+    and leaves the team where it was. Returns (rows copied, seconds paused).
+    """
+    shards = current_app.config.get('SHARDS', (PRIMARY_SHARD,))
+    if target not in shards:
+        raise ShardMoveError(f"Unknown shard {target!r}; configured: {', '.join(shards)}")
+    check_tenant_tables()
+    source, frozen = _read_route(team_id)
+    db.session.rollback()
+    if frozen:
+        raise ShardMoveError(f"Team {team_id} is already being moved (its writes are paused).")
+    if source == target:
+        raise ShardMoveError(f"Team {team_id} is already on {target}.")
+    src, dst = shard_engine(source), shard_engine(target)
+    tables = [db.metadata.tables[name] for name in TENANT_TABLES]
+    team = Team.__table__
+    with src.connect() as conn:
+        if not conn.execute(select(team.c.id).where(team.c.id == team_id)).first():
+            raise ShardMoveError(f"Team {team_id} was not found on {source}.")
+        # Any write the copy might miss (still uncommitted, or made after it read its table) is stamped from here on.
+        since = change_horizon(conn)
+    with dst.connect() as conn:
+        if conn.execute(select(team.c.id).where(team.c.id == team_id)).first():
+            raise ShardMoveError(f"{target} already has rows for team {team_id}; remove them before moving it there.")
+
+    copied, flipped = 0, False
+    try:
+        with src.connect() as src_conn:
+            for table in tables:
+                # Rows added during the copy are left to the sync: one could replace a row
+                # already copied (a rebuilt open shift) and collide with its stale copy.
+                last_id = src_conn.execute(select(func.max(_pk(table))).where(_owned_by(table, team_id))).scalar()
+                if last_id is None:
+                    continue
+                for rows in _team_rows(src_conn, table, team_id, _pk(table) <= last_id):
+                    with dst.begin() as dst_conn:
+                        dst_conn.execute(table.insert(), _for_target(dst_conn, table, rows))
+                    copied += len(rows)
+        log(f"Copied {copied} rows of team {team_id} from {source} to {target}; pausing writes.")
+
+        paused = time.monotonic()
+        set_team_route(team_id, source, frozen=True)
+        time.sleep(settle_seconds)
+        synced = _sync(src, dst, tables, team_id, since)
+        set_team_route(team_id, target, frozen=True)
+        flipped = True
+        time.sleep(settle_seconds)
+        set_team_route(team_id, target, frozen=False)
+        paused = time.monotonic() - paused
+        log(f"Synced {synced} rows changed during the copy; writes were paused for {paused:.1f}s.")
+    except BaseException as e:
+        if not flipped:
+            _delete_team(dst, tables, team_id)
+            set_team_route(team_id, source, frozen=False)
+        if isinstance(e, IntegrityError):
+            # Usually an id the target already uses for another team (see init_shard).
+            raise ShardMoveError(f"Could not copy team {team_id} to {target}: {e.orig}") from e
+        raise
+
+    # Every process now routes the team to the target, so nothing reads the old rows.
+    removed = _delete_team(src, tables, team_id)
+    log(f"Removed {removed} rows from {source}.")
+    return copied, paused
+
+
+def init_shard(name):
+    """
+    Starts a Postgres shard's id sequences at the bottom of its own range
+    (position in SHARDS x SHARD_ID_SPAN), so ids never collide when teams move
+    between shards. Returns the first id, or None where it does not apply
+    (the primary, or SQLite, where a move reports any collision instead).
+    """
+    engine = shard_engine(name)
+    base = current_app.config['SHARDS'].index(name) * SHARD_ID_SPAN
+    if base == 0 or engine.dialect.name != 'postgresql':
+        return None
+    quote = engine.dialect.identifier_preparer.format_table
+    with engine.begin() as conn:
+        for table_name in TENANT_TABLES:
+            table = db.metadata.tables[table_name]
+            if 'id' not in table.c:
+                continue
+            conn.exec_driver_sql(
+                f"SELECT setval(pg_get_serial_sequence('{quote(table)}', 'id'), "
+                f"GREATEST({base}, (SELECT COALESCE(MAX(id), 0) FROM {quote(table)})))")
+    return base + 1
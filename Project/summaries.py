@@ -0,0 +1,138 @@
+# app/Project/summaries.py
+
+from .extensions import db
+from .models import TimeLog, TeamSetting, UserSummary
+from .timekeeping import load_team_clock_settings, compute_workday, workday_containing, utcnow
+from datetime import date, datetime, timedelta
+import pytz
+
+DEFAULT_PAY_PERIOD_DAYS = 14
+# Pay periods are counted in whole periods from this date (a Monday) unless the team sets its own.
+DEFAULT_PAY_PERIOD_ANCHOR = date(2024, 1, 1)
+# How far back a recompute looks for the current streak.
+MAX_STREAK_LOOKBACK_DAYS = 366
+
+
+def load_pay_period(team_id):
+    """Returns (length_days, anchor_date) from the team's PayPeriodDays/PayPeriodAnchor settings."""
+    rows = TeamSetting.query.filter(
+        TeamSetting.team_id == team_id,
+        TeamSetting.name.in_(['PayPeriodDays', 'PayPeriodAnchor'])
+    ).all()
+    values = {s.name: s.value for s in rows}
+    try:
+        length = int(values.get('PayPeriodDays') or DEFAULT_PAY_PERIOD_DAYS)
+    except ValueError:
+        length = DEFAULT_PAY_PERIOD_DAYS
+    try:
+        anchor = datetime.strptime(values['PayPeriodAnchor'], "%Y-%m-%d").date()
+    except (KeyError, ValueError):
+        anchor = DEFAULT_PAY_PERIOD_ANCHOR
+    return length, anchor
+
+
+def week_start(day):
+    return day - timedelta(days=day.weekday())
+
+
+def period_start(day, length, anchor):
+    return anchor + timedelta(days=((day - anchor).days // length) * length)
+
+
+def _shift_seconds(shift):
+    return int((shift.clock_out_at - shift.clock_in_at).total_seconds())
+
+
+def recompute_summary(user_id, team_id, today):
+    """Rebuilds a user's summary from their shifts. `today` is the team's current work day (a date)."""
+    tz, rollover = load_team_clock_settings(team_id)
+    length, anchor = load_pay_period(team_id)
+    summary = db.session.get(UserSummary, user_id) or UserSummary(user_id=user_id, team_id=team_id)
+    summary.week_start = week_start(today)
+    summary.period_start = period_start(today, length, anchor)
+
+    def work_day(at):
+        return workday_containing(tz, rollover, pytz.utc.localize(at).astimezone(tz)).day
+
+    since = compute_workday(tz, rollover, min(summary.week_start, summary.period_start)).start_utc
+    shifts = TimeLog.query.filter(
+        TimeLog.user_id == user_id, TimeLog.clock_out_at != None, TimeLog.clock_in_at >= since
+    ).all()
+    summary.week_seconds = summary.period_seconds = 0
+    for shift in shifts:
+        day = work_day(shift.clock_in_at)
+        if day >= summary.week_start:
+            summary.week_seconds += _shift_seconds(shift)
+        if day >= summary.period_start:
+            summary.period_seconds += _shift_seconds(shift)
+
+    # Current streak: consecutive work days with a completed shift, ending at the latest one.
+    lookback = compute_workday(tz, rollover, today - timedelta(days=MAX_STREAK_LOOKBACK_DAYS)).start_utc
+    worked = {work_day(at) for (at,) in db.session.query(TimeLog.clock_in_at).filter(
+        TimeLog.user_id == user_id, TimeLog.clock_out_at != None, TimeLog.clock_in_at >= lookback)}
+    summary.last_work_day = max(worked) if worked else None
+    summary.streak_days = 0
+    day = summary.last_work_day
+    while day in worked:
+        summary.streak_days += 1
+        day -= timedelta(days=1)
+
+    summary.updated_at = utcnow()
+    db.session.add(summary)
+    return summary
+
+
+def record_clock_out(shift, day):
+    """
+    Folds a just-closed shift (on work day `day`) into the user's cached summary.
+    Anything the increment cannot express safely drops the cache, and the next
+    read recomputes it.
+    """
+    summary = db.session.get(UserSummary, shift.user_id)
+    if summary is None:
+        return
+    if day < min(summary.week_start, summary.period_start) or (
+            summary.last_work_day and day < summary.last_work_day):
+        # A late edit to an earlier day may change totals or fill a streak gap.
+        db.session.delete(summary)
+        return
+    seconds = _shift_seconds(shift)
+    if day >= summary.week_start:
+        summary.week_seconds += seconds
+    if day >= summary.period_start:
+        summary.period_seconds += seconds
+    if summary.last_work_day is None or day > summary.last_work_day + timedelta(days=1):
+        summary.streak_days = 1
+    elif day == summary.last_work_day + timedelta(days=1):
+        summary.streak_days += 1
+    summary.last_work_day = day
+    summary.updated_at = utcnow()
+
+
+def invalidate_summaries(user_id=None, team_id=None):
+    """Drops cached summaries (one user's, or a whole team's after a settings change)."""
+    query = UserSummary.query.filter_by(user_id=user_id) if user_id is not None else UserSummary.query.filter_by(team_id=team_id)
+    query.delete(synchronize_session='fetch')
+
+
+def get_user_summary(user, workday):
+    """
+    Returns the user's summary for the dashboard, recomputing it only when it is
+    missing or the week/pay period has rolled over since it was cached.
+    """
+    summary = db.session.get(UserSummary, user.id)
+    today = workday.day
+    if summary is not None and summary.week_start == week_start(today):
+        length, anchor = load_pay_period(user.team_id)
+        if summary.period_start == period_start(today, length, anchor):
+            return summary
+    summary = recompute_summary(user.id, user.team_id, today)
+    db.session.commit()
+    return summary
+
+
+def current_streak(summary, today):
+    """The streak only counts if the user worked today or yesterday."""
+    if summary.last_work_day and summary.last_work_day >= today - timedelta(days=1):
+        return summary.streak_days
+    return 0
@@ -1,6 +1,9 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, g
+from flask import Blueprint, render_template, redirect, url_for, flash, g, request
 from .extensions import db
-from .models import Team, User, TeamSetting
+from .models import Team, TenantStats
+from .database import workload
+from .sharding import forget_team, route_to_team, sharding_enabled
+from .tenantstats import tenant_overview, tenant_totals, refresh_tenant_stats
 from functools import wraps
 
 # A new, separate blueprint for Super Admin functions
@@ -20,34 +23,44 @@ def super_admin_required(f):
 # --- Super Admin Routes ---
 @super_admin_bp.route("/")
 @super_admin_required
+@workload('reporting')
 def dashboard():
-    """Displays the main Super Admin dashboard with all teams and stats."""
-    all_teams = Team.query.order_by(Team.name).all()
-    
-    # Prepare data with stats for the template
-    teams_data = []
-    for team in all_teams:
-        admin = User.query.filter_by(team_id=team.id, role='Admin').first()
-        user_count = User.query.filter_by(team_id=team.id).count()
-        settings = {s.name: s.value for s in team.settings}
-        teams_data.append({
-            'team': team,
-            'admin': admin,
-            'user_count': user_count,
-            'settings': settings
-        })
+    """
+    Tenant overview with search, filters, sorting and pages. Reads only the
+    precomputed TenantStats table (see tenantstats.py), never the tenants.
+    """
+    search = request.args.get('q', '')
+    plan = request.args.get('plan', '')
+    activity = request.args.get('activity', '')
+    sort_by = request.args.get('sort_by', 'name')
+    sort_order = request.args.get('sort_order', 'asc')
+    page = request.args.get('page', 1, type=int)
 
+    tenants = tenant_overview(search, plan, activity, sort_by, sort_order, page)
+    total_teams, total_users, active_today, refreshed_at = tenant_totals()
     stats = {
-        'total_teams': len(all_teams),
-        'total_users': User.query.count()
+        'total_teams': total_teams,
+        'total_users': total_users,
+        'active_today': active_today,
+        'refreshed_at': refreshed_at,
     }
 
-    return render_template("super_admin/dashboard.html", teams_data=teams_data, stats=stats)
+    return render_template("super_admin/dashboard.html", tenants=tenants, stats=stats, sharded=sharding_enabled(),
+                           search=search, plan=plan, activity=activity, sort_by=sort_by, sort_order=sort_order)
+
+@super_admin_bp.route("/stats/refresh", methods=["POST"])
+@super_admin_required
+def refresh_stats():
+    """Rebuilds the tenant overview now instead of waiting for the scheduler."""
+    count = refresh_tenant_stats()
+    flash(f"Tenant stats refreshed for {count} teams.", "success")
+    return redirect(url_for('super_admin.dashboard'))
 
 @super_admin_bp.route("/teams/delete/<int:team_id>", methods=["POST"])
 @super_admin_required
 def delete_team(team_id):
     """Allows the Super Admin to delete an entire team and all its data."""
+    route_to_team(team_id)
     team_to_delete = Team.query.get_or_404(team_id)
     
     # --- THIS IS THE FIX ---
@@ -59,6 +72,8 @@ def delete_team(team_id):
 
     # Now that the circle is broken, the cascade delete can work safely.
     db.session.delete(team_to_delete)
+    forget_team(team_id)
+    TenantStats.query.filter_by(team_id=team_id).delete()
     db.session.commit()
     
     flash(f"Team '{team_to_delete.name}' and all its data have been permanently deleted.", "success")
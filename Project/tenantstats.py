@@ -0,0 +1,133 @@
+# app/Project/tenantstats.py
+
+from .extensions import db
+from .models import PunchEvent, Team, TeamSetting, TenantStats, User
+from .sharding import cross_shard
+from .timekeeping import workday_containing, parse_rollover, utcnow, DEFAULT_TIMEZONE
+from collections import defaultdict
+from sqlalchemy import func, or_
+import pytz
+
+TENANT_STATS_PAGE_SIZE = 50
+# Teams per IN (...) list, and rows per INSERT, when refreshing.
+TENANT_STATS_CHUNK = 500
+
+TENANT_STATS_SORT_COLUMNS = {
+    'name': TenantStats.name,
+    'members': TenantStats.members,
+    'active_today': TenantStats.active_today,
+    'last_punch': TenantStats.last_punch_at,
+    'plan': TenantStats.plan,
+    'expires': TenantStats.pro_access_expires_at,
+}
+TENANT_ACTIVITY_FILTERS = {
+    'active': TenantStats.active_today > 0,
+    'idle': TenantStats.active_today == 0,
+    'never': TenantStats.last_punch_at == None,
+    'cancelling': TenantStats.pro_access_expires_at != None,
+}
+
+
+# --- Refresh ---
+def _today_starts(shard_session, team_ids, now_utc):
+    """{team_id: UTC start of the team's current work day}, from one settings query."""
+    settings = defaultdict(dict)
+    for team_id, name, value in shard_session.query(TeamSetting.team_id, TeamSetting.name, TeamSetting.value).filter(
+            TeamSetting.name.in_(('Timezone', 'DayRolloverTime'))):
+        settings[team_id][name] = value
+    starts, windows = {}, {}
+    for team_id in team_ids:
+        key = (settings[team_id].get('Timezone') or DEFAULT_TIMEZONE, settings[team_id].get('DayRolloverTime'))
+        if key not in windows:
+            try:
+                tz = pytz.timezone(key[0])
+            except pytz.UnknownTimeZoneError:
+                tz = pytz.timezone(DEFAULT_TIMEZONE)
+            windows[key] = workday_containing(tz, parse_rollover(key[1]),
+                                              pytz.utc.localize(now_utc).astimezone(tz)).start_utc
+        starts[team_id] = windows[key]
+    return starts
+
+
+def shard_tenant_stats(shard_session, now_utc):
+    """
+    One stats row per team on a shard, from a handful of grouped queries (plus one
+    per distinct work-day start for activity) however many teams there are.
+    """
+    teams = shard_session.query(Team.id, Team.name, Team.plan, Team.pro_access_expires_at, Team.owner_id).all()
+    members = dict(shard_session.query(User.team_id, func.count(User.id)).group_by(User.team_id).all())
+    last_punch = dict(shard_session.query(PunchEvent.team_id, func.max(PunchEvent.occurred_at)).group_by(
+        PunchEvent.team_id).all())
+
+    # The owner when there is one, otherwise the team's first admin.
+    admins = defaultdict(dict)
+    for team_id, user_id, name, email in shard_session.query(User.team_id, User.id, User.name, User.email).filter(
+            User.role == 'Admin').order_by(User.id):
+        admins[team_id][user_id] = (name, email)
+
+    by_start = defaultdict(list)
+    for team_id, start in _today_starts(shard_session, [team.id for team in teams], now_utc).items():
+        by_start[start].append(team_id)
+    active = {}
+    for start, team_ids in by_start.items():
+        for i in range(0, len(team_ids), TENANT_STATS_CHUNK):
+            active.update(shard_session.query(PunchEvent.team_id, func.count(func.distinct(PunchEvent.user_id))).filter(
+                PunchEvent.team_id.in_(team_ids[i:i + TENANT_STATS_CHUNK]),
+                PunchEvent.occurred_at >= start,
+                PunchEvent.voided == False
+            ).group_by(PunchEvent.team_id).all())
+
+    rows = []
+    for team in teams:
+        team_admins = admins.get(team.id, {})
+        admin_name, admin_email = team_admins.get(team.owner_id) or next(iter(team_admins.values()), (None, None))
+        rows.append({
+            'team_id': team.id, 'name': team.name, 'admin_name': admin_name, 'admin_email': admin_email,
+            'members': members.get(team.id, 0), 'active_today': active.get(team.id, 0),
+            'last_punch_at': last_punch.get(team.id), 'plan': team.plan,
+            'pro_access_expires_at': team.pro_access_expires_at,
+        })
+    return rows
+
+
+def refresh_tenant_stats(now_utc=None):
+    """
+    Rebuilds TenantStats from every shard and swaps it in with one transaction,
+    so readers see either the old or the new overview. Meant for a scheduler
+    (every few minutes) or the super admin's Refresh button. Returns the team count.
+    """
+    now_utc = now_utc or utcnow()
+    rows = []
+    for shard, shard_rows in cross_shard(lambda shard_session: shard_tenant_stats(shard_session, now_utc)):
+        rows.extend(dict(row, shard=shard, refreshed_at=now_utc) for row in shard_rows)
+    TenantStats.query.delete()
+    for i in range(0, len(rows), TENANT_STATS_CHUNK):
+        db.session.execute(TenantStats.__table__.insert(), rows[i:i + TENANT_STATS_CHUNK])
+    db.session.commit()
+    return len(rows)
+
+
+# --- Reading ---
+def tenant_overview(search='', plan='', activity='', sort_by='name', sort_order='asc', page=1):
+    """One page of TenantStats, searched by team, admin name or admin email."""
+    query = TenantStats.query
+    if search:
+        term = search.strip().lower()
+        query = query.filter(or_(func.lower(TenantStats.name).contains(term, autoescape=True),
+                                 func.lower(TenantStats.admin_name).contains(term, autoescape=True),
+                                 func.lower(TenantStats.admin_email).contains(term, autoescape=True)))
+    if plan:
+        query = query.filter(TenantStats.plan == plan)
+    if activity in TENANT_ACTIVITY_FILTERS:
+        query = query.filter(TENANT_ACTIVITY_FILTERS[activity])
+    sort_column = TENANT_STATS_SORT_COLUMNS.get(sort_by, TenantStats.name)
+    order = sort_column.desc() if sort_order == 'desc' else sort_column.asc()
+    return query.order_by(order, TenantStats.team_id).paginate(page=page, per_page=TENANT_STATS_PAGE_SIZE,
+                                                                error_out=False)
+
+
+def tenant_totals():
+    """(teams, members, active today, refreshed_at) over every tenant, from the precomputed table."""
+    return db.session.query(func.count(TenantStats.team_id), func.coalesce(func.sum(TenantStats.members), 0),
+                            func.coalesce(func.sum(TenantStats.active_today), 0),
+                            func.max(TenantStats.refreshed_at)).one()
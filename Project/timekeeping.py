@@ -0,0 +1,106 @@
+# app/Project/timekeeping.py
+
+from .models import TeamSetting
+from collections import namedtuple
+from datetime import datetime, time, timedelta
+from sqlalchemy import and_
+import threading
+import pytz
+
+DEFAULT_TIMEZONE = "America/Chicago"
+DEFAULT_DAY_ROLLOVER = "00:00"
+
+# How long a team's computed work-day window is reused before it is recomputed.
+WORKDAY_CACHE_SECONDS = 60
+
+# A team's "work day": the human label stored on TimeLog.date plus the
+# [start_utc, end_utc) window used to query the indexed timestamp columns.
+WorkDay = namedtuple('WorkDay', ['label', 'day', 'start_utc', 'end_utc', 'tz'])
+
+_workday_cache = {}
+_workday_lock = threading.Lock()
+
+# --- Helper Functions ---
+def get_day_with_suffix(d):
+    return f"{d}{'th' if 11<=d<=13 else {1:'st',2:'nd',3:'rd'}.get(d%10, 'th')}"
+
+def format_log_date(d):
+    """Formats a date the way TimeLog.date has always been stored, e.g. 'Oct. 18th, 2026'."""
+    return d.strftime(f"%b. {get_day_with_suffix(d.day)}, %Y")
+
+def format_log_time(dt):
+    """Formats a local datetime the way TimeLog.clock_in/clock_out are stored."""
+    return dt.strftime("%I:%M:%S %p")
+
+def utcnow():
+    """Naive UTC 'now', matching how the timestamp columns are stored."""
+    return datetime.now(pytz.utc).replace(tzinfo=None)
+
+def to_utc(local_dt):
+    return local_dt.astimezone(pytz.utc).replace(tzinfo=None)
+
+def parse_rollover(value):
+    """Parses an 'HH:MM' rollover setting, falling back to midnight."""
+    try:
+        return datetime.strptime(value or DEFAULT_DAY_ROLLOVER, "%H:%M").time()
+    except ValueError:
+        return time(0, 0)
+
+def load_team_clock_settings(team_id):
+    """Returns (tz, rollover_time) for a team from its TeamSetting rows."""
+    rows = TeamSetting.query.filter(
+        TeamSetting.team_id == team_id,
+        TeamSetting.name.in_(['Timezone', 'DayRolloverTime'])
+    ).all()
+    values = {s.name: s.value for s in rows}
+    try:
+        tz = pytz.timezone(values.get('Timezone') or DEFAULT_TIMEZONE)
+    except pytz.UnknownTimeZoneError:
+        tz = pytz.timezone(DEFAULT_TIMEZONE)
+    return tz, parse_rollover(values.get('DayRolloverTime'))
+
+def compute_workday(tz, rollover, day):
+    """Builds the WorkDay for a given local calendar day."""
+    start_local = tz.localize(datetime.combine(day, rollover))
+    end_local = tz.localize(datetime.combine(day + timedelta(days=1), rollover))
+    return WorkDay(format_log_date(day), day, to_utc(start_local), to_utc(end_local), tz)
+
+def workday_containing(tz, rollover, local_dt):
+    """Returns the WorkDay a local moment belongs to, honouring the rollover time."""
+    day = local_dt.date()
+    if local_dt.time() < rollover:
+        day -= timedelta(days=1)
+    return compute_workday(tz, rollover, day)
+
+def get_team_workday(team_id):
+    """
+    Returns the team's current WorkDay. The settings lookup and boundary math
+    run at most once per team per minute; every other call is a dict lookup.
+    """
+    minute = int(datetime.now(pytz.utc).timestamp() // WORKDAY_CACHE_SECONDS)
+    cached = _workday_cache.get(team_id)
+    if cached and cached[0] == minute:
+        return cached[1]
+
+    tz, rollover = load_team_clock_settings(team_id)
+    workday = workday_containing(tz, rollover, datetime.now(tz))
+    with _workday_lock:
+        _workday_cache[team_id] = (minute, workday)
+    return workday
+
+def get_team_workday_for_date(team_id, day):
+    """Returns the WorkDay for a specific calendar date (used by date filters)."""
+    tz, rollover = load_team_clock_settings(team_id)
+    return compute_workday(tz, rollover, day)
+
+def invalidate_team_workday(team_id):
+    with _workday_lock:
+        _workday_cache.pop(team_id, None)
+
+def team_now(team_id):
+    """Returns the current time localized to the team's timezone."""
+    return datetime.now(get_team_workday(team_id).tz)
+
+def workday_filter(column, workday):
+    """SQL filter selecting rows whose UTC timestamp falls inside a work day."""
+    return and_(column >= workday.start_utc, column < workday.end_utc)
@@ -0,0 +1,342 @@
+# app/Project/webhooks.py
+
+from flask import current_app
+from .extensions import db
+from .models import WebhookEndpoint, WebhookDelivery
+from .timekeeping import utcnow
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+import functools
+import hashlib
+import hmac
+import http.client
+import ipaddress
+import json
+import random
+import secrets
+import socket
+import ssl
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+WEBHOOK_BATCH_SIZE = 100
+WEBHOOK_MAX_ENDPOINTS = 5
+WEBHOOK_TIMEOUT_SECONDS = 10
+# With the backoff below (10s doubling, capped at an hour) this is about a day of retries.
+WEBHOOK_MAX_ATTEMPTS = 30
+BACKOFF_BASE_SECONDS = 10
+BACKOFF_MAX_SECONDS = 3600
+# A claimed batch is retried by another dispatcher if its result is not recorded within this.
+CLAIM_LEASE = timedelta(seconds=WEBHOOK_TIMEOUT_SECONDS * 6)
+ENDPOINT_CACHE_SECONDS = 30
+SIGNATURE_HEADER = 'X-QrCheckin-Signature'
+TIMESTAMP_HEADER = 'X-QrCheckin-Timestamp'
+
+_endpoint_cache = {}
+_endpoint_lock = threading.Lock()
+
+
+# --- Signing ---
+def generate_webhook_secret():
+    return f"whsec_{secrets.token_urlsafe(32)}"
+
+
+def sign_payload(secret, timestamp, body):
+    """HMAC-SHA256 over '<timestamp>.<body>', hex encoded. Receivers recompute it with the shared secret."""
+    return hmac.new(secret.encode('utf-8'), f"{timestamp}.".encode('utf-8') + body, hashlib.sha256).hexdigest()
+
+
+def verify_signature(secret, timestamp, body, signature, tolerance_seconds=300):
+    """What a receiver does: checks the signature and rejects stale timestamps (replays)."""
+    try:
+        if abs(time.time() - int(timestamp)) > tolerance_seconds:
+            return False
+    except (TypeError, ValueError):
+        return False
+    expected = 'sha256=' + sign_payload(secret, timestamp, body)
+    return hmac.compare_digest(expected, signature or '')
+
+
+# --- Enqueueing (inside the request's transaction) ---
+def active_endpoint_ids(team_id):
+    """The team's active endpoint ids, cached per process so teams without webhooks cost no query."""
+    now = time.monotonic()
+    cached = _endpoint_cache.get(team_id)
+    if cached and cached[0] > now:
+        return cached[1]
+    ids = [endpoint_id for (endpoint_id,) in db.session.query(WebhookEndpoint.id).filter(
+        WebhookEndpoint.team_id == team_id, WebhookEndpoint.active == True)]
+    with _endpoint_lock:
+        _endpoint_cache[team_id] = (now + ENDPOINT_CACHE_SECONDS, ids)
+    return ids
+
+
+def invalidate_endpoint_cache(team_id):
+    with _endpoint_lock:
+        _endpoint_cache.pop(team_id, None)
+
+
+def enqueue_webhook(team_id, event_type, data):
+    """
+    Adds an event to the outbox of each of the team's endpoints. The caller
+    commits, so the event is sent if and only if the change it describes is.
+    Nothing is sent from the request; see dispatch_once().
+    """
+    endpoint_ids = active_endpoint_ids(team_id)
+    if not endpoint_ids:
+        return
+    now = utcnow()
+    event_id = str(uuid.uuid4())
+    payload = json.dumps({'id': event_id, 'type': event_type, 'created_at': now.isoformat() + 'Z', 'data': data})
+    for endpoint_id in endpoint_ids:
+        db.session.add(WebhookDelivery(endpoint_id=endpoint_id, team_id=team_id, event_id=event_id,
+                                       event_type=event_type, payload=payload, created_at=now, next_attempt_at=now))
+
+
+def _iso(at):
+    return at.isoformat() + 'Z' if at else None
+
+
+def punch_data(user, event):
+    return {'punch_id': event.id, 'user_id': user.id, 'name': user.name, 'kind': event.kind,
+            'occurred_at': _iso(event.occurred_at), 'source': event.source}
+
+
+def time_log_data(log):
+    return {'time_log_id': log.id, 'user_id': log.user_id, 'name': log.user.name,
+            'clock_in_at': _iso(log.clock_in_at), 'clock_out_at': _iso(log.clock_out_at)}
+
+
+# --- Delivery (never inside a request) ---
+def backoff_seconds(failures):
+    """Exponential backoff with jitter, so endpoints that fail together do not retry together."""
+    return min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (failures - 1)) * random.uniform(0.8, 1.2)
+
+
+def _resolve(host, allow_private):
+    """
+    The address to connect to for `host`, or None when it does not resolve or,
+    unless allow_private, any of its addresses is not public.
+    """
+    try:
+        addresses = [info[4][0].split('%')[0] for info in socket.getaddrinfo(host, None)]
+    except (socket.gaierror, UnicodeError):
+        return None
+    if not addresses:
+        return None
+    if not allow_private and not all(ipaddress.ip_address(address).is_global for address in addresses):
+        return None
+    return addresses[0]
+
+
+class _PinnedConnectionMixin:
+    """Connects to the address checked by _resolve instead of resolving the host again (DNS rebinding)."""
+
+    def __init__(self, *args, address, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = lambda target, *a, **kw: socket.create_connection((address, target[1]), *a, **kw)
+
+
+class _PinnedHTTPConnection(_PinnedConnectionMixin, http.client.HTTPConnection):
+    pass
+
+
+class _PinnedHTTPSConnection(_PinnedConnectionMixin, http.client.HTTPSConnection):
+    # The certificate is still checked against the host name (server_hostname=self.host).
+    pass
+
+
+class _PinnedHTTPHandler(urllib.request.HTTPHandler):
+    def __init__(self, address):
+        super().__init__()
+        self.address = address
+
+    def http_open(self, req):
+        return self.do_open(functools.partial(_PinnedHTTPConnection, address=self.address), req)
+
+
+class _PinnedHTTPSHandler(urllib.request.HTTPSHandler):
+    def __init__(self, address):
+        super().__init__(context=ssl.create_default_context())
+        self.address = address
+
+    def https_open(self, req):
+        return self.do_open(functools.partial(_PinnedHTTPSConnection, address=self.address), req,
+                            context=self._context)
+
+
+class _NoRedirectHandler(urllib.request.HTTPRedirectHandler):
+    # A redirect could point anywhere, including our own network; 3xx is reported as a failure.
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+def _pinned_opener(address):
+    return urllib.request.build_opener(urllib.request.ProxyHandler({}), _NoRedirectHandler(),
+                                       _PinnedHTTPHandler(address), _PinnedHTTPSHandler(address))
+
+
+def post_batch(url, secret, body, allow_private=False):
+    """POSTs one signed batch. Returns None on a 2xx response, otherwise an error message."""
+    host = urlsplit(url).hostname
+    address = _resolve(host, allow_private) if host else None
+    if address is None:
+        # Customer URLs must not reach our own network (metadata services, databases, ...).
+        return f"{host} does not resolve to a public address"
+    timestamp = str(int(time.time()))
+    request = urllib.request.Request(url, data=body, method='POST', headers={
+        'Content-Type': 'application/json',
+        'User-Agent': 'QrCheckin-Webhooks/1',
+        TIMESTAMP_HEADER: timestamp,
+        SIGNATURE_HEADER: 'sha256=' + sign_payload(secret, timestamp, body),
+    })
+    try:
+        with _pinned_opener(address).open(request, timeout=WEBHOOK_TIMEOUT_SECONDS) as response:
+            response.read(1024)
+        return None
+    except urllib.error.HTTPError as e:
+        return f"HTTP {e.code}"
+    except (urllib.error.URLError, OSError, ValueError) as e:
+        return str(getattr(e, 'reason', e))[:300]
+
+
+def claim_batches(now, max_endpoints):
+    """
+    Leases up to WEBHOOK_BATCH_SIZE due deliveries for each of up to
+    `max_endpoints` endpoints and commits. Skip-locked claims let several
+    dispatchers run at once on Postgres; a crashed dispatcher's lease expires.
+    """
+    endpoints = WebhookEndpoint.query.filter(
+        WebhookEndpoint.active == True,
+        db.or_(WebhookEndpoint.retry_after == None, WebhookEndpoint.retry_after <= now),
+        WebhookEndpoint.id.in_(db.session.query(WebhookDelivery.endpoint_id).filter(
+            WebhookDelivery.dead == False, WebhookDelivery.next_attempt_at <= now))
+    ).limit(max_endpoints).all()
+
+    batches = []
+    for endpoint in endpoints:
+        rows = WebhookDelivery.query.filter(
+            WebhookDelivery.endpoint_id == endpoint.id,
+            WebhookDelivery.dead == False,
+            WebhookDelivery.next_attempt_at <= now
+        ).order_by(WebhookDelivery.id).limit(WEBHOOK_BATCH_SIZE).with_for_update(skip_locked=True).all()
+        if not rows:
+            continue
+        for row in rows:
+            row.next_attempt_at = now + CLAIM_LEASE
+        body = ('{"events": [' + ', '.join(row.payload for row in rows) + ']}').encode('utf-8')
+        batches.append((endpoint.id, endpoint.url, endpoint.secret, [row.id for row in rows], body))
+    db.session.commit()
+    return batches
+
+
+def record_result(endpoint_id, delivery_ids, error, now):
+    endpoint = db.session.get(WebhookEndpoint, endpoint_id)
+    if endpoint is None:
+        return
+    if error is None:
+        WebhookDelivery.query.filter(WebhookDelivery.id.in_(delivery_ids)).delete(synchronize_session=False)
+        endpoint.consecutive_failures = 0
+        endpoint.retry_after = None
+        endpoint.last_success_at = now
+        endpoint.last_error = None
+        return
+    endpoint.consecutive_failures += 1
+    endpoint.retry_after = now + timedelta(seconds=backoff_seconds(endpoint.consecutive_failures))
+    endpoint.last_error = error[:300]
+    WebhookDelivery.query.filter(WebhookDelivery.id.in_(delivery_ids)).update({
+        'attempts': WebhookDelivery.attempts + 1,
+        'next_attempt_at': endpoint.retry_after,
+    }, synchronize_session=False)
+    WebhookDelivery.query.filter(WebhookDelivery.id.in_(delivery_ids),
+                                 WebhookDelivery.attempts >= WEBHOOK_MAX_ATTEMPTS).update(
+        {'dead': True}, synchronize_session=False)
+
+
+def dispatch_once(pool, max_endpoints=50):
+    """
+    One dispatcher pass: claim batches, POST them concurrently (HTTP only in the
+    pool threads, database work stays on this one), record the results. Returns
+    (batches, events delivered, events failed).
+    """
+    allow_private = current_app.config.get('WEBHOOK_ALLOW_PRIVATE_URLS', False)
+    batches = claim_batches(utcnow(), max_endpoints)
+    if not batches:
+        return 0, 0, 0
+    futures = [(batch, pool.submit(post_batch, batch[1], batch[2], batch[4], allow_private)) for batch in batches]
+    delivered = failed = 0
+    for (endpoint_id, _, _, delivery_ids, _), future in futures:
+        error = future.result()
+        record_result(endpoint_id, delivery_ids, error, utcnow())
+        if error is None:
+            delivered += len(delivery_ids)
+        else:
+            failed += len(delivery_ids)
+    db.session.commit()
+    return len(batches), delivered, failed
+
+
+def run_dispatcher(concurrency=8, idle_sleep=1.0, once=False):
+    """Delivers webhooks until stopped (or, with once=True, until the outbox has nothing due)."""
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='webhooks') as pool:
+        while True:
+            batches, delivered, failed = dispatch_once(pool, max_endpoints=concurrency * 4)
+            if batches:
+                print(f"Sent {batches} batches: {delivered} events delivered, {failed} to retry.", flush=True)
+            elif once:
+                return
+            else:
+                time.sleep(idle_sleep)
+
+
+# --- Local stand-in receiver (tests and benchmarks) ---
+class StandInReceiver:
+    """
+    A local HTTP endpoint that checks signatures and records what it receives.
+    `fail_first` makes the first N requests return 503, to exercise retries.
+    """
+
+    def __init__(self, secret, fail_first=0):
+        self.secret = secret
+        self.fail_first = fail_first
+        self.requests = 0
+        self.events = []
+        self.bad_signatures = 0
+        self._lock = threading.Lock()
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                with receiver._lock:
+                    receiver.requests += 1
+                    failing = receiver.requests <= receiver.fail_first
+                    valid = verify_signature(receiver.secret, self.headers.get(TIMESTAMP_HEADER), body,
+                                             self.headers.get(SIGNATURE_HEADER))
+                    if not valid:
+                        receiver.bad_signatures += 1
+                    elif not failing:
+                        receiver.events.extend(json.loads(body)['events'])
+                self.send_response(503 if failing else 200 if valid else 401)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/webhook"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
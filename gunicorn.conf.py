@@ -0,0 +1,28 @@
+# gunicorn.conf.py
+#
+# Load the app once in the master and fork workers from it, so autoscaled
+# instances start answering the morning rush as quickly as possible.
+
+import os
+
+preload_app = True
+
+# Threaded workers: while one request waits on bcrypt (which passwords.py runs
+# in its own pool, outside the GIL) or on the database, the worker's other
+# threads keep answering kiosk scans. A sync worker would sit idle instead.
+# The app's in-process caches are guarded by locks, and the default database
+# pool (DB_POOL_SIZE 5) covers every thread.
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+
+def post_fork(server, worker):
+    # Connection pools must never be shared across processes. create_app does not
+    # connect to the database, but anything opened in the master is dropped here
+    # (without closing the parent's sockets) so each worker starts a fresh pool.
+    from app import app
+    from Project.extensions import db
+
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
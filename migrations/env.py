@@ -90,13 +90,26 @@ def run_migrations_online():
                 directives[:] = []
                 logger.info('No changes in schema detected.')
 
+    # online_migration_progress is bookkeeping for Project/online_migrations.py,
+    # not a model; autogenerate must not offer to drop it.
+    def include_object(object, name, type_, reflected, compare_to):
+        return not (type_ == 'table' and name == 'online_migration_progress')
+
     conf_args = current_app.extensions['migrate'].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
+    conf_args.setdefault("include_object", include_object)
+    # Commit after each revision, so a long online backfill in one revision
+    # does not keep the locks taken by the revisions before it.
+    conf_args.setdefault("transaction_per_migration", True)
 
     connectable = get_engine()
 
-    with connectable.connect() as connection:
+    # The app's statement timeout is meant for requests; a backfill or index build
+    # over a large table must be allowed to run as long as it needs.
+    from Project.database import without_statement_timeout
+
+    with connectable.connect() as connection, without_statement_timeout(connection):
         context.configure(
             connection=connection,
             target_metadata=get_metadata(),
@@ -0,0 +1,105 @@
+"""Initial schema (tables that used to come from db.create_all)
+
+Revision ID: c0_initial_schema
+Revises: 
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'c0_initial_schema'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases created before migrations owned the schema already have these
+    # tables (from db.create_all), so only the missing ones are created.
+    bind = op.get_bind()
+    existing = set(sa.inspect(bind).get_table_names())
+    is_sqlite = bind.dialect.name == 'sqlite'
+
+    if 'team' not in existing:
+        team_columns = [
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('name', sa.String(length=100), nullable=False),
+            sa.Column('join_token', sa.String(length=36), nullable=False, unique=True),
+            sa.Column('plan', sa.String(length=50), nullable=False),
+            sa.Column('stripe_customer_id', sa.String(length=100), nullable=True, unique=True),
+            sa.Column('pro_access_expires_at', sa.DateTime(), nullable=True),
+            sa.Column('owner_id', sa.Integer(), nullable=True),
+        ]
+        if is_sqlite:
+            # SQLite resolves foreign keys lazily, so the team <-> user cycle can be declared inline.
+            team_columns.append(sa.ForeignKeyConstraint(['owner_id'], ['user.id']))
+        op.create_table('team', *team_columns)
+
+    if 'user' not in existing:
+        op.create_table(
+            'user',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('name', sa.String(length=100), nullable=False),
+            sa.Column('email', sa.String(length=120), nullable=True, unique=True),
+            sa.Column('password', sa.String(length=60), nullable=True),
+            sa.Column('role', sa.String(length=20), nullable=False),
+            sa.Column('team_id', sa.Integer(), sa.ForeignKey('team.id'), nullable=False),
+            sa.Column('device_token', sa.String(length=36), nullable=True, unique=True),
+            sa.Column('show_upgrade_success', sa.Boolean(), nullable=True),
+        )
+        if 'team' not in existing and not is_sqlite:
+            op.create_foreign_key('team_owner_id_fkey', 'team', 'user', ['owner_id'], ['id'])
+
+    if 'team_setting' not in existing:
+        op.create_table(
+            'team_setting',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('team_id', sa.Integer(), sa.ForeignKey('team.id'), nullable=False),
+            sa.Column('name', sa.String(length=50), nullable=False),
+            sa.Column('value', sa.String(length=50), nullable=False),
+        )
+
+    if 'time_log' not in existing:
+        op.create_table(
+            'time_log',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('user.id', ondelete='CASCADE'), nullable=False),
+            sa.Column('team_id', sa.Integer(), sa.ForeignKey('team.id', ondelete='CASCADE'), nullable=False),
+            sa.Column('date', sa.String(length=50), nullable=False),
+            sa.Column('clock_in', sa.String(length=50), nullable=False),
+            sa.Column('clock_out', sa.String(length=50), nullable=True),
+        )
+
+    if 'audit_log' not in existing:
+        op.create_table(
+            'audit_log',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('team_id', sa.Integer(), sa.ForeignKey('team.id', ondelete='CASCADE'), nullable=False),
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('user.id', ondelete='CASCADE'), nullable=False),
+            sa.Column('event_type', sa.String(length=100), nullable=False),
+            sa.Column('details', sa.String(length=255), nullable=True),
+            sa.Column('timestamp', sa.DateTime(), nullable=False),
+        )
+
+    if 'sessions' not in existing:
+        # Flask-Session's server-side session table (SESSION_TYPE = 'sqlalchemy').
+        op.create_table(
+            'sessions',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('session_id', sa.String(length=255), unique=True),
+            sa.Column('data', sa.LargeBinary()),
+            sa.Column('expiry', sa.DateTime()),
+        )
+
+
+def downgrade():
+    op.drop_table('sessions')
+    op.drop_table('audit_log')
+    op.drop_table('time_log')
+    op.drop_table('team_setting')
+    if op.get_bind().dialect.name != 'sqlite':
+        op.drop_constraint('team_owner_id_fkey', 'team', type_='foreignkey')
+    op.drop_table('user')
+    op.drop_table('team')
@@ -0,0 +1,55 @@
+"""Add time_log.change_seq and time_log_tombstone for the change feed
+
+Revision ID: c10_add_time_log_change_seq
+Revises: c9_add_team_data_version
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from Project.online_migrations import (add_column_nullable, backfill, create_index_online, drop_column_online,
+                                       drop_index_online, forget_backfill, table_exists)
+
+# revision identifiers, used by Alembic.
+revision = 'c10_add_time_log_change_seq'
+down_revision = 'c9_add_team_data_version'
+branch_labels = None
+depends_on = None
+
+
+BACKFILL = 'c10_time_log_change_seq'
+
+
+def upgrade():
+    add_column_nullable('time_log', sa.Column('change_seq', sa.Integer()))
+    if not table_exists('time_log_tombstone'):
+        op.create_table(
+            'time_log_tombstone',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('team_id', sa.Integer(), sa.ForeignKey('team.id', ondelete='CASCADE'), nullable=False),
+            sa.Column('time_log_id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=True),
+            sa.Column('change_seq', sa.Integer(), nullable=False),
+            sa.Column('deleted_at', sa.DateTime(), nullable=False),
+        )
+        # The table is new and empty, so its index builds instantly.
+        op.create_index('ix_time_log_tombstone_team_change_seq', 'time_log_tombstone', ['team_id', 'change_seq'])
+
+    # Existing rows all become changes at the team's next version, so a first sync
+    # (no cursor) picks them up. The team table has one row per customer.
+    op.execute("UPDATE team SET data_version = data_version + 1")
+    team = sa.table('team', sa.column('id', sa.Integer), sa.column('data_version', sa.Integer))
+    time_log = sa.table('time_log', sa.column('id', sa.Integer), sa.column('team_id', sa.Integer),
+                        sa.column('change_seq', sa.Integer))
+    backfill(BACKFILL, time_log, {
+        'change_seq': sa.select(team.c.data_version).where(team.c.id == time_log.c.team_id).scalar_subquery(),
+    }, where=time_log.c.change_seq.is_(None))
+    create_index_online('ix_time_log_team_change_seq', 'time_log', ['team_id', 'change_seq'])
+
+
+def downgrade():
+    forget_backfill(BACKFILL)
+    drop_index_online('ix_time_log_team_change_seq', 'time_log')
+    op.drop_index('ix_time_log_tombstone_team_change_seq', table_name='time_log_tombstone')
+    op.drop_table('time_log_tombstone')
+    drop_column_online('time_log', 'change_seq')
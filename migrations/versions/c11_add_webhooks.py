@@ -0,0 +1,55 @@
+"""Add webhook_endpoint and webhook_delivery (outbound webhook outbox)
+
+Revision ID: c11_add_webhooks
+Revises: c10_add_time_log_change_seq
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'c11_add_webhooks'
+down_revision = 'c10_add_time_log_change_seq'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'webhook_endpoint',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('team_id', sa.Integer(), sa.ForeignKey('team.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('url', sa.String(length=500), nullable=False),
+        sa.Column('secret', sa.String(length=64), nullable=False),
+        sa.Column('active', sa.Boolean(), nullable=False, server_default=sa.text('true')),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('consecutive_failures', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('retry_after', sa.DateTime(), nullable=True),
+        sa.Column('last_success_at', sa.DateTime(), nullable=True),
+        sa.Column('last_error', sa.String(length=300), nullable=True),
+    )
+    op.create_index('ix_webhook_endpoint_team_id', 'webhook_endpoint', ['team_id'])
+    op.create_table(
+        'webhook_delivery',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('endpoint_id', sa.Integer(), sa.ForeignKey('webhook_endpoint.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('team_id', sa.Integer(), sa.ForeignKey('team.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('event_id', sa.String(length=36), nullable=False),
+        sa.Column('event_type', sa.String(length=40), nullable=False),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+        sa.Column('dead', sa.Boolean(), nullable=False, server_default=sa.text('false')),
+    )
+    op.create_index('ix_webhook_delivery_due', 'webhook_delivery', ['dead', 'next_attempt_at'])
+    op.create_index('ix_webhook_delivery_endpoint_id', 'webhook_delivery', ['endpoint_id', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_webhook_delivery_endpoint_id', table_name='webhook_delivery')
+    op.drop_index('ix_webhook_delivery_due', table_name='webhook_delivery')
+    op.drop_table('webhook_delivery')
+    op.drop_index('ix_webhook_endpoint_team_id', table_name='webhook_endpoint')
+    op.drop_table('webhook_endpoint')
@@ -0,0 +1,34 @@
+"""Add shift_schedule (weekly expected shifts)
+
+Revision ID: c12_add_shift_schedule
+Revises: c11_add_webhooks
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'c12_add_shift_schedule'
+down_revision = 'c11_add_webhooks'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'shift_schedule',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('team_id', sa.Integer(), sa.ForeignKey('team.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('user.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('weekday', sa.Integer(), nullable=False),
+        sa.Column('start_time', sa.String(length=5), nullable=False),
+        sa.Column('end_time', sa.String(length=5), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+    )
+    op.create_index('ix_shift_schedule_team_user', 'shift_schedule', ['team_id', 'user_id'])
+
+
+def downgrade():
+    op.drop_index('ix_shift_schedule_team_user', table_name='shift_schedule')
+    op.drop_table('shift_schedule')
@@ -0,0 +1,42 @@
+"""Add team_shard and tenant_key (shard routing directory)
+
+Revision ID: c13_add_shard_routing
+Revises: c12_add_shift_schedule
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'c13_add_shard_routing'
+down_revision = 'c12_add_shift_schedule'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'team_shard',
+        sa.Column('team_id', sa.Integer(), primary_key=True),
+        sa.Column('shard', sa.String(length=50), nullable=False),
+        sa.Column('frozen', sa.Boolean(), nullable=False, server_default=sa.text('false')),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+    )
+    op.create_table(
+        'tenant_key',
+        sa.Column('kind', sa.String(length=20), primary_key=True),
+        sa.Column('value', sa.String(length=128), primary_key=True),
+        sa.Column('team_id', sa.Integer(), nullable=False),
+    )
+    op.create_index('ix_tenant_key_team_id', 'tenant_key', ['team_id'])
+    # Team ids must never be reused (see Team); Postgres sequences already guarantee it.
+    if op.get_bind().dialect.name == 'sqlite':
+        with op.batch_alter_table('team', recreate='always', table_kwargs={'sqlite_autoincrement': True}):
+            pass
+
+
+def downgrade():
+    op.drop_index('ix_tenant_key_team_id', table_name='tenant_key')
+    op.drop_table('tenant_key')
+    op.drop_table('team_shard')
@@ -0,0 +1,38 @@
+"""Add tenant_stats (precomputed super admin overview)
+
+Revision ID: c14_add_tenant_stats
+Revises: c13_add_shard_routing
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'c14_add_tenant_stats'
+down_revision = 'c13_add_shard_routing'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'tenant_stats',
+        sa.Column('team_id', sa.Integer(), primary_key=True),
+        sa.Column('shard', sa.String(length=50), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('admin_name', sa.String(length=100), nullable=True),
+        sa.Column('admin_email', sa.String(length=120), nullable=True),
+        sa.Column('members', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('active_today', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_punch_at', sa.DateTime(), nullable=True),
+        sa.Column('plan', sa.String(length=50), nullable=False),
+        sa.Column('pro_access_expires_at', sa.DateTime(), nullable=True),
+        sa.Column('refreshed_at', sa.DateTime(), nullable=False),
+    )
+    op.create_index('ix_tenant_stats_name', 'tenant_stats', ['name'])
+
+
+def downgrade():
+    op.drop_index('ix_tenant_stats_name', table_name='tenant_stats')
+    op.drop_table('tenant_stats')
@@ -0,0 +1,51 @@
+"""Add time_log.changed_at: change feed cursor that needs no team row lock
+
+Revision ID: c15_add_time_log_changed_at
+Revises: c14_add_tenant_stats
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from Project.online_migrations import (add_column_nullable, backfill, create_index_online, drop_column_online,
+                                       drop_index_online, forget_backfill)
+
+# revision identifiers, used by Alembic.
+revision = 'c15_add_time_log_changed_at'
+down_revision = 'c14_add_tenant_stats'
+branch_labels = None
+depends_on = None
+
+BACKFILL = 'c15_time_log_changed_at'
+
+
+def upgrade():
+    # Tombstones are few (deletions only), so rebuilding that table on SQLite is cheap.
+    with op.batch_alter_table('time_log_tombstone', schema=None) as batch_op:
+        batch_op.alter_column('change_seq', existing_type=sa.Integer(), nullable=True)
+
+    add_column_nullable('time_log', sa.Column('changed_at', sa.DateTime()))
+    # Existing rows take their last punch time, so a first sync (no cursor) still
+    # returns everything, and so does a cursor from the old sequence-number feed.
+    time_log = sa.table('time_log', sa.column('id', sa.Integer), sa.column('changed_at', sa.DateTime),
+                        sa.column('clock_in_at', sa.DateTime), sa.column('clock_out_at', sa.DateTime))
+    backfill(BACKFILL, time_log, {
+        'changed_at': sa.func.coalesce(time_log.c.clock_out_at, time_log.c.clock_in_at,
+                                       sa.literal_column("'2000-01-01 00:00:00.000000'")),
+    }, where=time_log.c.changed_at.is_(None))
+    create_index_online('ix_time_log_team_changed_at', 'time_log', ['team_id', 'changed_at'])
+    create_index_online('ix_time_log_tombstone_team_deleted_at', 'time_log_tombstone', ['team_id', 'deleted_at'])
+    drop_index_online('ix_time_log_team_change_seq', 'time_log')
+    drop_index_online('ix_time_log_tombstone_team_change_seq', 'time_log_tombstone')
+
+
+def downgrade():
+    forget_backfill(BACKFILL)
+    create_index_online('ix_time_log_team_change_seq', 'time_log', ['team_id', 'change_seq'])
+    create_index_online('ix_time_log_tombstone_team_change_seq', 'time_log_tombstone', ['team_id', 'change_seq'])
+    drop_index_online('ix_time_log_tombstone_team_deleted_at', 'time_log_tombstone')
+    drop_index_online('ix_time_log_team_changed_at', 'time_log')
+    op.execute("UPDATE time_log_tombstone SET change_seq = 0 WHERE change_seq IS NULL")
+    with op.batch_alter_table('time_log_tombstone', schema=None) as batch_op:
+        batch_op.alter_column('change_seq', existing_type=sa.Integer(), nullable=False)
+    drop_column_online('time_log', 'changed_at')
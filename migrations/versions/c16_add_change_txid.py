@@ -0,0 +1,49 @@
+"""Add change_txid: change feed order assigned by the database, not the app host's clock
+
+Revision ID: c16_add_change_txid
+Revises: c15_add_time_log_changed_at
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from Project.online_migrations import (add_column_nullable, backfill, create_index_online, drop_column_online,
+                                       drop_index_online, forget_backfill, table_exists)
+
+# revision identifiers, used by Alembic.
+revision = 'c16_add_change_txid'
+down_revision = 'c15_add_time_log_changed_at'
+branch_labels = None
+depends_on = None
+
+BACKFILLS = {'time_log': 'c16_time_log_change_txid', 'time_log_tombstone': 'c16_time_log_tombstone_change_txid'}
+
+
+def upgrade():
+    if not table_exists('change_counter'):
+        op.create_table(
+            'change_counter',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('value', sa.BigInteger(), nullable=False),
+        )
+        op.execute("INSERT INTO change_counter (id, value) VALUES (1, 0)")
+
+    for table_name, name in BACKFILLS.items():
+        add_column_nullable(table_name, sa.Column('change_txid', sa.BigInteger()))
+        # Existing rows sort before every new write, so a first sync (no cursor) still returns
+        # everything; cursors from the timestamp-based feed restart from that snapshot.
+        table = sa.table(table_name, sa.column('id', sa.Integer), sa.column('change_txid', sa.BigInteger))
+        backfill(name, table, {'change_txid': 0}, where=table.c.change_txid.is_(None))
+        create_index_online(f"ix_{table_name}_team_change_txid", table_name, ['team_id', 'change_txid'])
+    drop_index_online('ix_time_log_team_changed_at', 'time_log')
+    drop_index_online('ix_time_log_tombstone_team_deleted_at', 'time_log_tombstone')
+
+
+def downgrade():
+    create_index_online('ix_time_log_team_changed_at', 'time_log', ['team_id', 'changed_at'])
+    create_index_online('ix_time_log_tombstone_team_deleted_at', 'time_log_tombstone', ['team_id', 'deleted_at'])
+    for table_name, name in BACKFILLS.items():
+        forget_backfill(name)
+        drop_index_online(f"ix_{table_name}_team_change_txid", table_name)
+        drop_column_online(table_name, 'change_txid')
+    op.drop_table('change_counter')
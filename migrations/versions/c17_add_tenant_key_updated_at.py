@@ -0,0 +1,24 @@
+"""Add tenant_key.updated_at, so lookups can repair keys whose team row was never committed
+
+Revision ID: c17_add_tenant_key_updated_at
+Revises: c16_add_change_txid
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+import sqlalchemy as sa
+from Project.online_migrations import add_column_nullable, drop_column_online
+
+# revision identifiers, used by Alembic.
+revision = 'c17_add_tenant_key_updated_at'
+down_revision = 'c16_add_change_txid'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing keys stay NULL: they count as old, so a lookup may remove one that no longer matches its team.
+    add_column_nullable('tenant_key', sa.Column('updated_at', sa.DateTime()))
+
+
+def downgrade():
+    drop_column_online('tenant_key', 'updated_at')
@@ -3,7 +3,7 @@
 """Add is_floating column to User model
 
 Revision ID: c1_add_is_floating
-Revises: 
+Revises: c0_initial_schema
 Create Date: 2025-09-17 00:00:00.000000
 
 """
@@ -12,7 +12,7 @@ import sqlalchemy as sa
 
 # revision identifiers, used by Alembic.
 revision = 'c1_add_is_floating'
-down_revision = None
+down_revision = 'c0_initial_schema'
 branch_labels = None
 depends_on = None
 
@@ -0,0 +1,77 @@
+"""Add UTC clock_in_at/clock_out_at timestamps to TimeLog
+
+Revision ID: c2_add_time_log_timestamps
+Revises: c1_add_is_floating
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+import sqlalchemy as sa
+from datetime import datetime, timedelta
+import re
+import pytz
+from Project.online_migrations import (add_column_nullable, backfill, create_index_online, drop_column_online,
+                                       drop_index_online, forget_backfill)
+
+# revision identifiers, used by Alembic.
+revision = 'c2_add_time_log_timestamps'
+down_revision = 'c1_add_is_floating'
+branch_labels = None
+depends_on = None
+
+# Every row written before this revision used the hard-coded Chicago timezone.
+LEGACY_TIMEZONE = pytz.timezone("America/Chicago")
+
+
+def _parse_legacy(date_str, time_str):
+    """Turns ('Oct. 18th, 2026', '08:01:02 AM') into a naive UTC datetime."""
+    if not date_str or not time_str:
+        return None
+    try:
+        day = datetime.strptime(re.sub(r"(\d+)(st|nd|rd|th)", r"\1", date_str), "%b. %d, %Y").date()
+        clock = datetime.strptime(time_str, "%I:%M:%S %p").time()
+    except ValueError:
+        return None
+    local = LEGACY_TIMEZONE.localize(datetime.combine(day, clock))
+    return local.astimezone(pytz.utc).replace(tzinfo=None)
+
+
+BACKFILL = 'c2_time_log_timestamps'
+
+time_log = sa.table(
+    'time_log',
+    sa.column('id', sa.Integer), sa.column('date', sa.String),
+    sa.column('clock_in', sa.String), sa.column('clock_out', sa.String),
+    sa.column('clock_in_at', sa.DateTime), sa.column('clock_out_at', sa.DateTime),
+)
+
+
+def _fill_timestamps(conn, low, high):
+    """Parses one batch of legacy rows in Python and writes them back in one executemany."""
+    updates = []
+    for row in conn.execute(sa.select(time_log.c.id, time_log.c.date, time_log.c.clock_in, time_log.c.clock_out)
+                            .where(time_log.c.id > low, time_log.c.id <= high)):
+        clock_in_at = _parse_legacy(row.date, row.clock_in)
+        clock_out_at = _parse_legacy(row.date, row.clock_out)
+        if clock_in_at and clock_out_at and clock_out_at < clock_in_at:
+            # Legacy rows only stored one date; a clock-out before the clock-in crossed midnight.
+            clock_out_at += timedelta(days=1)
+        updates.append({'row_id': row.id, 'clock_in_at': clock_in_at, 'clock_out_at': clock_out_at})
+    if updates:
+        conn.execute(time_log.update().where(time_log.c.id == sa.bindparam('row_id')), updates)
+    return len(updates)
+
+
+def upgrade():
+    add_column_nullable('time_log', sa.Column('clock_in_at', sa.DateTime()))
+    add_column_nullable('time_log', sa.Column('clock_out_at', sa.DateTime()))
+    backfill(BACKFILL, time_log, _fill_timestamps)
+    create_index_online('ix_time_log_team_clock_in_at', 'time_log', ['team_id', 'clock_in_at'])
+    create_index_online('ix_time_log_user_clock_in_at', 'time_log', ['user_id', 'clock_in_at'])
+
+
+def downgrade():
+    forget_backfill(BACKFILL)
+    drop_index_online('ix_time_log_user_clock_in_at', 'time_log')
+    drop_index_online('ix_time_log_team_clock_in_at', 'time_log')
+    drop_column_online('time_log', 'clock_out_at')
+    drop_column_online('time_log', 'clock_in_at')
@@ -0,0 +1,35 @@
+"""Add api_key table for the punch ingestion API
+
+Revision ID: c3_add_api_keys
+Revises: c2_add_time_log_timestamps
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'c3_add_api_keys'
+down_revision = 'c2_add_time_log_timestamps'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'api_key',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('team_id', sa.Integer(), sa.ForeignKey('team.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('key_hash', sa.String(length=64), nullable=False, unique=True),
+        sa.Column('key_prefix', sa.String(length=12), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('last_used_at', sa.DateTime(), nullable=True),
+        sa.Column('revoked', sa.Boolean(), nullable=False, server_default=sa.text('false')),
+    )
+    op.create_index('ix_api_key_team_id', 'api_key', ['team_id'])
+
+
+def downgrade():
+    op.drop_index('ix_api_key_team_id', table_name='api_key')
+    op.drop_table('api_key')
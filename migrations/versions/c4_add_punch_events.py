@@ -0,0 +1,104 @@
+"""Add append-only punch_event log; TimeLog becomes its shift projection
+
+Revision ID: c4_add_punch_events
+Revises: c3_add_api_keys
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from datetime import datetime, timezone
+from Project.online_migrations import (add_column_nullable, add_foreign_key_online, backfill, drop_column_online,
+                                       forget_backfill, table_exists)
+
+# revision identifiers, used by Alembic.
+revision = 'c4_add_punch_events'
+down_revision = 'c3_add_api_keys'
+branch_labels = None
+depends_on = None
+
+
+BACKFILL = 'c4_punch_events_from_time_log'
+
+time_log = sa.table(
+    'time_log',
+    sa.column('id', sa.Integer), sa.column('user_id', sa.Integer), sa.column('team_id', sa.Integer),
+    sa.column('clock_in_at', sa.DateTime), sa.column('clock_out_at', sa.DateTime),
+    sa.column('clock_in_event_id', sa.Integer), sa.column('clock_out_event_id', sa.Integer),
+)
+# A Table rather than sa.table(): INSERT ... RETURNING in parameter order needs the primary key.
+punch_event = sa.Table(
+    'punch_event', sa.MetaData(),
+    sa.Column('id', sa.Integer, primary_key=True), sa.Column('team_id', sa.Integer), sa.Column('user_id', sa.Integer),
+    sa.Column('kind', sa.String), sa.Column('occurred_at', sa.DateTime), sa.Column('source', sa.String),
+    sa.Column('voided', sa.Boolean), sa.Column('created_at', sa.DateTime),
+)
+
+
+def _add_punches(conn, low, high):
+    """
+    Turns one batch of shifts into an 'in' (and, if closed, an 'out') punch each:
+    one multi-row INSERT ... RETURNING for the punches and one executemany to
+    link them back. Rows that already have their punches (a re-run batch) are skipped.
+    """
+    rows = conn.execute(sa.select(time_log).where(
+        time_log.c.id > low, time_log.c.id <= high, time_log.c.clock_in_at != None,
+        time_log.c.clock_in_event_id == None)).fetchall()
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    punches, owners = [], []
+    for row in rows:
+        for kind, at in (('in', row.clock_in_at), ('out', row.clock_out_at)):
+            if at is not None:
+                punches.append({'team_id': row.team_id, 'user_id': row.user_id, 'kind': kind, 'occurred_at': at,
+                                'source': 'legacy', 'voided': False, 'created_at': now})
+                owners.append((row.id, kind))
+    if not punches:
+        return 0
+    ids = conn.execute(punch_event.insert().returning(punch_event.c.id, sort_by_parameter_order=True),
+                       punches).scalars().all()
+    links = {}
+    for (row_id, kind), punch_id in zip(owners, ids):
+        links.setdefault(row_id, {'row_id': row_id, 'clock_in_event_id': None, 'clock_out_event_id': None})
+        links[row_id][f"clock_{kind}_event_id"] = punch_id
+    conn.execute(time_log.update().where(time_log.c.id == sa.bindparam('row_id')), list(links.values()))
+    return len(links)
+
+
+def upgrade():
+    if not table_exists('punch_event'):
+        op.create_table(
+            'punch_event',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('team_id', sa.Integer(), sa.ForeignKey('team.id', ondelete='CASCADE'), nullable=False),
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('user.id', ondelete='CASCADE'), nullable=False),
+            sa.Column('kind', sa.String(length=3), nullable=False),
+            sa.Column('occurred_at', sa.DateTime(), nullable=False),
+            sa.Column('source', sa.String(length=20), nullable=False),
+            sa.Column('pairs_with_id', sa.Integer(), sa.ForeignKey('punch_event.id', ondelete='SET NULL'), nullable=True),
+            sa.Column('voided', sa.Boolean(), nullable=False, server_default=sa.text('false')),
+            sa.Column('created_at', sa.DateTime(), nullable=False),
+        )
+        # The table is new and empty, so its indexes build instantly.
+        op.create_index('ix_punch_event_user_occurred_at', 'punch_event', ['user_id', 'occurred_at'])
+        op.create_index('ix_punch_event_team_occurred_at', 'punch_event', ['team_id', 'occurred_at'])
+
+    add_column_nullable('time_log', sa.Column('clock_in_event_id', sa.Integer()))
+    add_column_nullable('time_log', sa.Column('clock_out_event_id', sa.Integer()))
+    add_foreign_key_online('time_log_clock_in_event_id_fkey', 'time_log', 'clock_in_event_id', 'punch_event',
+                           ondelete='SET NULL')
+    add_foreign_key_online('time_log_clock_out_event_id_fkey', 'time_log', 'clock_out_event_id', 'punch_event',
+                           ondelete='SET NULL')
+
+    backfill(BACKFILL, time_log, _add_punches)
+
+
+def downgrade():
+    forget_backfill(BACKFILL)
+    if op.get_bind().dialect.name != 'sqlite':
+        op.drop_constraint('time_log_clock_out_event_id_fkey', 'time_log', type_='foreignkey')
+        op.drop_constraint('time_log_clock_in_event_id_fkey', 'time_log', type_='foreignkey')
+    drop_column_online('time_log', 'clock_out_event_id')
+    drop_column_online('time_log', 'clock_in_event_id')
+    op.drop_index('ix_punch_event_team_occurred_at', table_name='punch_event')
+    op.drop_index('ix_punch_event_user_occurred_at', table_name='punch_event')
+    op.drop_table('punch_event')
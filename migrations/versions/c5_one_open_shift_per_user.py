@@ -0,0 +1,48 @@
+"""Enforce one open shift per user; idempotency key on punch_event
+
+Revision ID: c5_one_open_shift_per_user
+Revises: c4_add_punch_events
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+import sqlalchemy as sa
+from Project.online_migrations import (add_column_nullable, add_column_with_default, backfill, create_index_online,
+                                       drop_column_online, drop_index_online, forget_backfill)
+
+# revision identifiers, used by Alembic.
+revision = 'c5_one_open_shift_per_user'
+down_revision = 'c4_add_punch_events'
+branch_labels = None
+depends_on = None
+
+OPEN_SHIFT = 'clock_out_at IS NULL AND missed_clock_out = false'
+
+
+BACKFILL = 'c5_time_log_missed_clock_out'
+
+
+def upgrade():
+    add_column_with_default('time_log', sa.Column('missed_clock_out', sa.Boolean(), nullable=False,
+                                                  server_default=sa.text('false')))
+    add_column_nullable('punch_event', sa.Column('idempotency_key', sa.String(length=36)))
+    create_index_online('ix_punch_event_idempotency_key', 'punch_event', ['idempotency_key'], unique=True)
+
+    # Existing duplicate open rows (double submits) would block the index: keep
+    # the newest open row per user and flag the others as missed clock-outs.
+    time_log = sa.table('time_log', sa.column('id', sa.Integer), sa.column('user_id', sa.Integer),
+                        sa.column('clock_out_at', sa.DateTime), sa.column('missed_clock_out', sa.Boolean))
+    newer = time_log.alias('newer')
+    backfill(BACKFILL, time_log, {'missed_clock_out': sa.true()}, where=sa.and_(
+        time_log.c.clock_out_at.is_(None), time_log.c.missed_clock_out == sa.false(),
+        sa.exists().where(newer.c.user_id == time_log.c.user_id, newer.c.clock_out_at.is_(None),
+                          newer.c.id > time_log.c.id)))
+    create_index_online('ux_time_log_open_shift', 'time_log', ['user_id'], unique=True,
+                        postgresql_where=sa.text(OPEN_SHIFT), sqlite_where=sa.text(OPEN_SHIFT))
+
+
+def downgrade():
+    forget_backfill(BACKFILL)
+    drop_index_online('ux_time_log_open_shift', 'time_log')
+    drop_index_online('ix_punch_event_idempotency_key', 'punch_event')
+    drop_column_online('punch_event', 'idempotency_key')
+    drop_column_online('time_log', 'missed_clock_out')
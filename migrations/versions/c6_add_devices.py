@@ -0,0 +1,79 @@
+"""Add device table (many devices per user); drop user.device_token
+
+Revision ID: c6_add_devices
+Revises: c5_one_open_shift_per_user
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from datetime import datetime, timezone
+import hashlib
+from Project.online_migrations import (add_column_nullable, backfill, create_index_online, drop_column_online,
+                                       drop_index_online, forget_backfill, table_exists)
+
+# revision identifiers, used by Alembic.
+revision = 'c6_add_devices'
+down_revision = 'c5_one_open_shift_per_user'
+branch_labels = None
+depends_on = None
+
+
+BACKFILL = 'c6_devices_from_user_device_token'
+
+user = sa.table('user', sa.column('id', sa.Integer), sa.column('team_id', sa.Integer),
+                sa.column('device_token', sa.String))
+device_table = sa.table('device', sa.column('user_id', sa.Integer), sa.column('team_id', sa.Integer),
+                        sa.column('token_hash', sa.String), sa.column('created_at', sa.DateTime),
+                        sa.column('last_seen_at', sa.DateTime), sa.column('revoked', sa.Boolean))
+
+
+def _copy_devices(conn, low, high):
+    """Every device_token in one batch of users becomes that user's first device."""
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    rows = conn.execute(sa.select(user.c.id, user.c.team_id, user.c.device_token).where(
+        user.c.id > low, user.c.id <= high, user.c.device_token != None)).fetchall()
+    hashes = {hashlib.sha256(row.device_token.encode('utf-8')).hexdigest(): row for row in rows}
+    # A re-run batch finds its devices already copied.
+    existing = set(conn.execute(sa.select(device_table.c.token_hash).where(
+        device_table.c.token_hash.in_(list(hashes)))).scalars()) if hashes else set()
+    devices = [{'user_id': row.id, 'team_id': row.team_id, 'token_hash': token_hash,
+                'created_at': now, 'last_seen_at': now, 'revoked': False}
+               for token_hash, row in hashes.items() if token_hash not in existing]
+    if devices:
+        conn.execute(device_table.insert(), devices)
+    return len(devices)
+
+
+def upgrade():
+    if not table_exists('device'):
+        op.create_table(
+            'device',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('user.id', ondelete='CASCADE'), nullable=False),
+            sa.Column('team_id', sa.Integer(), sa.ForeignKey('team.id', ondelete='CASCADE'), nullable=False),
+            sa.Column('token_hash', sa.String(length=64), nullable=False, unique=True),
+            sa.Column('user_agent', sa.String(length=200), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=False),
+            sa.Column('last_seen_at', sa.DateTime(), nullable=False),
+            sa.Column('revoked', sa.Boolean(), nullable=False, server_default=sa.text('false')),
+        )
+        # The table is new and empty, so its indexes build instantly.
+        op.create_index('ix_device_user_id', 'device', ['user_id'])
+        op.create_index('ix_device_last_seen_at', 'device', ['last_seen_at'])
+
+    backfill(BACKFILL, user, _copy_devices)
+    # Catalog-only on Postgres. SQLite cannot drop a UNIQUE column in place, so
+    # there the (small) user table is rebuilt once. The index is the downgrade's.
+    drop_index_online('user_device_token_key', 'user')
+    drop_column_online('user', 'device_token')
+
+
+def downgrade():
+    forget_backfill(BACKFILL)
+    # Only hashes were kept, so tokens cannot be restored; devices re-register on their next scan.
+    add_column_nullable('user', sa.Column('device_token', sa.String(length=36)))
+    create_index_online('user_device_token_key', 'user', ['device_token'], unique=True)
+    op.drop_index('ix_device_last_seen_at', table_name='device')
+    op.drop_index('ix_device_user_id', table_name='device')
+    op.drop_table('device')
@@ -0,0 +1,56 @@
+"""Add user.name_normalized with exact and trigram indexes for name matching
+
+Revision ID: c7_add_user_name_normalized
+Revises: c6_add_devices
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import unicodedata
+from Project.online_migrations import (add_column_nullable, backfill, create_index_online, drop_column_online,
+                                       drop_index_online, forget_backfill)
+
+# revision identifiers, used by Alembic.
+revision = 'c7_add_user_name_normalized'
+down_revision = 'c6_add_devices'
+branch_labels = None
+depends_on = None
+
+
+def normalize_name(name):
+    # Frozen copy of Project.names.normalize_name at the time of this migration.
+    decomposed = unicodedata.normalize('NFKD', name or '')
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return ' '.join(stripped.casefold().split())
+
+
+BACKFILL = 'c7_user_name_normalized'
+
+user = sa.table('user', sa.column('id', sa.Integer), sa.column('name', sa.String),
+                sa.column('name_normalized', sa.String))
+
+
+def _normalize_names(conn, low, high):
+    rows = conn.execute(sa.select(user.c.id, user.c.name).where(user.c.id > low, user.c.id <= high)).fetchall()
+    if rows:
+        conn.execute(user.update().where(user.c.id == sa.bindparam('row_id')),
+                     [{'row_id': row.id, 'name_normalized': normalize_name(row.name)} for row in rows])
+    return len(rows)
+
+
+def upgrade():
+    add_column_nullable('user', sa.Column('name_normalized', sa.String(length=100)))
+    backfill(BACKFILL, user, _normalize_names)
+    create_index_online('ix_user_team_name_normalized', 'user', ['team_id', 'name_normalized'])
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        create_index_online('ix_user_name_trgm', 'user', ['name_normalized'], postgresql_using='gin',
+                            postgresql_ops={'name_normalized': 'gin_trgm_ops'})
+
+
+def downgrade():
+    forget_backfill(BACKFILL)
+    drop_index_online('ix_user_name_trgm', 'user')
+    drop_index_online('ix_user_team_name_normalized', 'user')
+    drop_column_online('user', 'name_normalized')
@@ -0,0 +1,37 @@
+"""Add user_summary (cached dashboard totals)
+
+Revision ID: c8_add_user_summary
+Revises: c7_add_user_name_normalized
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'c8_add_user_summary'
+down_revision = 'c7_add_user_name_normalized'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Starts empty; each row is computed the first time its user opens the dashboard.
+    op.create_table(
+        'user_summary',
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('team_id', sa.Integer(), sa.ForeignKey('team.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('week_start', sa.Date(), nullable=False),
+        sa.Column('week_seconds', sa.Integer(), nullable=False),
+        sa.Column('period_start', sa.Date(), nullable=False),
+        sa.Column('period_seconds', sa.Integer(), nullable=False),
+        sa.Column('streak_days', sa.Integer(), nullable=False),
+        sa.Column('last_work_day', sa.Date(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+    )
+    op.create_index('ix_user_summary_team_id', 'user_summary', ['team_id'])
+
+
+def downgrade():
+    op.drop_index('ix_user_summary_team_id', table_name='user_summary')
+    op.drop_table('user_summary')
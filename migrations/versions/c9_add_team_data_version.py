@@ -0,0 +1,25 @@
+"""Add team.data_version (bumped on TimeLog/User writes; keys cached reports)
+
+Revision ID: c9_add_team_data_version
+Revises: c8_add_user_summary
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'c9_add_team_data_version'
+down_revision = 'c8_add_user_summary'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # A constant server default, so Postgres adds the column without rewriting the table.
+    op.add_column('team', sa.Column('data_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('team', schema=None) as batch_op:
+        batch_op.drop_column('data_version')
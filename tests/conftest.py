@@ -0,0 +1,96 @@
+# tests/conftest.py
+
+import os
+import secrets
+import warnings
+
+import pytest
+
+BASE_URL = 'https://localhost'
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    """One app for the whole run, on a throwaway SQLite file. Nothing touches DATABASE_URL."""
+    path = tmp_path_factory.mktemp('db') / 'test.db'
+    os.environ.update({'SECRET_KEY': 'test', 'DATABASE_URL': f"sqlite:///{path}", 'RATELIMIT_ENABLED': 'False',
+                       'PRERENDER_MARKETING_PAGES': 'False', 'SHARD_DATABASE_URLS': ''})
+    from Project import create_app
+    from Project.extensions import db
+
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    """A test client that talks HTTPS, so the secure session cookie is sent back."""
+    client = app.test_client()
+    client.environ_base['wsgi.url_scheme'] = 'https'
+    return client
+
+
+@pytest.fixture
+def make_team(app):
+    """Creates a team with location checks off and returns its id."""
+    from Project.models import db, Team, TeamSetting
+
+    def make(plan='Pro', **settings):
+        with app.app_context():
+            team = Team(name=f"Team {secrets.token_hex(4)}", plan=plan)
+            db.session.add(team)
+            db.session.flush()
+            settings.setdefault('LocationVerificationEnabled', 'FALSE')
+            for name, value in settings.items():
+                db.session.add(TeamSetting(team_id=team.id, name=name, value=value))
+            db.session.commit()
+            return team.id
+    return make
+
+
+@pytest.fixture
+def make_user(app):
+    """Creates a worker on a team, with a registered device when `device_token` is given. Returns its id."""
+    from Project.models import db, User
+    from Project.devices import register_device
+
+    def make(team_id, device_token=None, name=None):
+        with app.app_context():
+            user = User(name=name or f"Worker {secrets.token_hex(4)}", team_id=team_id, role='User')
+            db.session.add(user)
+            db.session.flush()
+            if device_token:
+                register_device(user, device_token)
+            db.session.commit()
+            return user.id
+    return make
+
+
+@pytest.fixture
+def admin_client(app, client, make_team, make_user):
+    """`client`, logged in as the admin of a new Pro team. Returns (client, team id)."""
+    from Project.models import db, User
+
+    team_id = make_team()
+    admin_id = make_user(team_id, name="Admin")
+    with app.app_context():
+        db.session.get(User, admin_id).role = 'Admin'
+        db.session.commit()
+    with client.session_transaction() as session:
+        session['user_id'] = admin_id
+        session['team_id'] = team_id
+    return client, team_id
+
+
+@pytest.fixture(autouse=True)
+def _quiet_sqlalchemy_warnings():
+    # Flask-Session redefines its model each time an app is created; harmless in tests.
+    with warnings.catch_warnings():
+        warnings.filterwarnings('ignore', message='This declarative base already contains a class')
+        yield
@@ -0,0 +1,60 @@
+# tests/test_attendance.py
+
+from datetime import date, datetime, timedelta
+import random
+
+from sqlalchemy import event
+
+from Project.models import db, ShiftSchedule, TimeLog, User
+from Project.schedules import DEFAULT_LATE_GRACE_MINUTES, team_attendance
+
+PEOPLE = 300
+DAYS = 31
+FIRST_DAY = date(2026, 3, 2)
+
+
+def test_month_of_a_large_site_in_a_fixed_number_of_queries(app, make_team):
+    team_id = make_team(Timezone='UTC')
+    last_day = FIRST_DAY + timedelta(days=DAYS - 1)
+    rng, expected = random.Random(42), {}
+    with app.app_context():
+        db.session.execute(User.__table__.insert(), [{'name': f"Person {i}", 'team_id': team_id, 'role': 'User'}
+                                                     for i in range(PEOPLE)])
+        user_ids = [uid for (uid,) in db.session.query(User.id).filter(User.team_id == team_id)]
+        db.session.execute(ShiftSchedule.__table__.insert(), [
+            {'team_id': team_id, 'user_id': uid, 'weekday': weekday, 'start_time': '09:00', 'end_time': '17:00',
+             'created_at': datetime(2026, 1, 1)} for uid in user_ids for weekday in range(5)])
+
+        logs = []
+        for uid in user_ids:
+            for day in (FIRST_DAY + timedelta(days=i) for i in range(DAYS)):
+                if day.weekday() >= 5:
+                    continue
+                if rng.random() < 0.05:
+                    expected[(uid, day)] = ('absent', 0)
+                    continue
+                minutes = rng.randint(-20, 40)
+                clock_in = datetime.combine(day, datetime.min.time()) + timedelta(hours=9, minutes=minutes)
+                logs.append({'user_id': uid, 'team_id': team_id, 'date': day.isoformat(), 'clock_in': '',
+                             'clock_in_at': clock_in, 'clock_out_at': clock_in + timedelta(hours=8)})
+                late = minutes > DEFAULT_LATE_GRACE_MINUTES
+                expected[(uid, day)] = ('late' if late else 'on_time', minutes if late else 0)
+        db.session.execute(TimeLog.__table__.insert(), logs)
+        db.session.commit()
+
+        statements = []
+
+        def listener(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            records = team_attendance(team_id, FIRST_DAY, last_day, now=datetime(2026, 5, 1))
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+
+    assert 0 < len(statements) <= 4
+    assert len(records) == len(expected)
+    assert [(record.user_id, record.scheduled_start) for record in records] == sorted(
+        (record.user_id, record.scheduled_start) for record in records)
+    assert {(record.user_id, record.day): (record.status, record.minutes_late) for record in records} == expected
@@ -0,0 +1,66 @@
+# tests/test_changes.py
+
+from datetime import datetime
+
+from sqlalchemy.orm import Session
+
+from Project.changes import changes_since, decode_cursor
+from Project.models import db, TimeLog
+
+
+def _add_log(session, team_id, user_id, day):
+    log = TimeLog(team_id=team_id, user_id=user_id, date=day, clock_in='09:00', clock_out='17:00',
+                  clock_in_at=datetime.fromisoformat(f"{day} 09:00"),
+                  clock_out_at=datetime.fromisoformat(f"{day} 17:00"))
+    session.add(log)
+    return log
+
+
+def test_feed_pages_through_edits_and_deletions(app, make_team, make_user):
+    team_id = make_team()
+    user_id = make_user(team_id)
+    with app.app_context():
+        logs = [_add_log(db.session, team_id, user_id, f"2026-01-0{day}") for day in range(1, 4)]
+        db.session.commit()
+        first, second, third = (log.id for log in logs)
+
+        changes, cursor, has_more = changes_since(team_id, limit=2)
+        assert [change['id'] for change in changes] == [first, second] and has_more
+
+        db.session.get(TimeLog, first).clock_out = '17:30'
+        db.session.delete(db.session.get(TimeLog, second))
+        db.session.commit()
+
+        changes, cursor, has_more = changes_since(team_id, cursor)
+        assert [(change['op'], change['id']) for change in changes] == [
+            ('upsert', third), ('upsert', first), ('delete', second)]
+        assert not has_more
+        assert changes_since(team_id, cursor)[0] == []
+
+
+def test_uncommitted_write_is_not_skipped(app, make_team, make_user):
+    team_id = make_team()
+    user_id = make_user(team_id)
+    with app.app_context():
+        _add_log(db.session, team_id, user_id, '2026-02-01')
+        db.session.commit()
+
+        # A second transaction stamps its row, then commits only after the feed has moved on.
+        with Session(db.engine) as slow:
+            late = _add_log(slow, team_id, user_id, '2026-02-02')
+            slow.flush()
+            changes, cursor, _ = changes_since(team_id)
+            assert late.id not in [change['id'] for change in changes]
+            slow.commit()
+            late_id = late.id
+
+        db.session.rollback()
+        changes, _, _ = changes_since(team_id, cursor)
+        assert [change['id'] for change in changes] == [late_id]
+
+
+def test_cursor_from_another_shard_restarts_the_feed(app):
+    with app.app_context():
+        assert decode_cursor('primary.12.0.7') == (12, 0, 7)
+        assert decode_cursor('eu.12.0.7') == (0, 0, 0)
+        assert decode_cursor('1760000000000000.0.7') == (0, 0, 0)  # The timestamp-based format.
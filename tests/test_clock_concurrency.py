@@ -0,0 +1,53 @@
+# tests/test_clock_concurrency.py
+#
+# Parallel confirms of each clock action (double taps with the same key, second
+# tabs with their own) on the temporary SQLite file, where lock_user falls back
+# to taking the database's write lock.
+
+import threading
+import uuid
+
+from Project.models import db, PunchEvent, Team, TimeLog
+
+ROUNDS = 10
+PARALLEL = 6
+PEOPLE = 3
+
+
+def test_parallel_confirms_record_one_punch_per_action(app, make_team, make_user):
+    team_id = make_team()
+    workers = []
+    for _ in range(PEOPLE):
+        device_token = str(uuid.uuid4())
+        workers.append((make_user(team_id, device_token=device_token), device_token))
+    with app.app_context():
+        url = f"/join/{db.session.get(Team, team_id).join_token}/clock"
+
+    def submit(device_token, action, key, statuses):
+        client = app.test_client()
+        client.environ_base['wsgi.url_scheme'] = 'https'
+        client.set_cookie('device_token', device_token)
+        try:
+            statuses.append(client.post(url, data={'action': action, 'key': key}).status_code)
+        except Exception as e:
+            statuses.append(repr(e))
+
+    for round_number in range(1, ROUNDS + 1):
+        action = 'Clock In' if round_number % 2 else 'Clock Out'
+        threads, statuses = [], []
+        for _, device_token in workers:
+            key = str(uuid.uuid4())
+            for n in range(PARALLEL):
+                threads.append(threading.Thread(target=submit, args=(
+                    device_token, action, key if n % 2 == 0 else str(uuid.uuid4()), statuses)))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert statuses == [200] * len(threads), f"round {round_number}"
+        with app.app_context():
+            for user_id, _ in workers:
+                assert PunchEvent.query.filter_by(user_id=user_id).count() == round_number
+                assert TimeLog.query.filter_by(user_id=user_id, clock_out_at=None,
+                                               missed_clock_out=False).count() == round_number % 2
@@ -0,0 +1,31 @@
+# tests/test_compression.py
+
+GZIP = {'Accept-Encoding': 'gzip'}
+
+
+def test_page_showing_a_new_secret_is_not_compressed_or_stored(admin_client):
+    client, _ = admin_client
+
+    response = client.post('/admin/settings/api_keys', data={'name': "Door reader"})
+    response = client.get(response.headers['Location'], headers=GZIP)
+
+    assert response.status_code == 200
+    assert 'Content-Encoding' not in response.headers
+    assert response.cache_control.no_store
+    assert "it will not be shown again" in response.get_data(as_text=True)
+
+    # Once the secret has been shown, the same page is compressed again.
+    response = client.get('/admin/settings', headers=GZIP)
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert not response.cache_control.no_store
+
+
+def test_new_webhook_secret_is_not_compressed(admin_client):
+    client, _ = admin_client
+
+    response = client.post('/admin/settings/webhooks', data={'url': "https://hooks.example.com/qr"})
+    response = client.get(response.headers['Location'], headers=GZIP)
+
+    assert 'Content-Encoding' not in response.headers
+    assert response.cache_control.no_store
+    assert "signing secret will not be shown again" in response.get_data(as_text=True)
@@ -0,0 +1,82 @@
+# tests/test_kiosk.py
+
+import re
+
+from Project.models import PunchEvent
+
+
+def test_home_prepares_an_action_for_a_known_device(client, make_team, make_user):
+    team_id = make_team()
+    make_user(team_id, device_token='home-device')
+    client.set_cookie('device_token', 'home-device')
+
+    response = client.get('/')
+
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith('/confirm_entry')
+
+
+def test_home_cannot_clock_in_a_rotating_qr_team(app, client, make_team, make_user):
+    team_id = make_team(RotatingQrEnabled='TRUE')
+    user_id = make_user(team_id, device_token='rotating-home-device')
+    client.set_cookie('device_token', 'rotating-home-device')
+
+    response = client.get('/')
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith('/scan')
+    with client.session_transaction() as session:
+        assert 'pending_action' not in session
+
+    # Confirming without a prepared action goes back to the scan page.
+    response = client.post('/execute_action')
+    assert response.headers['Location'].endswith('/scan')
+    with app.app_context():
+        assert PunchEvent.query.filter_by(user_id=user_id).count() == 0
+
+
+def _join_token(app, team_id):
+    from Project.models import db, Team
+    with app.app_context():
+        return db.session.get(Team, team_id).join_token
+
+
+def _page_key(response):
+    return re.search(rb'name="key" value="([^"]+)"', response.data).group(1).decode()
+
+
+def test_repeated_scan_shows_the_page_it_just_prepared(app, client, make_team, make_user):
+    team_id = make_team()
+    make_user(team_id, device_token='double-scan-device')
+    client.set_cookie('device_token', 'double-scan-device')
+    join_token = _join_token(app, team_id)
+
+    first = client.get(f'/join/{join_token}')
+    second = client.get(f'/join/{join_token}')
+
+    assert b'Clock In' in first.data
+    assert _page_key(first) == _page_key(second)
+
+
+def test_clock_now_decides_in_or_out_from_the_open_shift(app, client, make_team, make_user):
+    team_id = make_team()
+    user_id = make_user(team_id, device_token='one-shot-device')
+    client.set_cookie('device_token', 'one-shot-device')
+    url = f'/join/{_join_token(app, team_id)}/clock'
+
+    def punches():
+        with app.app_context():
+            return [event.kind for event in PunchEvent.query.filter_by(user_id=user_id).order_by(PunchEvent.id)]
+
+    # A page claiming "Clock Out" cannot clock out someone who is not in, nor clock them in.
+    response = client.post(url, json={'action': 'Clock Out', 'key': 'stale'})
+    assert response.get_json()['status'] == 'clock_out'
+    assert punches() == []
+
+    assert client.post(url, json={'action': 'Clock In', 'key': 'k1'}).get_json()['status'] == 'clock_in'
+    # A second tab opened before the first tap still says "Clock In": reported, not turned into a clock-out.
+    assert client.post(url, json={'action': 'Clock In', 'key': 'k2'}).get_json()['status'] == 'clock_in'
+    assert punches() == ['in']
+
+    # Without a page to cross-check against, the open shift alone decides.
+    assert client.post(url, json={'key': 'k3'}).get_json()['status'] == 'clock_out'
+    assert punches() == ['in', 'out']
@@ -0,0 +1,34 @@
+# tests/test_passwords.py
+
+from Project.models import db, User
+from Project.passwords import _hash
+
+
+def _make_admin(app, team_id, email, password):
+    with app.app_context():
+        # Cost 10 keeps the test quick but still takes long enough to miss a zero timeout.
+        db.session.add(User(name='Admin', email=email, password=_hash(password.encode(), 10), team_id=team_id,
+                            role='Admin'))
+        db.session.commit()
+
+
+def test_login_succeeds(app, client, make_team, monkeypatch):
+    monkeypatch.setitem(app.config, 'BCRYPT_LOG_ROUNDS', 10)
+    _make_admin(app, make_team(), 'ok@example.com', 'correct horse')
+
+    response = client.post('/login', data={'email': 'ok@example.com', 'password': 'correct horse'})
+
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith('/admin/dashboard')
+
+
+def test_login_asks_to_retry_when_the_hashing_pool_is_busy(app, client, make_team, monkeypatch):
+    _make_admin(app, make_team(), 'busy@example.com', 'correct horse')
+    monkeypatch.setitem(app.config, 'PASSWORD_HASH_TIMEOUT', 0)
+
+    response = client.post('/login', data={'email': 'busy@example.com', 'password': 'correct horse'})
+
+    assert response.status_code == 503
+    assert b'Please try again in a moment' in response.data
+    with client.session_transaction() as session:
+        assert 'user_id' not in session
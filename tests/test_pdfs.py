@@ -0,0 +1,43 @@
+# tests/test_pdfs.py
+
+from datetime import datetime
+
+from Project.models import db, TimeLog
+from Project.pdfs import fits_pdf_fonts
+
+
+def _add_shift(app, team_id, user_id):
+    with app.app_context():
+        db.session.add(TimeLog(team_id=team_id, user_id=user_id, date='2026-04-01', clock_in='09:00',
+                               clock_out='17:00', clock_in_at=datetime(2026, 4, 1, 9),
+                               clock_out_at=datetime(2026, 4, 1, 17)))
+        db.session.commit()
+
+
+def test_built_in_fonts_cover_western_names_only():
+    assert fits_pdf_fonts("José Müller", "Zoë Ørsted", None)
+    assert not fits_pdf_fonts("Ana", "Иван Петров")
+    assert not fits_pdf_fonts("王伟")
+
+
+def test_timesheet_is_a_pdf_when_every_name_fits(app, admin_client, make_user):
+    client, team_id = admin_client
+    _add_shift(app, team_id, make_user(team_id, name="José Müller"))
+
+    response = client.get('/admin/print_view/pdf')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/pdf'
+
+
+def test_timesheet_falls_back_to_the_print_view_for_other_scripts(app, admin_client, make_user):
+    client, team_id = admin_client
+    _add_shift(app, team_id, make_user(team_id, name="Иван Петров"))
+
+    response = client.get('/admin/print_view/pdf')
+
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith('/admin/print_view')
+    page = client.get(response.headers['Location']).get_data(as_text=True)
+    assert "characters the PDF cannot show" in page
+    assert "Иван Петров" in page
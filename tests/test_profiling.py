@@ -0,0 +1,26 @@
+# tests/test_profiling.py
+
+import time
+
+from Project.profiling import SamplingProfiler
+
+
+def _busy(seconds):
+    until = time.monotonic() + seconds
+    while time.monotonic() < until:
+        sum(range(100))
+
+
+def test_stopping_while_the_sampler_records_keeps_every_sample(tmp_path):
+    profiler = SamplingProfiler(str(tmp_path), interval=0.0005, max_bytes=1 << 20, root=str(tmp_path))
+
+    # Many short requests, so stop() often runs while the sampler thread is adding to the same request.
+    for _ in range(200):
+        profiler.start()
+        _busy(0.002)
+        profiler.stop('busy')
+
+    assert profiler.endpoints['busy']
+    assert any('_busy' in stack for stack in profiler.endpoints['busy'])
+    profiler.flush()
+    assert (tmp_path / f"busy.{profiler.pid}.collapsed").exists()
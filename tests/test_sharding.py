@@ -0,0 +1,229 @@
+# tests/test_sharding.py
+#
+# A throwaway app on three SQLite files: the primary and shards s1 and s2.
+
+from datetime import datetime, timedelta
+import secrets
+import threading
+import time
+
+from flask import g
+import pytest
+from sqlalchemy import func, insert, select
+
+from Project import sharding
+from Project.api import generate_api_key
+from Project.extensions import db
+from Project.models import ApiKey, Team, TeamSetting, TenantKey, TimeLog, User
+from Project.sharding import (KEY_REPAIR_GRACE_SECONDS, TENANT_TABLES, move_team, route_to_team, shard_engine,
+                              team_for_key, team_route)
+from Project.timekeeping import utcnow
+
+WRITERS = 4
+SETTLE = 1.0
+
+
+@pytest.fixture
+def sharded_app(tmp_path, monkeypatch):
+    # Fresh files for each test: SQLite shards hand out overlapping ids, so teams moved
+    # back and forth by earlier tests would collide (see init_shard). The route cache
+    # is per process, so it starts empty too.
+    monkeypatch.setattr(sharding, '_route_cache', {})
+    with pytest.MonkeyPatch.context() as env:
+        for name, value in {'SECRET_KEY': 'test', 'DATABASE_URL': f"sqlite:///{tmp_path}/primary.db",
+                            'SHARD_DATABASE_URLS': f"s1=sqlite:///{tmp_path}/s1.db,s2=sqlite:///{tmp_path}/s2.db",
+                            'RATELIMIT_ENABLED': 'False', 'PRERENDER_MARKETING_PAGES': 'False'}.items():
+            env.setenv(name, value)
+        from Project import create_app
+        app = create_app()
+    app.config['TESTING'] = True
+    with app.app_context():
+        for shard in app.config['SHARDS']:
+            db.metadata.create_all(bind=shard_engine(shard))
+    yield app
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+def _make_team(app, shard='primary'):
+    """A team with location checks off, moved to `shard`. Returns its id."""
+    with app.app_context():
+        team = Team(name=f"Team {secrets.token_hex(4)}", plan='Pro')
+        db.session.add(team)
+        db.session.flush()
+        db.session.add(TeamSetting(team_id=team.id, name='LocationVerificationEnabled', value='FALSE'))
+        db.session.commit()
+        team_id = team.id
+        if shard != 'primary':
+            move_team(team_id, shard, settle_seconds=0, log=lambda message: None)
+    return team_id
+
+
+def _team_rows(shard, team_id):
+    counts = {}
+    with shard_engine(shard).connect() as conn:
+        for name in TENANT_TABLES:
+            table = db.metadata.tables[name]
+            owner = table.c.id if name == 'team' else table.c.team_id
+            counts[name] = conn.execute(select(func.count()).select_from(table).where(owner == team_id)).scalar()
+    return counts
+
+
+# --- Moving a team ---
+def test_team_moves_while_clients_keep_punching(sharded_app):
+    app = sharded_app
+    bystander_id, team_id = _make_team(app), _make_team(app)
+    with app.app_context():
+        key, key_hash, key_prefix = generate_api_key()
+        db.session.add(ApiKey(team_id=team_id, name="Writers", key_hash=key_hash, key_prefix=key_prefix))
+        people = [User(name=f"Writer {i}", team_id=team_id, role='User') for i in range(WRITERS)]
+        db.session.add_all(people + [User(name="Stays Put", team_id=bystander_id, role='User')])
+        db.session.commit()
+        user_ids = [user.id for user in people]
+        bystander_rows = _team_rows('primary', bystander_id)
+
+    accepted = {user_id: 0 for user_id in user_ids}
+    failures = []
+    first_punch = utcnow() - timedelta(hours=8)
+
+    def write(user_id, stop):
+        # Each punch toggles the writer's state, a second after the last one.
+        client = app.test_client()
+        headers = {'Authorization': f"Bearer {key}"}
+        while not stop.is_set():
+            at = first_punch + timedelta(seconds=accepted[user_id])
+            response = client.post('https://localhost/api/v1/punches', headers=headers, json={
+                'punches': [{'user_id': user_id, 'timestamp': at.isoformat() + 'Z'}]})
+            if response.status_code == 200 and response.get_json()['accepted'] == 1:
+                accepted[user_id] += 1
+            elif response.status_code in (409, 503):
+                time.sleep(0.05)  # Writes paused by the move, or a concurrent upload; retry as a client would.
+            else:
+                failures.append(f"user {user_id}: {response.status_code} {response.get_data(True)[:200]}")
+                return
+
+    for source, target in (('primary', 's1'), ('s1', 's2')):
+        stop = threading.Event()
+        threads = [threading.Thread(target=write, args=(user_id, stop)) for user_id in user_ids]
+        for thread in threads:
+            thread.start()
+        try:
+            time.sleep(0.5)
+            with app.app_context():
+                move_team(team_id, target, settle_seconds=SETTLE, log=lambda message: None)
+            time.sleep(0.5)
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+        assert failures == []
+        with app.app_context():
+            punches = sum(accepted.values())
+            rows = _team_rows(target, team_id)
+            assert {name: rows[name] for name in ('punch_event', 'time_log', 'user', 'team', 'api_key')} == {
+                'punch_event': punches, 'time_log': sum((n + 1) // 2 for n in accepted.values()),
+                'user': WRITERS, 'team': 1, 'api_key': 1}, f"{source} -> {target}"
+            for shard in app.config['SHARDS']:
+                if shard != target:
+                    assert not any(_team_rows(shard, team_id).values()), f"{shard} kept rows of the team"
+            assert _team_rows('primary', bystander_id) == bystander_rows
+            assert team_route(team_id) == (target, False)
+            assert team_for_key('api_key', key_hash) == team_id
+
+            time_log = TimeLog.__table__
+            with shard_engine(target).connect() as conn:
+                open_shifts = conn.execute(select(func.count()).select_from(time_log).where(
+                    time_log.c.team_id == team_id, time_log.c.clock_out_at.is_(None),
+                    time_log.c.missed_clock_out == False)).scalar()
+            assert open_shifts == sum(n % 2 for n in accepted.values())
+    assert all(accepted.values())
+
+
+# --- Directory ---
+def test_directory_follows_committed_changes_on_a_shard(sharded_app):
+    app = sharded_app
+    team_id = _make_team(app, 's1')
+    with app.app_context():
+        route_to_team(team_id)
+        user = User(name="Directory", email='before@example.com', team_id=team_id, role='User')
+        db.session.add(user)
+        db.session.commit()
+        assert team_for_key('email', 'before@example.com') == team_id
+
+        user.email = 'after@example.com'
+        db.session.commit()
+        assert team_for_key('email', 'after@example.com') == team_id
+        assert team_for_key('email', 'before@example.com') is None
+        assert db.session.get(TenantKey, ('email', 'before@example.com')) is None
+
+
+def test_key_of_a_failed_write_is_ignored_then_removed(sharded_app):
+    app = sharded_app
+    team_id = _make_team(app, 's1')
+    with app.app_context():
+        route_to_team(team_id)
+        db.session.add(User(name="Never Saved", email='lost@example.com', team_id=team_id, role='User'))
+        db.session.flush()
+        db.session.rollback()
+
+        # The key was committed ahead of the user row, which never made it.
+        assert db.session.get(TenantKey, ('email', 'lost@example.com')) is not None
+        assert team_for_key('email', 'lost@example.com') is None
+        assert db.session.get(TenantKey, ('email', 'lost@example.com')) is not None
+
+        db.session.get(TenantKey, ('email', 'lost@example.com')).updated_at = (
+            utcnow() - timedelta(seconds=KEY_REPAIR_GRACE_SECONDS + 1))
+        db.session.commit()
+        assert team_for_key('email', 'lost@example.com') is None
+        assert db.session.get(TenantKey, ('email', 'lost@example.com')) is None
+
+
+# --- Pools ---
+def test_shard_requests_use_the_shard_workload_pools(sharded_app):
+    app = sharded_app
+    with app.test_request_context():
+        engines = db.engines
+        g.db_shard = 's1'
+        g.db_workload = 'kiosk'
+        assert db.session.get_bind(mapper=User.__mapper__) is engines['shard:s1:kiosk']
+        assert db.session.get_bind(mapper=TenantKey.__mapper__) is engines['kiosk']
+
+        g.db_workload = 'reporting'
+        assert db.session.get_bind(mapper=User.__mapper__, clause=select(User.id)) is engines['shard:s1:reporting']
+        assert db.session.get_bind(mapper=User.__mapper__, clause=insert(User)) is engines['shard:s1']
+
+
+# --- CLI ---
+def test_export_covers_every_shard_unless_limited(sharded_app, tmp_path):
+    app = sharded_app
+    names = {}
+    for shard in ('primary', 's2'):
+        team_id = _make_team(app, shard)
+        with app.app_context():
+            route_to_team(team_id)
+            user = User(name=f"Exported {shard}", team_id=team_id, role='User')
+            db.session.add(user)
+            db.session.flush()
+            db.session.add(TimeLog(team_id=team_id, user_id=user.id, date='2026-03-02', clock_in='09:00',
+                                   clock_out='17:00', clock_in_at=datetime(2026, 3, 2, 9),
+                                   clock_out_at=datetime(2026, 3, 2, 17)))
+            db.session.commit()
+            names[shard] = (team_id, user.name)
+
+    runner = app.test_cli_runner()
+    team_args = [arg for team_id, _ in names.values() for arg in ('--team-id', str(team_id))]
+    everywhere, only_s2 = tmp_path / 'all.csv', tmp_path / 's2.csv'
+
+    # `flask` pushes an app context for every command; the test runner does not.
+    with app.app_context():
+        result = runner.invoke(args=['export-time-logs', str(everywhere), '--format', 'csv', *team_args])
+        assert "for 2 teams" in result.output
+    with app.app_context():
+        result = runner.invoke(args=['export-time-logs', str(only_s2), '--format', 'csv', '--shard', 's2',
+                                     *team_args])
+        assert "for 1 teams" in result.output
+
+    assert all(name in everywhere.read_text() for _, name in names.values())
+    assert names['s2'][1] in only_s2.read_text() and names['primary'][1] not in only_s2.read_text()
@@ -0,0 +1,185 @@
+# tests/test_webhooks.py
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import socket
+import threading
+
+import pytest
+
+from Project.models import db, WebhookDelivery, WebhookEndpoint
+from Project.timekeeping import utcnow
+from Project.webhooks import (BACKOFF_BASE_SECONDS, BACKOFF_MAX_SECONDS, WEBHOOK_MAX_ATTEMPTS, StandInReceiver,
+                              backoff_seconds, dispatch_once, enqueue_webhook, generate_webhook_secret,
+                              invalidate_endpoint_cache, post_batch)
+
+BODY = b'{"events": []}'
+
+
+@pytest.fixture
+def receiver():
+    with StandInReceiver(generate_webhook_secret()) as receiver:
+        yield receiver
+
+
+@pytest.fixture
+def private_urls(app, monkeypatch):
+    # The stand-in receivers listen on 127.0.0.1; only these tests may deliver there.
+    monkeypatch.setitem(app.config, 'WEBHOOK_ALLOW_PRIVATE_URLS', True)
+
+
+@pytest.fixture
+def add_endpoint(app, make_team):
+    """Registers a receiver as an endpoint of a new team and returns (team id, endpoint id)."""
+    team_ids = []
+
+    def add(receiver):
+        team_id = make_team()
+        team_ids.append(team_id)
+        with app.app_context():
+            endpoint = WebhookEndpoint(team_id=team_id, url=receiver.url, secret=receiver.secret)
+            db.session.add(endpoint)
+            db.session.commit()
+            invalidate_endpoint_cache(team_id)
+            return team_id, endpoint.id
+    yield add
+    # The dispatcher serves every team; later tests must not find these endpoints due.
+    with app.app_context():
+        WebhookEndpoint.query.filter(WebhookEndpoint.team_id.in_(team_ids)).update({'active': False})
+        db.session.commit()
+        for team_id in team_ids:
+            invalidate_endpoint_cache(team_id)
+
+
+def _dispatch():
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        return dispatch_once(pool)
+
+
+# --- SSRF ---
+def test_private_addresses_are_refused(receiver):
+    error = post_batch(receiver.url, receiver.secret, BODY)
+
+    assert error == "127.0.0.1 does not resolve to a public address"
+    assert receiver.requests == 0
+
+
+def test_connection_uses_the_address_that_was_checked(receiver, monkeypatch):
+    # A host that resolves once, then "rebinds": a second lookup would fail the delivery.
+    real_getaddrinfo = socket.getaddrinfo
+    lookups = []
+
+    def getaddrinfo(host, *args, **kwargs):
+        if host == 'hooks.example.test':
+            lookups.append(host)
+            if len(lookups) > 1:
+                raise socket.gaierror("rebound")
+            host = '127.0.0.1'
+        return real_getaddrinfo(host, *args, **kwargs)
+
+    monkeypatch.setattr(socket, 'getaddrinfo', getaddrinfo)
+    url = receiver.url.replace('127.0.0.1', 'hooks.example.test')
+
+    assert post_batch(url, receiver.secret, BODY, allow_private=True) is None
+    assert lookups == ['hooks.example.test']
+    assert receiver.requests == 1 and receiver.bad_signatures == 0
+
+
+def test_redirects_are_not_followed(receiver):
+    class Redirect(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.send_response(307)
+            self.send_header('Location', receiver.url)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Redirect)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        error = post_batch(f"http://127.0.0.1:{server.server_address[1]}/hook", receiver.secret, BODY,
+                           allow_private=True)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert error == "HTTP 307"
+    assert receiver.requests == 0
+
+
+# --- Retries ---
+def test_backoff_doubles_up_to_the_cap():
+    for failures in range(1, 20):
+        expected = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (failures - 1))
+        assert expected * 0.8 <= backoff_seconds(failures) <= expected * 1.2
+
+
+def test_failed_batch_backs_off_then_is_delivered(app, private_urls, add_endpoint):
+    with StandInReceiver(generate_webhook_secret(), fail_first=1) as receiver:
+        team_id, endpoint_id = add_endpoint(receiver)
+        with app.app_context():
+            enqueue_webhook(team_id, 'clock_in', {'punch_id': 1})
+            db.session.commit()
+
+            before = utcnow()
+            assert _dispatch() == (1, 0, 1)
+            endpoint = db.session.get(WebhookEndpoint, endpoint_id)
+            delivery = WebhookDelivery.query.filter_by(endpoint_id=endpoint_id).one()
+            assert endpoint.consecutive_failures == 1 and endpoint.last_error == "HTTP 503"
+            assert before + timedelta(seconds=BACKOFF_BASE_SECONDS * 0.8) <= endpoint.retry_after
+            assert endpoint.retry_after <= utcnow() + timedelta(seconds=BACKOFF_BASE_SECONDS * 1.2)
+            assert delivery.attempts == 1 and delivery.next_attempt_at == endpoint.retry_after
+
+            # Nothing is retried before the backoff is over.
+            assert _dispatch() == (0, 0, 0)
+
+            endpoint.retry_after = delivery.next_attempt_at = utcnow()
+            db.session.commit()
+            assert _dispatch() == (1, 1, 0)
+            assert WebhookDelivery.query.filter_by(endpoint_id=endpoint_id).count() == 0
+            assert db.session.get(WebhookEndpoint, endpoint_id).consecutive_failures == 0
+        assert [event['data'] for event in receiver.events] == [{'punch_id': 1}]
+
+
+def test_last_failed_attempt_dead_letters_the_delivery(app, private_urls, add_endpoint):
+    with StandInReceiver(generate_webhook_secret(), fail_first=10) as receiver:
+        team_id, endpoint_id = add_endpoint(receiver)
+        with app.app_context():
+            enqueue_webhook(team_id, 'clock_in', {'punch_id': 2})
+            db.session.commit()
+            WebhookDelivery.query.filter_by(endpoint_id=endpoint_id).update({'attempts': WEBHOOK_MAX_ATTEMPTS - 1})
+            db.session.commit()
+
+            assert _dispatch() == (1, 0, 1)
+            delivery = WebhookDelivery.query.filter_by(endpoint_id=endpoint_id).one()
+            assert delivery.dead and delivery.attempts == WEBHOOK_MAX_ATTEMPTS
+
+            # A dead delivery is never claimed again, even once the endpoint is due.
+            db.session.get(WebhookEndpoint, endpoint_id).retry_after = None
+            db.session.commit()
+            assert _dispatch() == (0, 0, 0)
+        assert receiver.requests == 1
+
+
+# --- End to end ---
+def test_every_event_reaches_every_endpoint_signed(app, private_urls, add_endpoint):
+    with StandInReceiver(generate_webhook_secret()) as first, StandInReceiver(generate_webhook_secret()) as second:
+        team_id, _ = add_endpoint(first)
+        with app.app_context():
+            db.session.add(WebhookEndpoint(team_id=team_id, url=second.url, secret=second.secret))
+            db.session.commit()
+            invalidate_endpoint_cache(team_id)
+            for i in range(250):
+                enqueue_webhook(team_id, 'clock_in', {'punch_id': i})
+            db.session.commit()
+
+            while _dispatch()[0]:
+                pass
+            assert WebhookDelivery.query.filter_by(team_id=team_id).count() == 0
+
+    for receiver in (first, second):
+        assert receiver.bad_signatures == 0
+        assert sorted(event['data']['punch_id'] for event in receiver.events) == list(range(250))